@@ -55,6 +55,25 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def observeState(self, state):
+        """
+        Called by the game with every new state (after any agent moves).
+        Unlike `BaseAgent.observationFunction`, every agent sees every state,
+        and the time spent here is not counted against the agent.
+        So, this should return quickly (e.g. after starting some work in the background,
+        see `pacai.agents.pondering.PonderingAgent`).
+        """
+
+        pass
+
+    def stopPondering(self):
+        """
+        Stop any work the agent is doing in the background.
+        Called by the game when it ends (for any reason).
+        """
+
+        pass
+
     @staticmethod
     def loadAgent(name, index, args = {}):
         """
@@ -13,17 +13,31 @@ class ReflexCaptureAgent(CaptureAgent):
     def __init__(self, index, **kwargs):
         super().__init__(index)
 
+        # The successors of the state currently being evaluated (see `chooseAction`).
+        self._successorState = None
+        self._successors = {}
+
     def chooseAction(self, gameState):
         """
         Picks among the actions with the highest return from `ReflexCaptureAgent.evaluate`.
         """
 
-        actions = gameState.getLegalActions(self.index)
+        # Generate every successor at once, `ReflexCaptureAgent.getSuccessor` will reuse them.
+        self._successorState = gameState
+        self._successors = dict(gameState.generateSuccessors(self.index))
+
+        actions = list(self._successors.keys())
         # actions.remove("Stop")
 
-        start = time.time()
-        values = [self.evaluate(gameState, a) for a in actions]
-        logging.debug('evaluate() time for agent %d: %.4f' % (self.index, time.time() - start))
+        try:
+            start = time.time()
+            values = [self.evaluate(gameState, a) for a in actions]
+            logging.debug('evaluate() time for agent %d: %.4f' % (self.index, time.time() - start))
+        finally:
+            # Do not hold onto the successors (even if evaluate() fails).
+            self._successorState = None
+            self._successors = {}
+
         # print("values: ", values)
         maxValue = max(values)
         bestActions = [a for a, v in zip(actions, values) if v == maxValue]
@@ -35,7 +49,13 @@ class ReflexCaptureAgent(CaptureAgent):
         Finds the next successor which is a grid position (location tuple).
         """
 
-        successor = gameState.generateSuccessor(self.index, action)
+        successor = None
+        if (gameState is self._successorState):
+            successor = self._successors.get(action)
+
+        if (successor is None):
+            successor = gameState.generateSuccessor(self.index, action)
+
         pos = successor.getAgentState(self.index).getPosition()
 
         if (pos != util.nearestPoint(pos)):
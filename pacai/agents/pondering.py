@@ -0,0 +1,100 @@
+"""
+Agents that keep thinking while the other agents take their turns.
+"""
+
+import logging
+import threading
+
+from pacai.agents.base import BaseAgent
+from pacai.core.isolation import AgentTimeoutError
+
+# How long (in seconds) pondering gets to stop before the agent forfeits.
+DEFAULT_STOP_TIMEOUT = 1.0
+
+class PonderingAgent(BaseAgent):
+    """
+    An agent that ponders:
+    while the other agents take their turns, `PonderingAgent.ponder` is run in a background thread
+    on a private copy of the latest state of the game.
+    This lets expensive searches do work ahead of time
+    (e.g. fill in a cache or search tree that `getAction` then reuses).
+
+    Pondering starts on every new state where it is not this agent's turn next.
+    It is stopped (and waited for) before this agent's turn, when a newer state comes in,
+    and when the game ends.
+    Neither pondering nor stopping is counted against the agent's time,
+    so pondering that does not stop within stopTimeout seconds
+    raises a `pacai.core.isolation.AgentTimeoutError` (and the agent forfeits the game).
+
+    Note that pondering threads share the interpreter with the rest of the game,
+    so they slow down (and are timed as part of) the moves of the other agents in the same process.
+    Isolate agents (see `pacai.core.isolation`) to keep pondering from being charged to opponents.
+    """
+
+    def __init__(self, index = 0, stopTimeout = DEFAULT_STOP_TIMEOUT, **kwargs):
+        super().__init__(index)
+
+        self._stopTimeout = float(stopTimeout)
+        self._ponderThread = None
+        self._stopEvent = None
+
+    def isPondering(self):
+        return (self._ponderThread is not None and self._ponderThread.is_alive())
+
+    def ponder(self, state, shouldStop):
+        """
+        Think about a state, in the background.
+        Implementations should check shouldStop() often and return soon after it becomes true.
+        Any results should be kept on the agent for getAction() to use
+        (pondering is always stopped before getAction() is called).
+        """
+
+        pass
+
+    # Override
+    def final(self, state):
+        self.stopPondering()
+
+    # Override
+    def observeState(self, state):
+        self.stopPondering()
+
+        if (state.isOver() or state.getLastAgentMoved() is None):
+            return
+
+        # Leave this agent's own turn to getAction().
+        nextAgentIndex = (state.getLastAgentMoved() + 1) % state.getNumAgents()
+        if (nextAgentIndex == self.index):
+            return
+
+        # The game keeps using (and generating successors from) its own state while we ponder.
+        state = state.copy()
+
+        self._stopEvent = threading.Event()
+        self._ponderThread = threading.Thread(target = self._ponder,
+                args = (state, self._stopEvent), name = 'Ponder-%d' % (self.index), daemon = True)
+        self._ponderThread.start()
+
+    # Override
+    def stopPondering(self):
+        if (self._ponderThread is None):
+            return
+
+        self._stopEvent.set()
+        self._ponderThread.join(self._stopTimeout)
+
+        stopped = not self._ponderThread.is_alive()
+
+        self._ponderThread = None
+        self._stopEvent = None
+
+        if (not stopped):
+            raise AgentTimeoutError('Agent %d did not stop pondering within %0.2f seconds.' %
+                    (self.index, self._stopTimeout))
+
+    def _ponder(self, state, stopEvent):
+        try:
+            self.ponder(state, stopEvent.is_set)
+        except Exception:
+            # There is no one to raise to in the background, the agent will just have to do without.
+            logging.warning('Agent %d crashed while pondering.' % (self.index), exc_info = True)
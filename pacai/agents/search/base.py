@@ -62,6 +62,9 @@ class SearchAgent(BaseAgent):
 
         logging.info('Search nodes expanded: %d' % problem.getExpandedCount())
 
+        if (problem.getMaxStoredNodes() > 0):
+            logging.info('Search nodes held in memory (at most): %d' % problem.getMaxStoredNodes())
+
     def getAction(self, state):
         """
         Returns the next action in the path chosen earlier (in registerInitialState).
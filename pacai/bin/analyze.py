@@ -0,0 +1,370 @@
+"""
+Headless analysis of recorded games.
+
+Replay files (see `pacai.core.replay`) are re-simulated through `generateSuccessor`
+without any view, and a row of aggregates is written for each game:
+the score trajectory, food and capsules eaten by each agent, deaths, and move counts.
+Replays are spread over a pool of worker processes
+and results are streamed out as they come in, so whole tournament archives can be analyzed at once.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import sys
+import textwrap
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.capture import MIN_FOOD
+from pacai.bin.pacman import PACMAN_AGENT_INDEX
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.actions import Actions
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import isReplayFile
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+
+GAME_PACMAN = 'pacman'
+GAME_CAPTURE = 'capture'
+
+FORMAT_CSV = 'csv'
+FORMAT_JSON = 'json'
+FORMATS = [FORMAT_CSV, FORMAT_JSON]
+
+CSV_FIELDS = [
+    'path',
+    'game',
+    'agents',
+    'moves',
+    'movesPerAgent',
+    'score',
+    'winner',
+    'foodEaten',
+    'capsulesEaten',
+    'deaths',
+    'crashedAgent',
+    'scoreTrajectory',
+    'error',
+]
+
+# The speeds an agent may move at (scared ghosts move at half speed).
+_AGENT_SPEEDS = [1.0, 0.5]
+
+def analyzeReplay(path):
+    """
+    Re-simulate a single recorded game and return a dict of aggregates for it.
+    Files that cannot be analyzed get a result with an 'error' entry instead of raising,
+    so one bad file does not stop a batch.
+    """
+
+    try:
+        if (isReplayFile(path)):
+            with ReplayReader(path) as reader:
+                metadata = reader.getMetadata()
+                return _analyzeGame(path, metadata.get('game', GAME_PACMAN), reader.getLayout(),
+                        reader.getAgentNames(), metadata.get('length'), reader)
+
+        # Older replays are pickled dicts, capture replays are the ones with a length.
+        with open(path, 'rb') as file:
+            recorded = pickle.load(file)
+
+        if ('length' in recorded):
+            return _analyzeGame(path, GAME_CAPTURE, recorded['layout'], recorded['agents'],
+                    recorded['length'], recorded['actions'])
+
+        return _analyzeGame(path, GAME_PACMAN, recorded['layout'], None, None,
+                recorded['actions'])
+    except Exception as ex:
+        logging.warning("Could not analyze '%s': %s" % (path, ex))
+        return {'path': path, 'error': str(ex)}
+
+def analyzeReplays(paths, numWorkers = 1):
+    """
+    Analyze many recorded games across a pool of worker processes.
+    Yields the result of each game (in the same order as the paths) as soon as it is ready.
+    """
+
+    if (numWorkers <= 1):
+        for path in paths:
+            yield analyzeReplay(path)
+
+        return
+
+    with multiprocessing.Pool(processes = numWorkers) as pool:
+        for result in pool.imap(analyzeReplay, paths, chunksize = 4):
+            yield result
+
+def findReplays(paths):
+    """
+    Expand any directories in the given paths into all the files beneath them (sorted).
+    """
+
+    replayPaths = []
+
+    for path in paths:
+        if (not os.path.isdir(path)):
+            replayPaths.append(path)
+            continue
+
+        for (dirPath, dirNames, fileNames) in os.walk(path):
+            dirNames.sort()
+            for fileName in sorted(fileNames):
+                replayPaths.append(os.path.join(dirPath, fileName))
+
+    return replayPaths
+
+def writeResults(results, file, outputFormat):
+    """
+    Write results to an open file as they are produced.
+    Returns the number of results written.
+    """
+
+    if (outputFormat == FORMAT_CSV):
+        return _writeCSV(results, file)
+    elif (outputFormat == FORMAT_JSON):
+        return _writeJSON(results, file)
+
+    raise ValueError("Unknown output format: '%s'." % (outputFormat))
+
+def _analyzeGame(path, gameType, layout, agentNames, length, moves):
+    if (gameType == GAME_PACMAN):
+        state = PacmanGameState(layout)
+    elif (gameType == GAME_CAPTURE):
+        state = CaptureGameState(layout, length)
+    else:
+        raise ValueError("Unknown game type: '%s'." % (gameType))
+
+    numAgents = state.getNumAgents()
+    if (agentNames is None):
+        agentNames = [None] * numAgents
+
+    movesPerAgent = [0] * numAgents
+    foodEaten = [0] * numAgents
+    capsulesEaten = [0] * numAgents
+    deaths = [0] * numAgents
+    crashedAgent = None
+
+    numMoves = 0
+    scoreTrajectory = [(0, state.getScore())]
+
+    for (agentIndex, action) in moves:
+        if (state.isOver()):
+            break
+
+        try:
+            successor = state.generateSuccessor(agentIndex, action)
+        except Exception:
+            # In the game, an illegal action is a crash and the game stops there.
+            crashedAgent = agentIndex
+            break
+
+        numMoves += 1
+        movesPerAgent[agentIndex] += 1
+
+        foodEaten[agentIndex] += state.getNumFood() - successor.getNumFood()
+        capsulesEaten[agentIndex] += state.getNumCapsules() - successor.getNumCapsules()
+
+        for index in _findDeaths(state, successor, agentIndex, action, gameType):
+            deaths[index] += 1
+
+        if (successor.getScore() != state.getScore()):
+            scoreTrajectory.append((numMoves, successor.getScore()))
+
+        state = successor
+
+    return {
+        'path': path,
+        'game': gameType,
+        'agents': agentNames,
+        'moves': numMoves,
+        'movesPerAgent': movesPerAgent,
+        'score': state.getScore(),
+        'winner': _getWinner(state, gameType),
+        'foodEaten': foodEaten,
+        'capsulesEaten': capsulesEaten,
+        'deaths': deaths,
+        'crashedAgent': crashedAgent,
+        'scoreTrajectory': scoreTrajectory,
+    }
+
+def _findDeaths(state, successor, agentIndex, action, gameType):
+    """
+    Get the index of each agent that died on this move.
+    Dead agents respawn at their start,
+    so a death is an agent jumping to its start without having walked there.
+    In pacman, pacman does not respawn: the game is just lost.
+    """
+
+    if (gameType == GAME_PACMAN and successor.isLose() and not state.isLose()):
+        return [PACMAN_AGENT_INDEX]
+
+    dead = []
+
+    for index in range(successor.getNumAgents()):
+        oldPosition = state.getAgentPosition(index)
+        newPosition = successor.getAgentPosition(index)
+        startPosition = successor.getInitialAgentPosition(index)
+
+        if (newPosition == oldPosition or newPosition != startPosition):
+            continue
+
+        if (index == agentIndex):
+            steps = []
+            for speed in _AGENT_SPEEDS:
+                (dx, dy) = Actions.directionToVector(action, speed)
+                steps.append((oldPosition[0] + dx, oldPosition[1] + dy))
+
+            if (newPosition in steps):
+                continue
+
+        dead.append(index)
+
+    return dead
+
+def _getWinner(state, gameType):
+    if (gameType == GAME_PACMAN):
+        if (state.isWin()):
+            return 'pacman'
+        elif (state.isLose()):
+            return 'ghosts'
+
+        return None
+
+    # Mirror the checks in `pacai.bin.capture.CaptureRules.process`.
+    if (state.getNumRedFood() <= MIN_FOOD):
+        return 'blue'
+    elif (state.getNumBlueFood() <= MIN_FOOD):
+        return 'red'
+    elif (state.getScore() > 0):
+        return 'red'
+    elif (state.getScore() < 0):
+        return 'blue'
+
+    return 'tie'
+
+def _writeCSV(results, file):
+    writer = csv.DictWriter(file, fieldnames = CSV_FIELDS)
+    writer.writeheader()
+
+    count = 0
+    for result in results:
+        row = dict(result)
+
+        # Lists go into a single cell, space separated.
+        for field in ['agents', 'movesPerAgent', 'foodEaten', 'capsulesEaten', 'deaths']:
+            if (field in row):
+                row[field] = ' '.join([str(value) for value in row[field]])
+
+        if ('scoreTrajectory' in row):
+            row['scoreTrajectory'] = ' '.join(['%d:%s' % (move, score)
+                    for (move, score) in row['scoreTrajectory']])
+
+        writer.writerow(row)
+        count += 1
+
+    return count
+
+def _writeJSON(results, file):
+    file.write('[')
+
+    count = 0
+    for result in results:
+        if (count > 0):
+            file.write(',')
+
+        file.write('\n    ')
+        file.write(json.dumps(result))
+        count += 1
+
+    file.write('\n]\n')
+    return count
+
+def _parseArgs(argv):
+    description = """
+    DESCRIPTION:
+        Analyze recorded games (see the --record option of pacman and capture) without a display.
+        Every game is re-simulated and summarized
+        (score trajectory, food eaten per agent, deaths, and move counts).
+
+    EXAMPLES:
+        (1) python3 -m pacai.bin.analyze replays/
+            - Summarize every replay under the 'replays' directory as CSV on stdout.
+        (2) python3 -m pacai.bin.analyze --workers 8 --output stats.json replays/
+            - Summarize across 8 worker processes and write JSON to 'stats.json'.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+            prog = 'analyze', formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('paths', metavar = 'PATH', nargs = '+',
+            help = 'replay files or directories of replay files to analyze')
+
+    parser.add_argument('-d', '--debug', dest = 'debug',
+            action = 'store_true', default = False,
+            help = 'set logging level to debug (default: %(default)s)')
+
+    parser.add_argument('-q', '--quiet', dest = 'quiet',
+            action = 'store_true', default = False,
+            help = 'set logging level to warning (default: %(default)s)')
+
+    parser.add_argument('-o', '--output', dest = 'output',
+            action = 'store', type = str, default = None,
+            help = 'write the results to this file instead of stdout (default: %(default)s)')
+
+    parser.add_argument('-f', '--format', dest = 'format',
+            action = 'store', type = str, default = None, choices = FORMATS,
+            help = 'the output format, picked from the output extension when not given'
+                + ' (default: %s)' % (FORMAT_CSV))
+
+    parser.add_argument('--workers', dest = 'numWorkers',
+            action = 'store', type = int, default = os.cpu_count(),
+            help = 'analyze games across this many worker processes (default: %(default)s)')
+
+    options = parser.parse_args(argv)
+
+    if (options.numWorkers < 1):
+        raise ValueError('The number of workers must be positive.')
+
+    if (options.format is None):
+        options.format = FORMAT_CSV
+        if (options.output is not None and options.output.lower().endswith('.json')):
+            options.format = FORMAT_JSON
+
+    return options
+
+def main(argv):
+    """
+    Entry point for the replay analyzer.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    Returns the number of games analyzed.
+    """
+
+    initLogging()
+
+    options = _parseArgs(argv)
+
+    if (options.quiet):
+        updateLoggingLevel(logging.WARNING)
+    elif (options.debug):
+        updateLoggingLevel(logging.DEBUG)
+
+    paths = findReplays(options.paths)
+    logging.info('Analyzing %d replays across %d workers.' % (len(paths), options.numWorkers))
+
+    results = analyzeReplays(paths, options.numWorkers)
+
+    if (options.output is None):
+        count = writeResults(results, sys.stdout, options.format)
+    else:
+        with open(options.output, 'w', newline = '') as file:
+            count = writeResults(results, file, options.format)
+
+    logging.info('Analyzed %d replays.' % (count))
+    return count
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
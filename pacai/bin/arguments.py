@@ -1,6 +1,7 @@
 import argparse
 import textwrap
 
+from pacai.core import isolation
 from pacai.ui import view
 
 def getParser(description, name):
@@ -48,6 +49,22 @@ def getParser(description, name):
             action = 'store', type = int, default = view.DEFAULT_SKIP_FRAMES,
             help = 'skip X actual frames between each frame of the gif (default: %(default)s)')
 
+    parser.add_argument('--instrument', dest = 'instrumentPath',
+            action = 'store', type = str, default = None,
+            help = 'time every phase of every turn and write a JSON report to the named file,\n'
+                + 'with several games the game number is added to the name (default: %(default)s)')
+
+    parser.add_argument('--profile-agents', dest = 'profileAgents',
+            action = 'store_true', default = False,
+            help = 'also profile agents\' getAction with cProfile (requires --instrument)'
+                + ' (default: %(default)s)')
+
+    parser.add_argument('--isolate-agents', dest = 'isolateAgents',
+            action = 'store', type = str, default = None, choices = isolation.TIMEOUT_POLICIES,
+            help = 'run each agent in its own process and enforce its deadlines as it runs,\n'
+                + "an agent that is late either plays a 'default' action or 'forfeit's the game"
+                + ' (default: %(default)s)')
+
     parser.add_argument('--null-graphics', dest = 'nullGraphics',
             action = 'store_true', default = False,
             help = 'generate no graphics (default: %(default)s)')
@@ -58,11 +75,14 @@ def getParser(description, name):
 
     parser.add_argument('--record', dest = 'record',
             action = 'store', type = str, default = None,
-            help = 'writes the moves of a game to the named pickle file (default: %(default)s)')
+            help = 'writes the moves of a game to the named replay file, '
+            + "gzip compressed if the name ends in '.gz'. "
+            + 'When several games are played, the file is left with the last one '
+            + '(with --workers, it is written once all the games are done) (default: %(default)s)')
 
     parser.add_argument('--replay', dest = 'replay',
             action = 'store', type = str, default = None,
-            help = 'load a recorded pickle game file to replay (default: %(default)s)')
+            help = 'load a recorded game file to replay (default: %(default)s)')
 
     parser.add_argument('--sprites', dest = 'spritesPath',
             action = 'store', type = str, default = view.DEFAULT_SPRITES,
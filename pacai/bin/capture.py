@@ -5,6 +5,7 @@ On your side of the map, you are a ghost and can eat pacmen.
 On your opponents side of the map, you are a pacman and can eat food and capsules.
 """
 
+import concurrent.futures
 import logging
 import os
 import pickle
@@ -14,13 +15,19 @@ import sys
 from pacai.agents import keyboard
 from pacai.agents.capture.dummy import DummyAgent
 from pacai.bin.arguments import getParser
+from pacai.core import isolation
 from pacai.core.actions import Actions
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
+from pacai.core.instrumentation import instrumentGame
 from pacai.core.gamestate import AbstractGameState
-from pacai.core.grid import Grid
-from pacai.core.layout import Layout
+from pacai.core.grid import BitGrid
+from pacai.core.layout import CaptureLayout
+from pacai.core.layout import getCaptureLayout
 from pacai.core.layout import getLayout
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import ReplayWriter
+from pacai.core.replay import isReplayFile
 from pacai.ui.capture.null import CaptureNullView
 from pacai.ui.capture.text import CaptureTextView
 from pacai.util import reflection
@@ -38,58 +45,39 @@ MIN_FOOD = 2
 
 SCARED_TIME = 40
 
+DEFAULT_LENGTH = 1200  # The default number of moves in a game.
+
 class CaptureGameState(AbstractGameState):
     """
     A game state specific to capture.
     """
 
     def __init__(self, layout, timeleft):
+        # All the static information about each side comes from the layout.
+        layout = getCaptureLayout(layout)
         super().__init__(layout)
 
         self._timeleft = timeleft
+        self._redWidth = layout.redWidth
 
         # The index of agents on each team.
-        self._blueTeam = []
-        self._redTeam = []
+        self._blueTeam = layout.blueTeam
+        self._redTeam = layout.redTeam
 
         # Matches indexes with getAgentStates().
         # True if the agent is on the red team, false otherwise.
-        self._teams = []
-
-        for agentIndex in range(self.getNumAgents()):
-            agentState = self.getAgentState(agentIndex)
-            agentIsRed = self.isOnRedSide(agentState.getPosition())
+        self._teams = layout.teams
 
-            self._teams.append(agentIsRed)
-
-            if (agentIsRed):
-                self._redTeam.append(agentIndex)
-            else:
-                self._blueTeam.append(agentIndex)
+        # Capsules and food are copied on write (like the full collections).
+        self._redCapsules = layout.redCapsules
+        self._blueCapsules = layout.blueCapsules
 
-        # Build some denormalized structures for fast access.
-
-        self._redCapsules = []
-        self._blueCapsules = []
-
-        for capsule in self.getCapsules():
-            if (self.isOnRedSide(capsule)):
-                self._redCapsules.append(capsule)
-            else:
-                self._blueCapsules.append(capsule)
+        self._redFood = layout.redFood.copy()
+        self._blueFood = layout.blueFood.copy()
 
-        self._redFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-        self._blueFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-
-        for x in range(self._food.getWidth()):
-            for y in range(self._food.getHeight()):
-                if (not self._food[x][y]):
-                    continue
-
-                if (self.isOnRedSide((x, y))):
-                    self._redFood[x][y] = True
-                else:
-                    self._blueFood[x][y] = True
+        # Kept up to date as food is eaten, like the total count.
+        self._numRedFood = self._redFood.count()
+        self._numBlueFood = self._blueFood.count()
 
     # Override
     def generateSuccessor(self, agentIndex, action):
@@ -128,12 +116,17 @@ class CaptureGameState(AbstractGameState):
             self._redFood = self._redFood.copy()
             self._blueFood = self._blueFood.copy()
 
-        super().eatFood(x, y)
+        if (not super().eatFood(x, y)):
+            return False
 
         if (self.isOnRedSide((x, y))):
             self._redFood[x][y] = False
+            self._numRedFood -= 1
         else:
             self._blueFood[x][y] = False
+            self._numBlueFood -= 1
+
+        return True
 
     def getBlueCapsules(self):
         """
@@ -153,6 +146,20 @@ class CaptureGameState(AbstractGameState):
 
         return self._blueFood
 
+    def getNumBlueFood(self):
+        """
+        Get the amount of food left on the blue side (the food blue is protecting).
+        """
+
+        return self._numBlueFood
+
+    def getNumRedFood(self):
+        """
+        Get the amount of food left on the red side (the food red is protecting).
+        """
+
+        return self._numRedFood
+
     def getBlueTeamIndices(self):
         """
         Returns a list of the agent index numbers for the agents on the blue team.
@@ -215,7 +222,7 @@ class CaptureGameState(AbstractGameState):
         Red is on the left side, blue on the right.
         """
 
-        return position[0] < int(self._layout.width / 2)
+        return position[0] < self._redWidth
 
     def isOnRedTeam(self, agentIndex):
         """
@@ -224,15 +231,52 @@ class CaptureGameState(AbstractGameState):
 
         return self._teams[agentIndex]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    # Override
+    def _getCodecExtra(self):
+        return (self._timeleft,)
+
+    # Override
+    def _setCodecExtra(self, values):
+        (self._timeleft,) = values
+
+        # Each side's food and capsules are just the decoded ones split by the layout.
+        layout = getCaptureLayout(self._layout)
+        width = self._food.getWidth()
+        height = self._food.getHeight()
+        foodBits = self._food.getBits()
+
+        self._redFood = BitGrid.fromBits(width, height, foodBits & layout.redMask.getBits())
+        self._blueFood = BitGrid.fromBits(width, height, foodBits & layout.blueMask.getBits())
+        self._numRedFood = self._redFood.count()
+        self._numBlueFood = self._blueFood.count()
+
+        self._redCapsules = [capsule for capsule in self._capsules if self.isOnRedSide(capsule)]
+        self._blueCapsules = [capsule for capsule in self._capsules
+                if not self.isOnRedSide(capsule)]
+
+    # Override
+    def _getUndoRecord(self):
+        return (super()._getUndoRecord(), self._timeleft,
+                self._redFood, self._blueFood, self._numRedFood, self._numBlueFood,
+                self._redCapsules, self._blueCapsules)
+
+    # Override
+    def _restoreUndoRecord(self, record):
+        (baseRecord, self._timeleft, self._redFood, self._blueFood,
+            self._numRedFood, self._numBlueFood, self._redCapsules, self._blueCapsules) = record
+
+        super()._restoreUndoRecord(baseRecord)
+
+    # Override
+    def _applySuccessorAction(self, agentIndex, action, isLegal = False):
         """
         Apply the action to the context state (self).
         """
 
         # Find appropriate rules for the agent.
-        AgentRules.applyAction(self, action, agentIndex)
+        AgentRules.applyAction(self, action, agentIndex, isLegal)
         AgentRules.checkDeath(self, agentIndex)
-        AgentRules.decrementTimer(self.getAgentState(agentIndex))
+        AgentRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Book keeping.
         self._lastAgentMoved = agentIndex
@@ -255,8 +299,8 @@ class CaptureRules:
         game.state = initState
         game.length = length
 
-        self._totalBlueFood = initState.getBlueFood().count()
-        self._totalRedFood = initState.getRedFood().count()
+        self._totalBlueFood = initState.getNumBlueFood()
+        self._totalRedFood = initState.getNumRedFood()
 
         return game
 
@@ -279,10 +323,10 @@ class CaptureRules:
         redWin = False
         blueWin = False
 
-        if (state.getRedFood().count() <= MIN_FOOD):
+        if (state.getNumRedFood() <= MIN_FOOD):
             logging.info("The Blue team ate all but %d of the opponents' dots." % MIN_FOOD)
             blueWin = True
-        elif (state.getBlueFood().count() <= MIN_FOOD):
+        elif (state.getNumBlueFood() <= MIN_FOOD):
             logging.info("The Red team ate all but %d of the opponents' dots." % MIN_FOOD)
             redWin = True
         else:
@@ -342,20 +386,20 @@ class AgentRules:
         """
 
         agentState = state.getAgentState(agentIndex)
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getLegalActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
-    def applyAction(state, action, agentIndex):
+    def applyAction(state, action, agentIndex, isLegal = False):
         """
         Edits the state to reflect the results of the action.
+        If the caller already knows the action is legal, the legality check is skipped.
         """
 
-        legal = AgentRules.getLegalActions(state, agentIndex)
-        if (action not in legal):
+        if (not isLegal and action not in AgentRules.getLegalActions(state, agentIndex)):
             raise ValueError('Illegal action: ' + str(action))
 
-        agentState = state.getAgentState(agentIndex)
+        agentState = state.getMutableAgentState(agentIndex)
 
         # Update position.
         vector = Actions.directionToVector(action, AgentRules.AGENT_SPEED)
@@ -392,8 +436,8 @@ class AgentRules:
             else:
                 state.addScore(-FOOD_POINTS)
 
-            if ((isRed and state.getBlueFood().count() <= MIN_FOOD)
-                    or (not isRed and state.getRedFood().count() <= MIN_FOOD)):
+            if ((isRed and state.getNumBlueFood() <= MIN_FOOD)
+                    or (not isRed and state.getNumRedFood() <= MIN_FOOD)):
                 state.endGame(True)
 
             return
@@ -414,7 +458,7 @@ class AgentRules:
                 otherTeam = state.getRedTeamIndices()
 
             for agentIndex in otherTeam:
-                state.getAgentState(agentIndex).setScaredTimer(SCARED_TIME)
+                state.getMutableAgentState(agentIndex).setScaredTimer(SCARED_TIME)
 
     @staticmethod
     def decrementTimer(agentState):
@@ -428,7 +472,7 @@ class AgentRules:
 
     @staticmethod
     def checkDeath(state, agentIndex):
-        agentState = state.getAgentState(agentIndex)
+        agentState = state.getMutableAgentState(agentIndex)
 
         if (state.isOnRedTeam(agentIndex)):
             teamPointModifier = 1
@@ -455,7 +499,7 @@ class AgentRules:
             # Otherwise, we are being eatten.
             if (agentState.isBraveGhost() or otherAgentState.isScaredGhost()):
                 state.addScore(teamPointModifier * KILL_POINTS)
-                otherAgentState.respawn()
+                state.getMutableAgentState(otherAgentIndex).respawn()
             else:
                 state.addScore(teamPointModifier * -KILL_POINTS)
                 agentState.respawn()
@@ -536,7 +580,7 @@ def readCommand(argv):
             help = 'make agent 3 (second blue player) a keyboard agent (default: %(default)s)')
 
     parser.add_argument('--max-moves', dest = 'maxMoves',
-            action = 'store', type = int, default = 1200,
+            action = 'store', type = int, default = DEFAULT_LENGTH,
             help = 'set maximum number of moves in a game (default: %(default)s)')
 
     parser.add_argument('--red-args', dest = 'redArgs',
@@ -544,6 +588,11 @@ def readCommand(argv):
             help = 'comma separated arguments to be passed to red team (e.g. \'opt1=val1,opt2\') '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--workers', dest = 'numWorkers',
+            action = 'store', type = int, default = 1,
+            help = 'play games in parallel across this many processes,\n'
+                + 'games played in parallel are not displayed (default: %(default)s)')
+
     options, otherjunk = parser.parse_known_args(argv)
     args = dict()
 
@@ -559,6 +608,26 @@ def readCommand(argv):
     elif options.debug:
         updateLoggingLevel(logging.DEBUG)
 
+    if (options.numWorkers < 1):
+        raise ValueError('The number of workers must be positive.')
+
+    if (options.profileAgents and options.instrumentPath is None):
+        raise ValueError('Profiling agents requires --instrument.')
+
+    if (options.isolateAgents is not None):
+        if (options.keys0 or options.keys1 or options.keys2 or options.keys3):
+            raise ValueError('Keyboard agents cannot be isolated.')
+
+        if (options.isolateAgents == isolation.TIMEOUT_FORFEIT and not options.catchExceptions):
+            raise ValueError('Forfeiting late agents requires --catch-exceptions.')
+
+    if (options.numWorkers > 1):
+        if (options.numTraining > 0):
+            raise ValueError('Training games must be played sequentially (without workers).')
+
+        if (options.keys0 or options.keys1 or options.keys2 or options.keys3):
+            raise ValueError('Keyboard agents cannot be used with workers.')
+
     viewOptions = {
         'gifFPS': options.gifFPS,
         'gifPath': options.gif,
@@ -624,7 +693,7 @@ def readCommand(argv):
         if (options.layout != 'RANDOM'):
             layoutSeed = int(options.layout[6:])
 
-        args['layout'] = Layout(generateMaze(layoutSeed).split('\n'))
+        args['layout'] = CaptureLayout(generateMaze(layoutSeed).split('\n'))
     elif options.layout.lower().find('capture') == -1:
         raise ValueError('You must use a capture layout with capture.py.')
     else:
@@ -633,12 +702,20 @@ def readCommand(argv):
     if (args['layout'] is None):
         raise ValueError('The layout ' + options.layout + ' cannot be found.')
 
+    args['layout'] = getCaptureLayout(args['layout'])
+
     args['length'] = options.maxMoves
     args['numGames'] = options.numGames
     args['numTraining'] = options.numTraining
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['replay'] = options.replay
+    args['numWorkers'] = options.numWorkers
+    args['instrumentPath'] = options.instrumentPath
+    args['profileAgents'] = options.profileAgents
+    args['isolateAgents'] = options.isolateAgents
+    args['redArgs'] = redArgs
+    args['blueArgs'] = blueArgs
 
     return args
 
@@ -660,6 +737,24 @@ def loadAgents(isRed, agentModule, textgraphics, args):
 
     return createTeamFunction(indices[0], indices[1], isRed, **args)
 
+def simulate(layout, agents, seed = None, length = DEFAULT_LENGTH, catchExceptions = False):
+    """
+    Play a single headless game (see `pacai.core.game.Game.isHeadless`) as fast as possible,
+    e.g. for evaluation or training loops.
+    The agents are in index order (red agents are the even indexes).
+    If a seed is given, the random number generator is seeded with it first,
+    so the same seed and agents always play out the same game.
+    Returns a `pacai.core.game.GameResult` with the final state and the move history.
+    """
+
+    if (seed is not None):
+        random.seed(seed)
+
+    game = CaptureRules().newGame(layout, agents, None, length, catchExceptions)
+    game.run()
+
+    return game.getResult()
+
 def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName):
     agents = [DummyAgent(index) for index in range(len(agents))]
     rules = CaptureRules()
@@ -680,66 +775,165 @@ def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamNa
     display.finish()
 
 def runGames(layout, agents, display, length, numGames, record, numTraining,
-        redTeamName, blueTeamName, catchExceptions = False, **kwargs):
+        redTeamName, blueTeamName, catchExceptions = False, numWorkers = 1,
+        redArgs = {}, blueArgs = {}, instrumentPath = None, profileAgents = False,
+        isolateAgents = None, **kwargs):
+    if (numWorkers > 1):
+        games = _runGamesParallel(layout, length, numGames, redTeamName, blueTeamName,
+                catchExceptions, numWorkers, redArgs, blueArgs, instrumentPath, profileAgents,
+                isolateAgents)
+
+        # Workers don't record, so write the replay from the move history of the last game
+        # (the same game that a serial run would leave in the record).
+        if (record and len(games) > 0):
+            with _openRecord(record, layout, agents, length, redTeamName,
+                    blueTeamName) as recorder:
+                recorder.recordMoves(games[-1].moveHistory)
+    else:
+        games = _runGamesSerial(layout, agents, display, length, numGames, record, numTraining,
+                redTeamName, blueTeamName, catchExceptions, instrumentPath, profileAgents,
+                isolateAgents)
+
+    if (len(games) > 0):
+        scores = [game.state.getScore() for game in games]
+        redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
+        blueWinRate = [s < 0 for s in scores].count(True) / float(len(scores))
+        logging.info('Average Score:%s', sum(scores) / float(len(scores)))
+        logging.info('Scores:%s', ', '.join([str(score) for score in scores]))
+        logging.info('Red Win Rate: %d/%d (%.2f)' %
+                ([s > 0 for s in scores].count(True), len(scores), redWinRate))
+        logging.info('Blue Win Rate: %d/%d (%.2f)' %
+                ([s < 0 for s in scores].count(True), len(scores), blueWinRate))
+        logging.info('Record: %s',
+                ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
+
+        agentTimes = [sum(times) / len(games)
+                for times in zip(*[game.totalAgentTimes for game in games])]
+        logging.info('Average Agent Times: %s',
+                ', '.join(['%d: %.3fs' % (index, time) for (index, time) in enumerate(agentTimes)]))
+
+    return games
+
+def _runGamesSerial(layout, agents, display, length, numGames, record, numTraining,
+        redTeamName, blueTeamName, catchExceptions, instrumentPath, profileAgents,
+        isolateAgents = None):
     rules = CaptureRules()
     games = []
 
-    nullView = None
+    # The game may get isolated stand-ins, but the record gets the real agents.
+    gameAgents = agents
+    if (isolateAgents is not None):
+        gameAgents = isolation.isolateAgents(agents, rules, isolateAgents)
+
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
-        nullView = CaptureNullView()
 
-    for i in range(numGames):
-        isTraining = (i < numTraining)
+    try:
+        for i in range(numGames):
+            isTraining = (i < numTraining)
 
-        if (isTraining):
-            # Suppress graphics for training.
-            gameDisplay = nullView
-        else:
-            gameDisplay = display
+            if (isTraining):
+                # Suppress graphics for training.
+                gameDisplay = None
+            else:
+                gameDisplay = display
 
-        g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions)
-        g.run()
+            g = rules.newGame(layout, gameAgents, gameDisplay, length, catchExceptions)
+            instrumentGame(g, instrumentPath, i, numGames, profileAgents)
 
-        if (not isTraining):
-            games.append(g)
+            # Record the game as it is played.
+            g.recorder = _openRecord(record, layout, agents, length, redTeamName, blueTeamName)
+            try:
+                g.run()
+            finally:
+                if (g.recorder is not None):
+                    g.recorder.close()
+                    logging.info("Game recorded to: '%s'." % (g.recorder.getPath()))
 
-        g.record = None
-        if record:
-            components = {
-                'layout': layout,
-                'agents': [agent.__class__.__name__ for agent in agents],
-                'actions': g.moveHistory,
-                'length': length,
-                'redTeamName': redTeamName,
-                'blueTeamName': blueTeamName
-            }
+            if (not isTraining):
+                games.append(g)
+    finally:
+        isolation.closeAgents(gameAgents)
 
-            path = 'replay'
-            if (isinstance(record, str)):
-                path = record
+    return games
 
-            g.record = pickle.dumps(components)
-            with open(path, 'wb') as file:
-                file.write(g.record)
+def _openRecord(record, layout, agents, length, redTeamName, blueTeamName):
+    """
+    Get a `pacai.core.replay.ReplayWriter` for the record option (or None if we are not recording).
+    """
 
-            logging.info("Game recorded to: '%s'." % (path))
+    if (not record):
+        return None
 
-    if (numGames > 0):
-        scores = [game.state.getScore() for game in games]
-        redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
-        blueWinRate = [s < 0 for s in scores].count(True) / float(len(scores))
-        logging.info('Average Score:%s', sum(scores) / float(len(scores)))
-        logging.info('Scores:%s', ', '.join([str(score) for score in scores]))
-        logging.info('Red Win Rate: %d/%d (%.2f)' %
-                ([s > 0 for s in scores].count(True), len(scores), redWinRate))
-        logging.info('Blue Win Rate: %d/%d (%.2f)' %
-                ([s < 0 for s in scores].count(True), len(scores), blueWinRate))
-        logging.info('Record: %s',
-                ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
+    path = 'replay'
+    if (isinstance(record, str)):
+        path = record
 
-    return games
+    return ReplayWriter(path, layout, [agent.__class__.__name__ for agent in agents],
+            game = 'capture', length = length,
+            redTeamName = redTeamName, blueTeamName = blueTeamName)
+
+def _runGamesParallel(layout, length, numGames, redTeamName, blueTeamName, catchExceptions,
+        numWorkers, redArgs, blueArgs, instrumentPath, profileAgents, isolateAgents = None):
+    """
+    Play games across a pool of worker processes.
+    Agents are rebuilt in each worker from their team names,
+    and every game gets its own seed (drawn from the seeded random number generator),
+    so a tournament is reproducible no matter how the games are scheduled.
+    Returns a `pacai.core.game.GameResult` for each game (in order).
+    """
+
+    logging.info('Playing %d games across %d workers.' % (numGames, numWorkers))
 
+    jobs = []
+    for i in range(numGames):
+        jobs.append({
+            'seed': random.randint(0, 2**32),
+            'layout': layout,
+            'length': length,
+            'redTeamName': redTeamName,
+            'redArgs': redArgs,
+            'blueTeamName': blueTeamName,
+            'blueArgs': blueArgs,
+            'catchExceptions': catchExceptions,
+            'gameIndex': i,
+            'numGames': numGames,
+            'instrumentPath': instrumentPath,
+            'profileAgents': profileAgents,
+            'isolateAgents': isolateAgents,
+        })
+
+    # Unlike a multiprocessing pool, the workers here can start processes (for isolated agents).
+    with concurrent.futures.ProcessPoolExecutor(max_workers = min(numWorkers,
+            max(1, numGames))) as pool:
+        return list(pool.map(_playParallelGame, jobs))
+
+def _playParallelGame(job):
+    """
+    Play a single game inside a worker process.
+    """
+
+    random.seed(job['seed'])
+
+    redAgents = loadAgents(True, job['redTeamName'], True, job['redArgs'])
+    blueAgents = loadAgents(False, job['blueTeamName'], True, job['blueArgs'])
+    agents = sum([list(el) for el in zip(redAgents, blueAgents)], [])
+
+    rules = CaptureRules()
+
+    if (job['isolateAgents'] is not None):
+        agents = isolation.isolateAgents(agents, rules, job['isolateAgents'])
+
+    try:
+        game = rules.newGame(job['layout'], agents, None, job['length'], job['catchExceptions'])
+        instrumentGame(game, job['instrumentPath'], job['gameIndex'], job['numGames'],
+                job['profileAgents'])
+
+        game.run()
+    finally:
+        isolation.closeAgents(agents)
+
+    return game.getResult()
 
 def main(argv):
     """
@@ -756,12 +950,20 @@ def main(argv):
     if (options['replay'] is not None):
         logging.info('Replaying recorded game %s.' % options['replay'])
 
-        recorded = None
-        with open(options['replay'], 'rb') as file:
-            recorded = pickle.load(file)
+        if (isReplayFile(options['replay'])):
+            with ReplayReader(options['replay']) as reader:
+                metadata = reader.getMetadata()
+                replayGame(reader.getLayout(), reader.getAgentNames(), reader,
+                        options['display'], metadata['length'],
+                        metadata['redTeamName'], metadata['blueTeamName'])
+        else:
+            # Older replays are pickled dicts.
+            recorded = None
+            with open(options['replay'], 'rb') as file:
+                recorded = pickle.load(file)
 
-        recorded['display'] = options['display']
-        replayGame(**recorded)
+            recorded['display'] = options['display']
+            replayGame(**recorded)
 
         return
 
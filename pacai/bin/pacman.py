@@ -7,6 +7,7 @@ Use WASD (or the arrow keys) to move.
 Have fun!
 """
 
+import concurrent.futures
 import logging
 import os
 import pickle
@@ -17,12 +18,16 @@ from pacai.agents.base import BaseAgent
 from pacai.agents.ghost.random import RandomGhost
 from pacai.agents.greedy import GreedyAgent
 from pacai.bin.arguments import getParser
+from pacai.core import isolation
 from pacai.core.actions import Actions
-from pacai.core.directions import Directions
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
+from pacai.core.instrumentation import instrumentGame
 from pacai.core.gamestate import AbstractGameState
 from pacai.core.layout import getLayout
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import ReplayWriter
+from pacai.core.replay import isReplayFile
 from pacai.ui.pacman.null import PacmanNullView
 from pacai.ui.pacman.text import PacmanTextView
 from pacai.util.logs import initLogging
@@ -118,23 +123,24 @@ class PacmanGameState(AbstractGameState):
 
         return self._agentStates[PACMAN_AGENT_INDEX]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    # Override
+    def _applySuccessorAction(self, agentIndex, action, isLegal = False):
         """
         Apply the action to the context state (self).
         """
 
         # Let the agent's logic deal with its action's effects on the board.
         if (agentIndex == PACMAN_AGENT_INDEX):
-            PacmanRules.applyAction(self, action)
+            PacmanRules.applyAction(self, action, isLegal)
         else:
-            GhostRules.applyAction(self, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex, isLegal)
 
         # Time passes.
         if (agentIndex == PACMAN_AGENT_INDEX):
             # Penalty for waiting around.
             self.addScore(-TIME_PENALTY)
         else:
-            GhostRules.decrementTimer(self.getAgentState(agentIndex))
+            GhostRules.decrementTimer(self.getMutableAgentState(agentIndex))
 
         # Resolve multi-agent effects.
         GhostRules.checkDeath(self, agentIndex)
@@ -217,20 +223,20 @@ class PacmanRules:
         """
 
         agentState = state.getPacmanState()
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getLegalActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
-    def applyAction(state, action):
+    def applyAction(state, action, isLegal = False):
         """
         Edits the state to reflect the results of the action.
+        If the caller already knows the action is legal, the legality check is skipped.
         """
 
-        legal = PacmanRules.getLegalActions(state)
-        if (action not in legal):
+        if (not isLegal and action not in PacmanRules.getLegalActions(state)):
             raise ValueError('Illegal pacman action: ' + str(action))
 
-        pacmanState = state.getPacmanState()
+        pacmanState = state.getMutableAgentState(PACMAN_AGENT_INDEX)
 
         # Update position.
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -260,8 +266,8 @@ class PacmanRules:
             state.eatCapsule(x, y)
 
             # Reset all ghosts' scared timers.
-            for ghostState in state.getGhostStates():
-                ghostState.setScaredTimer(SCARED_TIME)
+            for index in state.getGhostIndexes():
+                state.getMutableAgentState(index).setScaredTimer(SCARED_TIME)
 
 class GhostRules:
     """
@@ -278,25 +284,15 @@ class GhostRules:
         """
 
         agentState = state.getGhostState(ghostIndex)
-        possibleActions = Actions.getPossibleActions(agentState.getPosition(),
-                agentState.getDirection(), state.getWalls())
-        reverse = Actions.reverseDirection(agentState.getDirection())
-
-        if (Directions.STOP in possibleActions):
-            possibleActions.remove(Directions.STOP)
-
-        if (reverse in possibleActions and len(possibleActions) > 1):
-            possibleActions.remove(reverse)
-
-        return possibleActions
+        return state.getInitialLayout().getGhostLegalActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
-    def applyAction(state, action, ghostIndex):
-        legal = GhostRules.getLegalActions(state, ghostIndex)
-        if (action not in legal):
+    def applyAction(state, action, ghostIndex, isLegal = False):
+        if (not isLegal and action not in GhostRules.getLegalActions(state, ghostIndex)):
             raise ValueError('Illegal ghost action: ' + str(action))
 
-        ghostState = state.getGhostState(ghostIndex)
+        ghostState = state.getMutableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if (ghostState.isScared()):
             speed /= 2.0
@@ -341,7 +337,7 @@ class GhostRules:
         if (ghostState.isScared()):
             # Pacman ate a ghost.
             state.addScore(GHOST_POINTS)
-            ghostState.respawn()
+            state.getMutableAgentState(agentIndex).respawn()
         elif (not state.isOver()):
             # A ghost ate pacman.
             state.addScore(LOSE_POINTS)
@@ -415,6 +411,11 @@ def readCommand(argv):
             help = 'maximum time limit (seconds) an agent can spend computing per game '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--workers', dest = 'numWorkers',
+            action = 'store', type = int, default = 1,
+            help = 'play games in parallel across this many processes,\n'
+                + 'games played in parallel are not displayed (default: %(default)s)')
+
     options, otherjunk = parser.parse_known_args(argv)
     args = dict()
 
@@ -430,6 +431,28 @@ def readCommand(argv):
     elif options.debug:
         updateLoggingLevel(logging.DEBUG)
 
+    if (options.numWorkers < 1):
+        raise ValueError('The number of workers must be positive.')
+
+    if (options.profileAgents and options.instrumentPath is None):
+        raise ValueError('Profiling agents requires --instrument.')
+
+    if (options.isolateAgents is not None):
+        if ('KeyboardAgent' in options.pacman):
+            raise ValueError('Keyboard agents cannot be isolated.')
+
+        if (options.isolateAgents == isolation.TIMEOUT_FORFEIT and not options.catchExceptions):
+            raise ValueError('Forfeiting late agents requires --catch-exceptions.')
+
+    if (options.numWorkers > 1):
+        # Learning agents carry what they learned from one game to the next,
+        # so training has to happen in order.
+        if (options.numTraining > 0):
+            raise ValueError('Training games must be played sequentially (without workers).')
+
+        if ('KeyboardAgent' in options.pacman):
+            raise ValueError('Keyboard agents cannot be used with workers.')
+
     # If seed value is not entered generate a random seed value.
     seed = options.seed
     if seed is None:
@@ -458,6 +481,9 @@ def readCommand(argv):
         options.numQuiet = int(agentOpts['numTrain'])
         options.numIgnore = int(agentOpts['numTrain'])
 
+    # Workers rebuild the agents themselves, so keep the options before any keyboard is added.
+    args['pacmanArgs'] = agentOpts.copy()
+
     viewOptions = {
         'gifFPS': options.gifFPS,
         'gifPath': options.gif,
@@ -485,9 +511,34 @@ def readCommand(argv):
     args['pacman'] = BaseAgent.loadAgent(options.pacman, PACMAN_AGENT_INDEX, agentOpts)
     args['record'] = options.record
     args['timeout'] = options.timeout
+    args['numWorkers'] = options.numWorkers
+    args['instrumentPath'] = options.instrumentPath
+    args['profileAgents'] = options.profileAgents
+    args['isolateAgents'] = options.isolateAgents
+    args['pacmanName'] = options.pacman
+    args['ghostName'] = options.ghost
 
     return args
 
+def simulate(layout, agents, seed = None, timeout = 30, catchExceptions = False):
+    """
+    Play a single headless game (see `pacai.core.game.Game.isHeadless`) as fast as possible,
+    e.g. for evaluation or training loops.
+    The agents are pacman followed by the ghosts.
+    If a seed is given, the random number generator is seeded with it first,
+    so the same seed and agents always play out the same game.
+    Returns a `pacai.core.game.GameResult` with the final state and the move history.
+    """
+
+    if (seed is not None):
+        random.seed(seed)
+
+    game = ClassicGameRules(timeout).newGame(layout, agents[0], agents[1:], None,
+            catchExceptions)
+    game.run()
+
+    return game.getResult()
+
 def replayGame(layout, actions, display):
     rules = ClassicGameRules()
 
@@ -512,49 +563,157 @@ def replayGame(layout, actions, display):
     display.finish()
 
 def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraining = 0,
-        catchExceptions = False, timeout = 30, **kwargs):
+        catchExceptions = False, timeout = 30, numWorkers = 1,
+        pacmanName = None, pacmanArgs = {}, ghostName = None,
+        instrumentPath = None, profileAgents = False, isolateAgents = None, **kwargs):
+    if (numWorkers > 1):
+        games = _runGamesParallel(layout, numGames, catchExceptions, timeout, numWorkers,
+                pacmanName, pacmanArgs, ghostName, len(ghosts), instrumentPath, profileAgents,
+                isolateAgents)
+
+        # Workers don't record, so write the replay from the move history of the last game
+        # (the same game that a serial run would leave in the record).
+        if (record and len(games) > 0):
+            agents = [pacman] + ghosts[:layout.getNumGhosts()]
+            with _openRecord(record, layout, agents) as recorder:
+                recorder.recordMoves(games[-1].moveHistory)
+    else:
+        games = _runGamesSerial(layout, pacman, ghosts, display, numGames, record, numTraining,
+                catchExceptions, timeout, instrumentPath, profileAgents, isolateAgents)
+
+    if (len(games) > 0):
+        scores = [game.state.getScore() for game in games]
+        wins = [game.state.isWin() for game in games]
+        winRate = wins.count(True) / float(len(wins))
+        logging.info('Average Score: %s', sum(scores) / float(len(scores)))
+        logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
+        logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
+        logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
+
+    return games
+
+def _runGamesSerial(layout, pacman, ghosts, display, numGames, record, numTraining,
+        catchExceptions, timeout, instrumentPath, profileAgents, isolateAgents = None):
     rules = ClassicGameRules(timeout)
     games = []
 
-    nullView = None
+    # The game may get isolated stand-ins, but the record gets the real agents.
+    gamePacman = pacman
+    gameGhosts = ghosts
+    if (isolateAgents is not None):
+        [gamePacman, *gameGhosts] = isolation.isolateAgents([pacman] + ghosts, rules,
+                isolateAgents)
+
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
-        nullView = PacmanNullView()
 
+    try:
+        for i in range(numGames):
+            isTraining = (i < numTraining)
+
+            if (isTraining):
+                # Suppress graphics for training.
+                gameDisplay = None
+            else:
+                gameDisplay = display
+
+            game = rules.newGame(layout, gamePacman, gameGhosts, gameDisplay, catchExceptions)
+            instrumentGame(game, instrumentPath, i, numGames, profileAgents)
+
+            # Record the game as it is played.
+            game.recorder = _openRecord(record, layout,
+                    [pacman] + ghosts[:layout.getNumGhosts()])
+            try:
+                game.run()
+            finally:
+                if (game.recorder is not None):
+                    game.recorder.close()
+
+            if (not isTraining):
+                games.append(game)
+    finally:
+        isolation.closeAgents([gamePacman] + gameGhosts)
+
+    return games
+
+def _openRecord(record, layout, agents):
+    """
+    Get a `pacai.core.replay.ReplayWriter` for the record option (or None if we are not recording).
+    """
+
+    if (not record):
+        return None
+
+    path = 'pacman.replay'
+    if (isinstance(record, str)):
+        path = record
+
+    return ReplayWriter(path, layout, [agent.__class__.__name__ for agent in agents],
+            game = 'pacman')
+
+def _runGamesParallel(layout, numGames, catchExceptions, timeout, numWorkers,
+        pacmanName, pacmanArgs, ghostName, numGhosts, instrumentPath, profileAgents,
+        isolateAgents = None):
+    """
+    Play independent games across a pool of worker processes.
+    Agents are rebuilt in each worker from their names,
+    and every game gets its own seed (drawn from the seeded random number generator),
+    so a batch is reproducible no matter how the games are scheduled.
+    Returns a `pacai.core.game.GameResult` for each game (in order).
+    """
+
+    logging.info('Playing %d games across %d workers.' % (numGames, numWorkers))
+
+    jobs = []
     for i in range(numGames):
-        isTraining = (i < numTraining)
+        jobs.append({
+            'seed': random.randint(0, 2**32),
+            'layout': layout,
+            'pacmanName': pacmanName,
+            'pacmanArgs': pacmanArgs,
+            'ghostName': ghostName,
+            'numGhosts': numGhosts,
+            'catchExceptions': catchExceptions,
+            'timeout': timeout,
+            'gameIndex': i,
+            'numGames': numGames,
+            'instrumentPath': instrumentPath,
+            'profileAgents': profileAgents,
+            'isolateAgents': isolateAgents,
+        })
+
+    # Unlike a multiprocessing pool, the workers here can start processes (for isolated agents).
+    with concurrent.futures.ProcessPoolExecutor(max_workers = min(numWorkers,
+            max(1, numGames))) as pool:
+        return list(pool.map(_playParallelGame, jobs))
+
+def _playParallelGame(job):
+    """
+    Play a single game inside a worker process.
+    """
 
-        if (isTraining):
-            # Suppress graphics for training.
-            gameDisplay = nullView
-        else:
-            gameDisplay = display
+    random.seed(job['seed'])
 
-        game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions)
-        game.run()
+    pacman = BaseAgent.loadAgent(job['pacmanName'], PACMAN_AGENT_INDEX, job['pacmanArgs'])
+    ghosts = [BaseAgent.loadAgent(job['ghostName'], i + 1) for i in range(job['numGhosts'])]
 
-        if (not isTraining):
-            games.append(game)
+    agents = [pacman] + ghosts
 
-        if (record):
-            path = 'pacman.replay'
-            if (isinstance(record, str)):
-                path = record
+    rules = ClassicGameRules(job['timeout'])
 
-            components = {'layout': layout, 'actions': game.moveHistory}
-            with open(path, 'wb') as file:
-                pickle.dump(components, file)
+    if (job['isolateAgents'] is not None):
+        agents = isolation.isolateAgents(agents, rules, job['isolateAgents'])
 
-    if ((numGames - numTraining) > 0):
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        logging.info('Average Score: %s', sum(scores) / float(len(scores)))
-        logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
-        logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
-        logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
+    try:
+        game = rules.newGame(job['layout'], agents[0], agents[1:], None, job['catchExceptions'])
+        instrumentGame(game, job['instrumentPath'], job['gameIndex'], job['numGames'],
+                job['profileAgents'])
 
-    return games
+        game.run()
+    finally:
+        isolation.closeAgents(agents)
+
+    return game.getResult()
 
 def main(argv):
     """
@@ -571,12 +730,17 @@ def main(argv):
     if (args['gameToReplay'] is not None):
         logging.info('Replaying recorded game %s.' % args['gameToReplay'])
 
-        recorded = None
-        with open(args['gameToReplay'], 'rb') as file:
-            recorded = pickle.load(file)
+        if (isReplayFile(args['gameToReplay'])):
+            with ReplayReader(args['gameToReplay']) as reader:
+                replayGame(reader.getLayout(), reader, args['display'])
+        else:
+            # Older replays are pickled dicts.
+            recorded = None
+            with open(args['gameToReplay'], 'rb') as file:
+                recorded = pickle.load(file)
 
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+            recorded['display'] = args['display']
+            replayGame(**recorded)
 
         return
 
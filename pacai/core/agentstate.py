@@ -1,6 +1,7 @@
 from pacai.core.actions import Actions
 from pacai.core.directions import Directions
 from pacai.util import util
+from pacai.util import zobrist
 
 class AgentState:
     """
@@ -9,36 +10,64 @@ class AgentState:
     The convention for positions, like a graph, is that (0, 0) is the lower left corner,
     x increases horizontally and y increases vertically.
     Therefore, north is the direction of increasing y, or (0, 1).
+
+    The hash of an agent state is a Zobrist hash (see `pacai.util.zobrist`)
+    that is updated every time one of the fields changes.
     """
 
+    # Agent states are copied for every successor, so keep them small and cheap to copy.
+    __slots__ = ('_start', '_position', '_gridPosition', '_direction', '_isPacman',
+            '_scaredTimer', '_hash')
+
     def __init__(self, position, direction, isPacman):
         # Save the starting information for later use.
-        self._startPosition = position
-        self._startDirection = direction
-        self._startIsPacman = isPacman
+        # It never changes, so copies share it.
+        self._start = (position, direction, isPacman)
 
         self._position = position
+        self._gridPosition = None
         self._direction = direction
 
         self._isPacman = isPacman
         self._scaredTimer = 0
 
+        self._hash = (zobrist.getKey('position', position)
+                ^ zobrist.getKey('direction', direction)
+                ^ zobrist.getKey('pacman', isPacman)
+                ^ zobrist.getKey('scared', 0))
+
     def copy(self):
-        state = AgentState(self._startPosition, self._startDirection, self._startIsPacman)
+        # Skip the constructor, there is nothing to recompute.
+        state = AgentState.__new__(AgentState)
 
-        state._isPacman = self._isPacman
+        state._start = self._start
         state._position = self._position
+        state._gridPosition = self._gridPosition
         state._direction = self._direction
+        state._isPacman = self._isPacman
         state._scaredTimer = self._scaredTimer
+        state._hash = self._hash
 
         return state
 
     def decrementScaredTimer(self):
-        self._scaredTimer = max(0, self._scaredTimer - 1)
+        self._setScaredTimer(max(0, self._scaredTimer - 1))
 
     def getDirection(self):
         return self._direction
 
+    def getGridPosition(self):
+        """
+        Get the position as ints (the cell the agent is in).
+        Agents moving at half speed can be between cells,
+        this is the cell they are moving out of.
+        """
+
+        if (self._gridPosition is None and self._position is not None):
+            self._gridPosition = (int(self._position[0]), int(self._position[1]))
+
+        return self._gridPosition
+
     def getPosition(self):
         return self._position
 
@@ -68,27 +97,44 @@ class AgentState:
         return (self.isGhost() and self.isScared())
 
     def setIsPacman(self, isPacman):
+        if (isPacman == self._isPacman):
+            return
+
+        self._hash ^= zobrist.getKey('pacman', self._isPacman) ^ zobrist.getKey('pacman', isPacman)
         self._isPacman = isPacman
 
     def setScaredTimer(self, timer):
-        self._scaredTimer = timer
+        self._setScaredTimer(timer)
 
     def snapToNearestPoint(self):
         """
         Move the agent to the nearest point to its current location.
         """
 
-        self._position = util.nearestPoint(self._position)
+        self._setPosition(util.nearestPoint(self._position))
+
+    def restore(self, position, direction, isPacman, scaredTimer):
+        """
+        Put this agent into the given configuration (its start stays the same),
+        e.g. when decoding a state (see `pacai.core.statecodec`).
+        """
+
+        self._setPosition(position)
+        self._setDirection(direction)
+        self.setIsPacman(isPacman)
+        self._setScaredTimer(scaredTimer)
 
     def respawn(self):
         """
         This agent was killed, respawn it at the start as a pacman.
         """
 
-        self._position = self._startPosition
-        self._direction = self._startDirection
-        self._isPacman = self._startIsPacman
-        self._scaredTimer = 0
+        (position, direction, isPacman) = self._start
+
+        self._setPosition(position)
+        self._setDirection(direction)
+        self.setIsPacman(isPacman)
+        self._setScaredTimer(0)
 
     def updatePosition(self, vector):
         """
@@ -98,12 +144,36 @@ class AgentState:
         x, y = self._position
         dx, dy = vector
 
-        self._position = (x + dx, y + dy)
+        self._setPosition((x + dx, y + dy))
 
         direction = Actions.vectorToDirection(vector)
         if (direction != Directions.STOP):
             # If this is a zero vector, face the same direction as before.
-            self._direction = direction
+            self._setDirection(direction)
+
+    def _setDirection(self, direction):
+        if (direction == self._direction):
+            return
+
+        self._hash ^= (zobrist.getKey('direction', self._direction)
+                ^ zobrist.getKey('direction', direction))
+        self._direction = direction
+
+    def _setPosition(self, position):
+        if (position == self._position):
+            return
+
+        self._hash ^= (zobrist.getKey('position', self._position)
+                ^ zobrist.getKey('position', position))
+        self._position = position
+        self._gridPosition = None
+
+    def _setScaredTimer(self, timer):
+        if (timer == self._scaredTimer):
+            return
+
+        self._hash ^= zobrist.getKey('scared', self._scaredTimer) ^ zobrist.getKey('scared', timer)
+        self._scaredTimer = timer
 
     def __eq__(self, other):
         if (other is None):
@@ -115,7 +185,7 @@ class AgentState:
                 and self._scaredTimer == other._scaredTimer)
 
     def __hash__(self):
-        return util.buildHash(self._position, self._direction, self._isPacman, self._scaredTimer)
+        return self._hash
 
     def __str__(self):
         typeString = 'Ghost'
@@ -1,5 +1,4 @@
-from pacai.core.search.position import PositionSearchProblem
-from pacai.student import search
+from pacai.core.mazeGraph import getMazeGraph
 
 def manhattan(position1, position2):
     """
@@ -17,10 +16,8 @@ def euclidean(position1, position2):
 
 def maze(position1, position2, gameState):
     """
-    Returns the maze distance between any two positions,
-    using the search functions you have already built.
-
-    WARNING: `pacai.student.search.breadthFirstSearch` must already be implemted.
+    Returns the maze distance between any two positions
+    (using the `pacai.core.mazeGraph.MazeGraph` of the game's layout).
 
     Example usage: `distance.maze((2, 4), (5, 6), gameState)`.
     """
@@ -36,6 +33,8 @@ def maze(position1, position2, gameState):
     if (walls[x2][y2]):
         raise ValueError('Position2 is a wall: ' + str(position2))
 
-    prob = PositionSearchProblem(gameState, start = position1, goal = position2)
+    distance = getMazeGraph(gameState.getInitialLayout()).getDistance(position1, position2)
+    if (distance is None):
+        raise ValueError('No path from %s to %s.' % (str(position1), str(position2)))
 
-    return len(search.breadthFirstSearch(prob))
+    return distance
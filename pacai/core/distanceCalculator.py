@@ -1,10 +1,32 @@
+import array
+import hashlib
+import logging
+import mmap
+import os
+import struct
 import sys
+import tempfile
 
 from pacai.core.distance import manhattan
-from pacai.util import priorityQueue
 
 DEFAULT_DISTANCE = 10000
 
+# Marks a pair of cells that have no path between them in a `DistanceTable`.
+UNREACHABLE = -1
+
+# If this environment variable is set to a directory,
+# distance tables are also saved there so that other games (and processes) can reuse them.
+# Cached tables are trusted, so the directory should only be writable by the current user
+# (it is created with 0700 permissions, and files owned by anyone else are ignored).
+# The on-disk cache is off when the variable is unset or empty.
+CACHE_DIR_ENV_VAR = 'PACAI_DISTANCE_CACHE_DIR'
+CACHE_DIR_MODE = 0o700
+
+CACHE_FILE_EXTENSION = '.dist'
+CACHE_FILE_MAGIC = b'PACDIST' + sys.byteorder[0].upper().encode('ascii')
+CACHE_HEADER = struct.Struct('=8sI')
+CACHE_CELL = struct.Struct('=HH')
+
 class Distancer(object):
     """
     A class for computing and caching the shortest path between any two points in a given maze.
@@ -48,11 +70,10 @@ class Distancer(object):
         return bestDistance
 
     def getDistanceOnGrid(self, pos1, pos2):
-        key = (pos1, pos2)
-        if key in self._distances:
-            return self._distances[key]
-
-        raise Exception("Position not in grid: " + str(key))
+        try:
+            return self._distances.getDistance(pos1, pos2)
+        except KeyError:
+            raise Exception("Position not in grid: " + str((pos1, pos2)))
 
     def isReadyForMazeDistance(self):
         return (self._distances is not None)
@@ -78,79 +99,237 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
-distanceMap = {}
+# All the distance tables loaded by this process: {layoutKey: DistanceTable, ...}.
+_distanceTables = {}
 
 class DistanceCalculator:
     def __init__(self, layout, distancer):
         self.layout = layout
         self.distancer = distancer
-        self.cache = {}
 
     def run(self):
-        if self.layout.walls not in self.cache:
-            self.cache[self.layout.walls] = computeDistances(self.layout)
+        self.distancer._distances = getDistanceTable(self.layout)
 
-        self.distancer._distances = self.cache[self.layout.walls]
+def getDistanceTable(layout):
+    """
+    Get the `DistanceTable` for a layout.
+    Tables are shared by every layout with the same walls in this process,
+    and can also be saved to disk (see `CACHE_DIR_ENV_VAR`) to share them between processes.
+    """
 
-def computeDistances(layout):
+    key = getLayoutKey(layout)
+
+    table = _distanceTables.get(key)
+    if (table is not None):
+        return table
+
+    cacheDir = os.environ.get(CACHE_DIR_ENV_VAR, '')
+    path = None
+    if (cacheDir != ''):
+        path = os.path.join(cacheDir, key + CACHE_FILE_EXTENSION)
+
+    if (path is not None and os.path.isfile(path)):
+        try:
+            table = DistanceTable.load(path, layout.walls.asList(False))
+        except (OSError, ValueError) as ex:
+            logging.debug("Unable to load cached distances from '%s': %s" % (path, ex))
+
+    if (table is None):
+        table = computeDistances(layout)
+
+        if (path is not None):
+            try:
+                table.save(path)
+            except OSError as ex:
+                logging.debug("Unable to cache distances to '%s': %s" % (path, ex))
+
+    _distanceTables[key] = table
+    return table
+
+def getLayoutKey(layout):
     """
-    Runs UCS to all other positions from each position.
+    Get a key that identifies a layout's walls (the only thing maze distances depend on).
     """
 
-    distances = {}
-    allNodes = layout.walls.asList(False)
+    walls = layout.walls
+    width = walls.getWidth()
+    height = walls.getHeight()
 
-    for source in allNodes:
-        dist = {}
-        closed = {}
+    bits = 0
+    for (x, y) in walls.asList():
+        bits |= 1 << (x * height + y)
 
-        for node in allNodes:
-            dist[node] = sys.maxsize
+    text = '%d:%d:%x' % (width, height, bits)
+    return hashlib.sha1(text.encode('ascii')).hexdigest()
 
-        queue = priorityQueue.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
+def computeDistances(layout):
+    """
+    Runs a BFS from each open position to all other positions.
+    All moves cost the same, so a BFS finds the same distances as a UCS would
+    (without needing a priority queue).
+    Returns a `DistanceTable`.
+    """
+
+    cells = layout.walls.asList(False)
+    cellIds = {cell: index for (index, cell) in enumerate(cells)}
+    numCells = len(cells)
 
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
+    # Build the adjacency lists (by cell id) once, instead of checking walls for every source.
+    neighbors = []
+    for (x, y) in cells:
+        adjacent = []
 
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
+        for other in [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]:
+            if (other in cellIds):
+                adjacent.append(cellIds[other])
 
-            if not layout.isWall((x, y + 1)):
-                adjacent.append((x, y + 1))
+        neighbors.append(adjacent)
 
-            if not layout.isWall((x, y - 1)):
-                adjacent.append((x, y - 1))
+    distances = array.array('i', [UNREACHABLE]) * (numCells * numCells)
 
-            if not layout.isWall((x + 1, y)):
-                adjacent.append((x + 1, y))
+    for source in range(numCells):
+        offset = source * numCells
+        distances[offset + source] = 0
 
-            if not layout.isWall((x - 1, y)):
-                adjacent.append((x - 1, y))
+        depth = 0
+        frontier = [source]
 
-            for other in adjacent:
-                if other not in dist:
-                    continue
+        while (len(frontier) > 0):
+            depth += 1
+            nextFrontier = []
 
-                oldDist = dist[other]
-                newDist = nodeDist + 1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
+            for node in frontier:
+                for other in neighbors[node]:
+                    if (distances[offset + other] == UNREACHABLE):
+                        distances[offset + other] = depth
+                        nextFrontier.append(other)
 
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
+            frontier = nextFrontier
 
-    return distances
+    return DistanceTable(cells, distances)
 
 def getDistanceOnGrid(distances, pos1, pos2):
-    key = (pos1, pos2)
-    if key in distances:
-        return distances[key]
+    try:
+        return distances.getDistance(pos1, pos2)
+    except KeyError:
+        return DEFAULT_DISTANCE
+
+class DistanceTable(object):
+    """
+    The maze distances between every pair of open positions in a layout.
+
+    Each open position is given an id,
+    and all the distances are stored in a single flat array of ints
+    where the distance between the positions with ids i and j is at index (i * numCells + j).
+    This is much more compact than a dict keyed by pairs of positions.
+    """
+
+    def __init__(self, cells, distances):
+        self._cells = cells
+        self._cellIds = {cell: index for (index, cell) in enumerate(cells)}
+        self._numCells = len(cells)
+        self._distances = distances
+
+    @staticmethod
+    def load(path, expectedCells = None):
+        """
+        Load a table that was written with `DistanceTable.save`.
+        The distances are memory-mapped instead of being read in,
+        so tables are cheap to open and the pages can be shared between processes.
+
+        Only files owned by the current user are loaded,
+        and the file has to be exactly the size its header says before it is mapped.
+        If expectedCells is given (the open positions of the layout, see `Grid.asList`),
+        the table has to be for exactly those positions.
+        Raises a ValueError if the file can not be trusted.
+        """
+
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            if (hasattr(os, 'getuid') and stat.st_uid != os.getuid()):
+                raise ValueError('Distance cache file is owned by another user.')
+
+            header = file.read(CACHE_HEADER.size)
+            if (len(header) < CACHE_HEADER.size):
+                raise ValueError('Distance cache file is truncated.')
+
+            magic, numCells = CACHE_HEADER.unpack(header)
+            if (magic != CACHE_FILE_MAGIC):
+                raise ValueError('Distance cache file has an unknown format.')
+
+            if (expectedCells is not None and numCells != len(expectedCells)):
+                raise ValueError('Distance cache file is for a different layout.')
+
+            distancesOffset = CACHE_HEADER.size + numCells * CACHE_CELL.size
+            distancesSize = numCells * numCells * array.array('i').itemsize
+            if (stat.st_size != distancesOffset + distancesSize):
+                raise ValueError('Distance cache file has the wrong size.')
+
+            data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        # The file could have changed between the check and the map.
+        if (len(data) != distancesOffset + distancesSize):
+            raise ValueError('Distance cache file has the wrong size.')
+
+        cells = [CACHE_CELL.unpack_from(data, CACHE_HEADER.size + index * CACHE_CELL.size)
+                for index in range(numCells)]
+        if (expectedCells is not None and cells != list(expectedCells)):
+            raise ValueError('Distance cache file is for a different layout.')
+
+        distances = memoryview(data)[distancesOffset:].cast('i')
+
+        return DistanceTable(cells, distances)
+
+    def save(self, path):
+        """
+        Write this table to disk.
+        The file is written to the side and then moved into place,
+        so concurrent readers never see a partial file.
+        Missing directories are created so that only the current user can use them.
+        """
+
+        os.makedirs(os.path.dirname(path), mode = CACHE_DIR_MODE, exist_ok = True)
+
+        handle, tempPath = tempfile.mkstemp(dir = os.path.dirname(path))
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(CACHE_HEADER.pack(CACHE_FILE_MAGIC, self._numCells))
+                for (x, y) in self._cells:
+                    file.write(CACHE_CELL.pack(x, y))
+                file.write(self._distances.tobytes())
+
+            os.replace(tempPath, path)
+        except BaseException:
+            if (os.path.exists(tempPath)):
+                os.remove(tempPath)
+            raise
+
+    def getCells(self):
+        """
+        Get all the positions in this table (ordered by id).
+        """
+
+        return self._cells
+
+    def getDistance(self, pos1, pos2):
+        """
+        Get the maze distance between two (integral) positions.
+        Raises a KeyError if either position is not an open position in the layout.
+        Positions that cannot reach each other are sys.maxsize apart.
+        """
+
+        distance = self._distances[self._cellIds[pos1] * self._numCells + self._cellIds[pos2]]
+        if (distance == UNREACHABLE):
+            return sys.maxsize
+
+        return distance
+
+    def __contains__(self, key):
+        pos1, pos2 = key
+        return pos1 in self._cellIds and pos2 in self._cellIds
+
+    def __getitem__(self, key):
+        return self.getDistance(*key)
 
-    return DEFAULT_DISTANCE
+    def __len__(self):
+        return self._numCells * self._numCells
@@ -61,10 +61,10 @@ class SimpleExtractor(FeatureExtractor):
             features["eats-food"] = 1.0
 
         prob = AnyFoodSearchProblem(state, start = (next_x, next_y))
-        dist = len(search.bfs(prob))
-        if dist is not None:
+        path = search.bfs(prob)
+        if path is not None:
             # Make the distance a number less than one otherwise the update will diverge wildly.
-            features["closest-food"] = float(dist) / (walls.getWidth() * walls.getHeight())
+            features["closest-food"] = float(len(path)) / (walls.getWidth() * walls.getHeight())
 
         features.divideAll(10.0)
         return features
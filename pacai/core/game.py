@@ -5,9 +5,16 @@ The core of a pacman-style game.
 import logging
 import time
 
+from pacai.core import instrumentation
+from pacai.core.isolation import AgentTimeoutError
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
+
+    The display may be None, in which case nothing is drawn.
+    If nothing else is watching the game either (no recorder, instrumentation, or timeouts),
+    the game is headless and skips all of those steps on every move (see `Game.isHeadless`).
     """
 
     def __init__(self, agents, display, rules, startingIndex = 0, catchExceptions = False):
@@ -25,23 +32,52 @@ class Game:
         self.enforceTimeouts = catchExceptions
         self.catchExceptions = catchExceptions
 
+        # If set, every move is also passed to this recorder as it happens
+        # (see `pacai.core.replay.ReplayWriter`).
+        self.recorder = None
+
+        # If set, each phase of every turn is timed (see `pacai.core.instrumentation`).
+        self.instrumentation = None
+
+    def isHeadless(self):
+        """
+        Check if this game will be played without anything watching it
+        (no display, recorder, instrumentation, or timeouts).
+        """
+
+        return (self.display is None
+                and self.recorder is None
+                and self.instrumentation is None
+                and not self.enforceTimeouts)
+
     def run(self):
         """
         Main control loop for game play.
         """
 
+        try:
+            return self._run()
+        finally:
+            self._stopPondering()
+
+            if (self.instrumentation is not None):
+                self.instrumentation.finish(self)
+
+    def _run(self):
         self.numMoves = 0
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
 
-        self.display.initialize(self.state)
+        if (self.display is not None):
+            self.display.initialize(self.state)
 
         if (not self._registerInitialState()):
             return False
 
         # Draw the initial frame.
-        self.display.update(self.state)
+        if (self.display is not None):
+            self.display.update(self.state)
 
         while (not self.gameOver):
             # Fetch the next agent
@@ -52,8 +88,10 @@ class Game:
 
             # Get an action from the agent.
             try:
-                agent.observationFunction(self.state)
-                action = agent.getAction(self.state)
+                self._call(instrumentation.PHASE_OBSERVATION, agentIndex,
+                        agent.observationFunction, self.state)
+                action = self._call(instrumentation.PHASE_ACTION, agentIndex,
+                        agent.getAction, self.state)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -69,8 +107,11 @@ class Game:
 
             # Execute the action.
             self.moveHistory.append((agentIndex, action))
+            if (self.recorder is not None):
+                self.recorder.recordMove(agentIndex, action)
             try:
-                self.state = self.state.generateSuccessor(agentIndex, action)
+                self.state = self._call(instrumentation.PHASE_SUCCESSOR, agentIndex,
+                        self.state.generateSuccessor, agentIndex, action)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -79,10 +120,16 @@ class Game:
                 return False
 
             # Update the display.
-            self.display.update(self.state)
+            if (self.display is not None):
+                self._call(instrumentation.PHASE_DISPLAY, agentIndex,
+                        self.display.update, self.state)
+
+            if (not self._notifyAgents()):
+                return False
 
             # Allow for game specific conditions (winning, losing, etc.).
-            self.rules.process(self.state, self)
+            self._call(instrumentation.PHASE_RULES, agentIndex,
+                    self.rules.process, self.state, self)
 
             # Track progress.
             if (agentIndex == numAgents + 1):
@@ -94,7 +141,16 @@ class Game:
         if (not self._registerFinalState()):
             return False
 
-        self.display.finish()
+        if (self.display is not None):
+            self.display.finish()
+
+    def getResult(self):
+        """
+        Get a `GameResult` that summarizes this game.
+        """
+
+        return GameResult(self.state, self.moveHistory, self.totalAgentTimes,
+                self.agentCrashed, self.agentTimeout)
 
     def _agentCrash(self, agentIndex, exception = None):
         """
@@ -104,10 +160,25 @@ class Game:
         logging.warning('Agent %d crashedtimed out on a single move!' % agentIndex,
                 exc_info = exception)
 
+        # Isolated agents that miss their deadline are stopped as soon as they are late.
+        if (isinstance(exception, AgentTimeoutError)):
+            self.agentTimeout = True
+
         self.gameOver = True
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _call(self, phase, agentIndex, function, *args):
+        """
+        Call a function for one phase of an agent's turn,
+        timing it if the game is instrumented.
+        """
+
+        if (self.instrumentation is None):
+            return function(*args)
+
+        return self.instrumentation.call(phase, agentIndex, function, *args)
+
     def _checkForTimeouts(self, agentIndex, timeTaken):
         """
         Check if an agent timed out.
@@ -151,6 +222,24 @@ class Game:
 
         return False
 
+    def _notifyAgents(self):
+        """
+        Let every agent see the new state (see `pacai.agents.base.BaseAgent.observeState`).
+        This is not counted against any agent's time.
+        """
+
+        for agentIndex in range(len(self.agents)):
+            try:
+                self.agents[agentIndex].observeState(self.state)
+            except Exception as ex:
+                if (not self.catchExceptions):
+                    raise ex
+
+                self._agentCrash(agentIndex, ex)
+                return False
+
+        return True
+
     def _registerInitialState(self):
         """
         Inform agents of the game start.
@@ -168,7 +257,8 @@ class Game:
             startTime = time.time()
 
             try:
-                agent.registerInitialState(self.state)
+                self._call(instrumentation.PHASE_REGISTER, agentIndex,
+                        agent.registerInitialState, self.state)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -187,6 +277,17 @@ class Game:
 
         return True
 
+    def _stopPondering(self):
+        for agent in self.agents:
+            if (not agent):
+                continue
+
+            try:
+                agent.stopPondering()
+            except Exception:
+                logging.warning('Agent %d could not stop pondering.' % (agent.index),
+                        exc_info = True)
+
     def _registerFinalState(self):
         # Inform a learning agent of the game's result.
         for agent in self.agents:
@@ -200,3 +301,21 @@ class Game:
                 return False
 
         return True
+
+class GameResult(object):
+    """
+    The outcome of a finished game.
+    Unlike a `Game`, a result does not hold onto any agents, views, or rules,
+    so it can be sent between processes (e.g. from a worker that played the game).
+
+    Results have the same fields as a `Game` for the outcome of the game,
+    so code that summarizes finished games can work on either.
+    """
+
+    def __init__(self, state, moveHistory, totalAgentTimes, agentCrashed = False,
+            agentTimeout = False):
+        self.state = state
+        self.moveHistory = moveHistory
+        self.totalAgentTimes = totalAgentTimes
+        self.agentCrashed = agentCrashed
+        self.agentTimeout = agentTimeout
@@ -1,9 +1,9 @@
 import abc
-import copy
 
 from pacai.core.agentstate import AgentState
 from pacai.core.directions import Directions
 from pacai.util import util
+from pacai.util import zobrist
 
 class AbstractGameState(abc.ABC):
     """
@@ -22,8 +22,11 @@ class AbstractGameState(abc.ABC):
 
         self._layout = layout
 
-        # Keep a copy of the hash, since it is expensive to compute.
+        # Keep a copy of the hash.
         # Any children should be sure to clear the hash when modifications are made.
+        # The expensive parts of the hash (food and capsules) are kept as Zobrist hashes
+        # (see `pacai.util.zobrist`) that are updated as items are eaten,
+        # so clearing the hash is cheap.
         self._hash = None
 
         # For food and capsules, we will only copy on write (if we eat one of them).
@@ -33,14 +36,28 @@ class AbstractGameState(abc.ABC):
         self._food = layout.food.copy()
         self._lastFoodEaten = None
 
+        # Kept up to date as food is eaten, so it never needs to be counted.
+        self._numFood = self._food.count()
+
         self._capsulesCopied = False
         self._capsules = layout.capsules.copy()
         self._lastCapsuleEaten = None
 
+        self._foodHash = 0
+        for (x, y) in self._food.asList():
+            self._foodHash ^= zobrist.getKey('food', x, y)
+
+        self._capsuleHash = 0
+        for (x, y) in self._capsules:
+            self._capsuleHash ^= zobrist.getKey('capsule', x, y)
+
         # An ordered list of locations that this state considers special.
         # A view may choose to specially represent these locations.
         self._highlightLocations = []
 
+        # Agent states are shared with successors until they are modified (copy on write).
+        # This is a bitmask of the agents (by index) whose state this state has its own copy of.
+        self._copiedAgents = 0
         self._agentStates = []
         for (isPacman, position) in layout.agentPositions:
             self._agentStates.append(AgentState(position, Directions.STOP, isPacman))
@@ -56,6 +73,26 @@ class AbstractGameState(abc.ABC):
 
         pass
 
+    def generateSuccessors(self, agentIndex = 0):
+        """
+        Get an (action, successor) pair for each legal action of the agent (in the same order as
+        `AbstractGameState.getLegalActions`).
+        This is the same as calling generateSuccessor() on each legal action,
+        but the legal actions are only worked out once.
+        Terminal states have no successors.
+        """
+
+        if (self.isOver()):
+            return []
+
+        successors = []
+        for action in self.getLegalActions(agentIndex):
+            successor = self._initSuccessor()
+            successor._applySuccessorAction(agentIndex, action, isLegal = True)
+            successors.append((action, successor))
+
+        return successors
+
     @abc.abstractmethod
     def getLegalActions(self, agentIndex = 0):
         """
@@ -64,10 +101,62 @@ class AbstractGameState(abc.ABC):
 
         pass
 
+    def applyAction(self, agentIndex, action):
+        """
+        Apply the action to this state in place, instead of generating a successor.
+        Returns an undo record that can be passed to `AbstractGameState.undoAction`
+        to put this state back the way it was.
+        Undo records must be undone in the reverse order they were made (like a stack).
+
+        This lets a tree search walk down and back up a single state,
+        instead of allocating a new state for every node:
+        ```
+        record = state.applyAction(agentIndex, action)
+        value = search(state, depth - 1)
+        state.undoAction(record)
+        ```
+        Agent states that change are replaced with new copies (like in a successor),
+        so any agent state taken from this state before an applyAction() is left as it was.
+        """
+
+        if (self.isOver()):
+            raise RuntimeError("Can't apply actions to a terminal state.")
+
+        record = self._getUndoRecord()
+
+        # Agents, food, and capsules that change go into new copies,
+        # so the ones in the undo record (and any shared with other states) are not touched.
+        self._foodCopied = False
+        self._capsulesCopied = False
+        self._copiedAgents = 0
+
+        try:
+            self._applySuccessorAction(agentIndex, action)
+        except Exception:
+            self.undoAction(record)
+            raise
+
+        return record
+
+    def undoAction(self, record):
+        """
+        Undo an action made with `AbstractGameState.applyAction`.
+        """
+
+        self._restoreUndoRecord(record)
+
     def addScore(self, score):
         self._hash = None
         self._score += score
 
+    def copy(self):
+        """
+        Get a copy of this state.
+        This is cheap, since everything is shared with this state until either is modified.
+        """
+
+        return self._initSuccessor()
+
     def eatCapsule(self, x, y):
         """
         Mark the capsule at the given location as eaten.
@@ -82,6 +171,7 @@ class AbstractGameState(abc.ABC):
 
         self._capsules.remove((x, y))
         self._lastCapsuleEaten = (x, y)
+        self._capsuleHash ^= zobrist.getKey('capsule', x, y)
 
         self._hash = None
         return True
@@ -98,8 +188,10 @@ class AbstractGameState(abc.ABC):
             self._food = self._food.copy()
             self._foodCopied = True
 
-        self._food[x][y] = False
+        self._food.set(x, y, False)
+        self._numFood -= 1
         self._lastFoodEaten = (x, y)
+        self._foodHash ^= zobrist.getKey('food', x, y)
 
         self._hash = None
         return True
@@ -117,14 +209,16 @@ class AbstractGameState(abc.ABC):
         (like if it just died and is respawning).
         """
 
-        position = self._agentStates[index].getPosition()
-        if (position is None):
-            return None
-
         # Ensure positions are ints.
-        return tuple(int(pos) for pos in position)
+        return self._agentStates[index].getGridPosition()
 
     def getAgentState(self, index):
+        """
+        Get the state of an agent.
+        Agent states may be shared with other game states, so the caller should not modify it
+        (see `AbstractGameState.getMutableAgentState`).
+        """
+
         return self._agentStates[index]
 
     def getAgentStates(self):
@@ -173,6 +267,18 @@ class AbstractGameState(abc.ABC):
     def getLastFoodEaten(self):
         return self._lastFoodEaten
 
+    def getMutableAgentState(self, index):
+        """
+        Get the state of an agent that is owned by just this game state,
+        so it can be modified (e.g. by the rules when applying an action).
+        """
+
+        if (not (self._copiedAgents & (1 << index))):
+            self._agentStates[index] = self._agentStates[index].copy()
+            self._copiedAgents |= (1 << index)
+
+        return self._agentStates[index]
+
     def getNumAgents(self):
         return len(self._agentStates)
 
@@ -188,7 +294,7 @@ class AbstractGameState(abc.ABC):
         Get the amount of food left on the board.
         """
 
-        return self._food.count()
+        return self._numFood
 
     def getScore(self):
         return self._score
@@ -217,14 +323,14 @@ class AbstractGameState(abc.ABC):
         Returns true if the location (x, y) has food.
         """
 
-        return self._food[x][y]
+        return self._food.get(x, y)
 
     def hasWall(self, x, y):
         """
         Returns true if (x, y) has a wall, false otherwise.
         """
 
-        return self._layout.walls[x][y]
+        return self._layout.walls.get(x, y)
 
     def isLose(self):
         return self.isOver() and not self._win
@@ -242,6 +348,57 @@ class AbstractGameState(abc.ABC):
         self._score = score
         self._hash = None
 
+    @abc.abstractmethod
+    def _applySuccessorAction(self, agentIndex, action, isLegal = False):
+        """
+        Apply the action to the context state (self).
+        If isLegal is true, the action is already known to be legal and does not need to be checked.
+        This is what generating successors and `AbstractGameState.applyAction` are built on.
+        """
+
+        pass
+
+    def _getCodecExtra(self):
+        """
+        Get the ints (beyond what every game state has) that `pacai.core.statecodec` should encode.
+        Children with more dynamic state should extend this.
+        """
+
+        return ()
+
+    def _setCodecExtra(self, values):
+        """
+        Restore the values from `AbstractGameState._getCodecExtra` on a decoded state.
+        Everything common to all game states has already been restored.
+        """
+
+        pass
+
+    def _getUndoRecord(self):
+        """
+        Get everything `AbstractGameState._applySuccessorAction` may change.
+        Children with more state should extend the record.
+        """
+
+        return (
+            tuple(self._agentStates),
+            self._score, self._gameover, self._win, self._lastAgentMoved, self._hash,
+            self._food, self._numFood, self._foodHash, self._lastFoodEaten,
+            self._capsules, self._capsuleHash, self._lastCapsuleEaten,
+        )
+
+    def _restoreUndoRecord(self, record):
+        (agentStates, self._score, self._gameover, self._win, self._lastAgentMoved,
+            self._hash, self._food, self._numFood, self._foodHash, self._lastFoodEaten,
+            self._capsules, self._capsuleHash, self._lastCapsuleEaten) = record
+
+        self._agentStates = list(agentStates)
+
+        # Everything restored may also be shared (with other states or older undo records).
+        self._foodCopied = False
+        self._capsulesCopied = False
+        self._copiedAgents = 0
+
     def _initSuccessor(self):
         """
         Get a state that will eventually serve as a successor.
@@ -249,15 +406,23 @@ class AbstractGameState(abc.ABC):
         """
 
         # Start with a shallow copy.
-        successor = copy.copy(self)
+        # (Copying the instance dict directly is much faster than `copy.copy`.)
+        successor = self.__class__.__new__(self.__class__)
+        successor.__dict__.update(self.__dict__)
         successor._hash = None
 
         # Leave food and capsules as a shallow copy, but mark them to be copied on write.
+        # They are now shared, so this state has to copy them on write as well.
         successor._foodCopied = False
         successor._capsulesCopied = False
+        self._foodCopied = False
+        self._capsulesCopied = False
 
-        # Agent states need to be deep copied.
-        successor._agentStates = [agentState.copy() for agentState in self._agentStates]
+        # Agent states are shared the same way.
+        # Only the list needs to be copied, each state is copied when it is modified.
+        successor._copiedAgents = 0
+        self._copiedAgents = 0
+        successor._agentStates = list(self._agentStates)
 
         return successor
 
@@ -288,8 +453,10 @@ class AbstractGameState(abc.ABC):
                 and self._layout == other._layout)
 
     def __hash__(self):
+        # All the components here are either small or maintain their own hash incrementally,
+        # so this does not depend on the size of the board.
         if (self._hash is None):
-            self._hash = util.buildHash(self._score, self._gameover, self._win, *self._capsules,
-                self._food, *self._agentStates, self._layout)
+            self._hash = util.buildHash(self._score, self._gameover, self._win,
+                self._foodHash ^ self._capsuleHash, *self._agentStates, self._layout)
 
         return self._hash
@@ -34,12 +34,26 @@ class Grid:
     def deepCopy(self):
         return self.copy()
 
+    def get(self, x, y):
+        """
+        Get the value at (x, y), the same as grid[x][y].
+        """
+
+        return self._data[x][y]
+
     def getHeight(self):
         return self._height
 
     def getWidth(self):
         return self._width
 
+    def set(self, x, y, value):
+        """
+        Set the value at (x, y), the same as grid[x][y] = value.
+        """
+
+        self._data[x][y] = value
+
     def shallowCopy(self):
         grid = Grid(self._width, self._height)
         grid._data = self._data
@@ -55,6 +69,12 @@ class Grid:
         if (other is None):
             return False
 
+        if (isinstance(other, BitGrid)):
+            return other.__eq__(self)
+
+        if (not isinstance(other, Grid)):
+            return NotImplemented
+
         return self._data == other._data
 
     def __getitem__(self, i):
@@ -82,3 +102,212 @@ class Grid:
         out = [[str(self._data[x][y])[0] for x in range(self._width)] for y in range(self._height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
+
+class BitGrid:
+    """
+    A 2-dimensional array of booleans backed by a single integer bitset.
+    BitGrids support the same interface as `Grid` (data is accessed via grid[x][y]),
+    but copying, counting, comparing, and hashing all operate on the bit pattern
+    instead of looping over every cell.
+    Code that reads single cells often should use `BitGrid.get` instead of grid[x][y],
+    since it skips building a view of the column.
+
+    The cell (x, y) is stored in bit (x * height + y).
+    """
+
+    def __init__(self, width, height, initialValue = False):
+        if (not isinstance(initialValue, bool)):
+            raise ValueError('Grids can only contain booleans')
+
+        self._width = width
+        self._height = height
+
+        self._bits = 0
+        if (initialValue):
+            self._bits = (1 << (width * height)) - 1
+
+        # Keep a copy of the hash, it is cleared whenever a bit changes.
+        self._hash = None
+
+    def asList(self, key = True):
+        bits = self._bits
+        if (not key):
+            bits = ~bits & ((1 << (self._width * self._height)) - 1)
+
+        values = []
+
+        # Walk the set bits from lowest to highest (the same order as `Grid.asList`).
+        while (bits):
+            lowBit = bits & -bits
+            index = lowBit.bit_length() - 1
+            values.append((index // self._height, index % self._height))
+            bits ^= lowBit
+
+        return values
+
+    def copy(self):
+        grid = BitGrid(self._width, self._height)
+        grid._bits = self._bits
+        grid._hash = self._hash
+        return grid
+
+    def count(self, item = True):
+        numTrue = bin(self._bits).count('1')
+
+        if (item):
+            return numTrue
+
+        return self._width * self._height - numTrue
+
+    def deepCopy(self):
+        return self.copy()
+
+    def get(self, x, y):
+        """
+        Get the value at (x, y), the same as grid[x][y] (but faster).
+        """
+
+        # Inline the common (in range) case, since this is called extremely often.
+        if (0 <= x < self._width and 0 <= y < self._height):
+            return ((self._bits >> (x * self._height + y)) & 1) == 1
+
+        return self[x][y]
+
+    @staticmethod
+    def fromBits(width, height, bits):
+        """
+        Build a grid straight from the integer that backs it (see `BitGrid.getBits`).
+        """
+
+        grid = BitGrid(width, height)
+        grid._bits = bits
+        return grid
+
+    def getBits(self):
+        """
+        Get the integer that backs this grid.
+        Since ints are immutable, this makes a good key for caches.
+        """
+
+        return self._bits
+
+    def getHeight(self):
+        return self._height
+
+    def getWidth(self):
+        return self._width
+
+    def set(self, x, y, value):
+        """
+        Set the value at (x, y), the same as grid[x][y] = value (but faster).
+        """
+
+        if (not (0 <= x < self._width and 0 <= y < self._height)):
+            self[x][y] = value
+            return
+
+        bit = 1 << (x * self._height + y)
+
+        if (value):
+            self._bits |= bit
+        else:
+            self._bits &= ~bit
+
+        self._hash = None
+
+    def shallowCopy(self):
+        """
+        Bitsets cannot be shared between grids, so this is the same as `BitGrid.copy`.
+        """
+
+        return self.copy()
+
+    def __eq__(self, other):
+        if (other is None):
+            return False
+
+        if (isinstance(other, BitGrid)):
+            return (self._bits == other._bits
+                    and self._width == other._width
+                    and self._height == other._height)
+
+        if (not isinstance(other, Grid)):
+            return NotImplemented
+
+        return (self._width == other.getWidth()
+                and self._height == other.getHeight()
+                and self.asList() == other.asList())
+
+    def __getitem__(self, x):
+        if (x < 0):
+            x += self._width
+
+        if (x < 0 or x >= self._width):
+            raise IndexError('BitGrid column out of range: %d' % (x))
+
+        return _BitGridColumn(self, x)
+
+    def __hash__(self):
+        if (self._hash is None):
+            self._hash = hash(self._bits)
+
+        return self._hash
+
+    def __lt__(self, other):
+        return self.__hash__() < other.__hash__()
+
+    def __setitem__(self, x, column):
+        for y, value in enumerate(column):
+            self[x][y] = value
+
+    def __str__(self):
+        out = [[str(self.get(x, y))[0] for x in range(self._width)] for y in range(self._height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+class _BitGridColumn:
+    """
+    A light view into a single column of a `BitGrid`,
+    so that cells can be accessed and set with the normal grid[x][y] notation.
+    """
+
+    __slots__ = ('_grid', '_height', '_offset')
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._height = grid._height
+        self._offset = x * grid._height
+
+    def __getitem__(self, y):
+        # Inline the common (in range) case, since this is called extremely often.
+        if (0 <= y < self._height):
+            return ((self._grid._bits >> (self._offset + y)) & 1) == 1
+
+        return ((self._grid._bits >> self._index(y)) & 1) == 1
+
+    def __iter__(self):
+        for y in range(self._height):
+            yield self[y]
+
+    def __len__(self):
+        return self._height
+
+    def __setitem__(self, y, value):
+        bit = 1 << self._index(y)
+
+        if (value):
+            self._grid._bits |= bit
+        else:
+            self._grid._bits &= ~bit
+
+        self._grid._hash = None
+
+    def _index(self, y):
+        if (0 <= y < self._height):
+            return self._offset + y
+
+        # Allow negative indexes like a list would.
+        if (-self._height <= y < 0):
+            return self._offset + self._height + y
+
+        raise IndexError('BitGrid row out of range: %d' % (y))
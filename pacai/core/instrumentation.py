@@ -0,0 +1,272 @@
+"""
+Optional instrumentation for `pacai.core.game.Game`.
+
+When a game has a `GameInstrumentation` attached,
+every phase of a turn (the agent observing and acting, building the successor,
+updating the display, and applying the rules) is timed and added to a latency histogram
+for the agent whose turn it is.
+Agents' `getAction` can also be run under cProfile.
+When the game ends, everything is written out as a JSON report.
+"""
+
+import cProfile
+import json
+import math
+import os
+import pstats
+import time
+
+PHASE_REGISTER = 'registerInitialState'
+PHASE_OBSERVATION = 'observationFunction'
+PHASE_ACTION = 'getAction'
+PHASE_SUCCESSOR = 'generateSuccessor'
+PHASE_DISPLAY = 'display.update'
+PHASE_RULES = 'rules.process'
+
+PHASES = [
+    PHASE_REGISTER,
+    PHASE_OBSERVATION,
+    PHASE_ACTION,
+    PHASE_SUCCESSOR,
+    PHASE_DISPLAY,
+    PHASE_RULES,
+]
+
+# Histogram buckets double in size, starting at this many seconds (one microsecond).
+BUCKET_BASE = 1.0e-6
+NUM_BUCKETS = 32
+
+# How many of the most expensive functions (by cumulative time) to put in a report.
+NUM_PROFILE_FUNCTIONS = 30
+
+REPORT_VERSION = 1
+
+class LatencyHistogram(object):
+    """
+    A histogram of latencies (in seconds) with exponentially sized buckets.
+    Bucket 0 holds anything under `BUCKET_BASE`,
+    and bucket i holds latencies in [BUCKET_BASE * 2^(i - 1), BUCKET_BASE * 2^i).
+    """
+
+    def __init__(self):
+        self._buckets = [0] * NUM_BUCKETS
+        self._count = 0
+        self._total = 0.0
+        self._min = None
+        self._max = None
+
+    def add(self, seconds):
+        bucket = 0
+        if (seconds >= BUCKET_BASE):
+            bucket = min(NUM_BUCKETS - 1, int(math.log2(seconds / BUCKET_BASE)) + 1)
+
+        self._buckets[bucket] += 1
+        self._count += 1
+        self._total += seconds
+
+        if (self._min is None or seconds < self._min):
+            self._min = seconds
+
+        if (self._max is None or seconds > self._max):
+            self._max = seconds
+
+    def getCount(self):
+        return self._count
+
+    def getPercentile(self, percentile):
+        """
+        Get an upper bound on the given percentile (in [0, 100]).
+        The bound is the top of the bucket the percentile falls in
+        (but never more than the largest latency seen).
+        """
+
+        if (self._count == 0):
+            return None
+
+        target = math.ceil(self._count * percentile / 100.0)
+
+        seen = 0
+        for bucket in range(NUM_BUCKETS):
+            seen += self._buckets[bucket]
+            if (seen >= max(1, target)):
+                return min(self._max, BUCKET_BASE * (2 ** bucket))
+
+        return self._max
+
+    def getTotal(self):
+        return self._total
+
+    def toDict(self):
+        mean = None
+        if (self._count > 0):
+            mean = self._total / self._count
+
+        return {
+            'count': self._count,
+            'total': self._total,
+            'mean': mean,
+            'min': self._min,
+            'max': self._max,
+            'p50': self.getPercentile(50),
+            'p90': self.getPercentile(90),
+            'p99': self.getPercentile(99),
+            # [upper bound (seconds), count] for each non-empty bucket.
+            'buckets': [[BUCKET_BASE * (2 ** bucket), count]
+                    for (bucket, count) in enumerate(self._buckets) if (count > 0)],
+        }
+
+class GameInstrumentation(object):
+    """
+    Collects timings for a single game.
+    Attach one to a game before running it (`game.instrumentation = ...`)
+    and the report will be written to `reportPath` when the game ends.
+    """
+
+    def __init__(self, numAgents, reportPath = None, profileAgents = False):
+        """
+        Args:
+            numAgents: The number of agents in the game.
+            reportPath: Where to write the JSON report (None to not write one).
+            profileAgents: Run each agent's getAction under cProfile.
+                Note that profiling slows agents down, and the slowdown shows up in the timings.
+        """
+
+        self._reportPath = reportPath
+        self._histograms = [{phase: LatencyHistogram() for phase in PHASES}
+                for i in range(numAgents)]
+
+        self._profiles = None
+        if (profileAgents):
+            self._profiles = [cProfile.Profile() for i in range(numAgents)]
+
+        self._startTime = time.perf_counter()
+        self._endTime = None
+
+    def call(self, phase, agentIndex, function, *args):
+        """
+        Call the function and charge the time it took to the given phase of the agent.
+        """
+
+        profile = None
+        if (self._profiles is not None and phase == PHASE_ACTION):
+            profile = self._profiles[agentIndex]
+
+        startTime = time.perf_counter()
+        try:
+            if (profile is None):
+                return function(*args)
+
+            return profile.runcall(function, *args)
+        finally:
+            self._histograms[agentIndex][phase].add(time.perf_counter() - startTime)
+
+    def finish(self, game):
+        """
+        Called by the game when it ends.
+        """
+
+        self._endTime = time.perf_counter()
+
+        if (self._reportPath is not None):
+            self.writeReport(self._reportPath, game)
+
+    def getHistogram(self, agentIndex, phase):
+        return self._histograms[agentIndex][phase]
+
+    def getReport(self, game = None):
+        """
+        Get the report as a JSON-friendly dict.
+        If the game is passed, information about the game is included.
+        """
+
+        endTime = self._endTime
+        if (endTime is None):
+            endTime = time.perf_counter()
+
+        report = {
+            'version': REPORT_VERSION,
+            'phases': PHASES,
+            'wallTime': endTime - self._startTime,
+            'agents': [],
+            'totals': {},
+        }
+
+        for agentIndex in range(len(self._histograms)):
+            agentReport = {
+                'index': agentIndex,
+                'phases': {phase: histogram.toDict()
+                        for (phase, histogram) in self._histograms[agentIndex].items()},
+            }
+
+            if (self._profiles is not None):
+                agentReport['profile'] = _summarizeProfile(self._profiles[agentIndex])
+
+            report['agents'].append(agentReport)
+
+        for phase in PHASES:
+            report['totals'][phase] = sum([histograms[phase].getTotal()
+                    for histograms in self._histograms])
+
+        if (game is not None):
+            report['game'] = {
+                'moves': len(game.moveHistory),
+                'score': game.state.getScore(),
+                'agentCrashed': game.agentCrashed,
+                'agentTimeout': game.agentTimeout,
+            }
+
+            for agentReport in report['agents']:
+                agent = game.agents[agentReport['index']]
+                agentReport['name'] = agent.__class__.__name__
+
+        return report
+
+    def writeReport(self, path, game = None):
+        with open(path, 'w') as file:
+            json.dump(self.getReport(game), file, indent = 4)
+
+def instrumentGame(game, path, gameIndex = 0, numGames = 1, profileAgents = False):
+    """
+    Attach a `GameInstrumentation` to a game if there is a report path
+    (e.g. from the --instrument option).
+    """
+
+    if (path is None):
+        return
+
+    game.instrumentation = GameInstrumentation(len(game.agents),
+            getReportPath(path, gameIndex, numGames), profileAgents)
+
+def getReportPath(path, gameIndex, numGames):
+    """
+    Get the report path for one game in a run of several.
+    When there is more than one game, the game's index is put before the extension
+    (e.g. 'timing.json' -> 'timing.3.json').
+    """
+
+    if (numGames <= 1):
+        return path
+
+    base, extension = os.path.splitext(path)
+    return '%s.%d%s' % (base, gameIndex, extension)
+
+def _summarizeProfile(profile):
+    """
+    Get the most expensive functions in a profile.
+    """
+
+    stats = pstats.Stats(profile).stats
+
+    functions = []
+    for ((filename, line, name), (primitiveCalls, calls, totalTime, cumulativeTime, callers)) \
+            in stats.items():
+        functions.append({
+            'function': '%s:%d(%s)' % (filename, line, name),
+            'calls': calls,
+            'primitiveCalls': primitiveCalls,
+            'totalTime': totalTime,
+            'cumulativeTime': cumulativeTime,
+        })
+
+    functions.sort(key = lambda function: function['cumulativeTime'], reverse = True)
+    return functions[:NUM_PROFILE_FUNCTIONS]
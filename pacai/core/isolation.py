@@ -0,0 +1,389 @@
+"""
+Run agents in their own worker processes, with deadlines that are enforced while the agent runs.
+
+An `IsolatedAgent` stands in for an agent in the game.
+Every call the game makes on it is sent to the real agent in a worker process,
+and the game only waits for the answer until the deadline.
+So, an agent that runs away can hold up its own worker, but never the game.
+
+Layouts (which never change during a game) are only sent the first time they are seen.
+After that, they are sent as a small key that the worker looks up.
+Game states are sent with `pacai.core.statecodec`, which leaves the layout out as well.
+"""
+
+import io
+import logging
+import multiprocessing
+import pickle
+import time
+
+from pacai.agents.base import BaseAgent
+from pacai.core.directions import Directions
+from pacai.core import statecodec
+from pacai.core.layout import Layout
+
+# What to do when an agent misses a deadline.
+# Play a default action (or just move on, outside of getAction) and keep going.
+TIMEOUT_DEFAULT_ACTION = 'default'
+# Stop the agent's worker and forfeit the game (see `AgentTimeoutError`).
+TIMEOUT_FORFEIT = 'forfeit'
+
+TIMEOUT_POLICIES = [TIMEOUT_DEFAULT_ACTION, TIMEOUT_FORFEIT]
+
+# How long to wait for a worker to shutdown on its own before it is killed.
+SHUTDOWN_TIMEOUT = 1.0
+
+class AgentTimeoutError(RuntimeError):
+    """
+    An agent missed a deadline and forfeits the game.
+    """
+
+    pass
+
+class IsolatedAgent(BaseAgent):
+    """
+    A proxy for an agent that runs in its own worker process.
+
+    The worker is started when the game starts (`BaseAgent.registerInitialState`)
+    and is kept between games (so agents can keep learning),
+    until `IsolatedAgent.close` is called or the agent forfeits.
+    If the agent is late for one move (with `TIMEOUT_DEFAULT_ACTION`),
+    its late answer is thrown away when it does come in.
+    An agent that is stuck keeps its worker busy, so every later call would also wait out
+    its whole deadline.
+    So, an agent that misses more than maxTimeouts deadlines in a row forfeits anyway.
+    """
+
+    def __init__(self, agent, moveTimeout = None, startupTimeout = None,
+            onTimeout = TIMEOUT_DEFAULT_ACTION, maxTimeouts = None, **kwargs):
+        """
+        Args:
+            agent: The real agent, which gets copied into the worker.
+            moveTimeout: The seconds the agent gets for each call during the game
+                (None for no limit).
+            startupTimeout: The seconds the agent gets for registerInitialState (None for no limit).
+            onTimeout: What to do when the agent is late (one of `TIMEOUT_POLICIES`).
+            maxTimeouts: How many deadlines in a row the agent can miss with
+                `TIMEOUT_DEFAULT_ACTION` before it forfeits (None for no limit).
+        """
+
+        super().__init__(agent.index)
+
+        if (onTimeout not in TIMEOUT_POLICIES):
+            raise ValueError("Unknown timeout policy: '%s'." % (onTimeout))
+
+        self._agent = agent
+        self._moveTimeout = moveTimeout
+        self._startupTimeout = startupTimeout
+        self._onTimeout = onTimeout
+        self._maxTimeouts = maxTimeouts
+
+        # Only send states on every move if the agent actually looks at them.
+        self._observesStates = (type(agent).observeState is not BaseAgent.observeState)
+
+        self._process = None
+        self._connection = None
+        self._nextRequestId = 0
+
+        # {id(layout): (key, layout)} for the layouts the worker already has.
+        self._layoutKeys = {}
+
+        self._numTimeouts = 0
+        self._numConsecutiveTimeouts = 0
+
+    def close(self):
+        """
+        Stop the worker.
+        """
+
+        if (self._process is None):
+            return
+
+        try:
+            self._send(None, [], False)
+        except (OSError, ValueError):
+            pass
+
+        self._process.join(SHUTDOWN_TIMEOUT)
+        if (self._process.is_alive()):
+            self._process.kill()
+            self._process.join()
+
+        self._connection.close()
+
+        self._process = None
+        self._connection = None
+        self._layoutKeys = {}
+
+    def getAgent(self):
+        """
+        Get the agent (as it was before the worker was started).
+        """
+
+        return self._agent
+
+    def getNumTimeouts(self):
+        return self._numTimeouts
+
+    # Override
+    def final(self, state):
+        self._call('final', [state], self._moveTimeout)
+
+    # Override
+    def getAction(self, state):
+        action = self._call('getAction', [state], self._moveTimeout)
+        if (action is not _LATE):
+            return action
+
+        # Play it safe, and stay put if we can.
+        legalActions = state.getLegalActions(self.index)
+        if (Directions.STOP in legalActions or len(legalActions) == 0):
+            return Directions.STOP
+
+        return legalActions[0]
+
+    # Override
+    def observationFunction(self, state):
+        # The answer does not matter, but the time it takes counts towards the agent's move.
+        self._send('observationFunction', [state], False)
+
+    # Override
+    def observeState(self, state):
+        if (self._observesStates and self._process is not None):
+            self._send('observeState', [state], False)
+
+    # Override
+    def registerInitialState(self, state):
+        if (self._process is None):
+            self._start()
+
+        self._call('registerInitialState', [state], self._startupTimeout)
+
+    # Override
+    def stopPondering(self):
+        if (self._process is not None):
+            self._send('stopPondering', [], False)
+
+    def _call(self, method, args, timeout):
+        """
+        Call a method on the real agent and wait (up to the timeout) for its answer.
+        Returns `_LATE` if the agent missed the deadline (and does not forfeit).
+        """
+
+        if (self._process is None):
+            raise RuntimeError('Agent %d has no worker running.' % (self.index))
+
+        requestId = self._send(method, args, True)
+
+        deadline = None
+        if (timeout is not None):
+            deadline = time.monotonic() + timeout
+
+        while (True):
+            remaining = None
+            if (deadline is not None):
+                remaining = max(0.0, deadline - time.monotonic())
+
+            if (not self._connection.poll(remaining)):
+                return self._late(method, timeout)
+
+            try:
+                (responseId, success, value) = pickle.loads(self._connection.recv_bytes())
+            except EOFError:
+                self.close()
+                raise RuntimeError('The worker for agent %d died.' % (self.index))
+
+            # Answers to calls that were already given up on.
+            if (responseId != requestId):
+                continue
+
+            self._numConsecutiveTimeouts = 0
+
+            if (not success):
+                raise value
+
+            return value
+
+    def _late(self, method, timeout):
+        self._numTimeouts += 1
+        self._numConsecutiveTimeouts += 1
+
+        if (self._onTimeout == TIMEOUT_FORFEIT):
+            self.close()
+            raise AgentTimeoutError('Agent %d took more than %s seconds in %s().'
+                    % (self.index, timeout, method))
+
+        if (self._maxTimeouts is not None and self._numConsecutiveTimeouts > self._maxTimeouts):
+            self.close()
+            raise AgentTimeoutError('Agent %d missed %d deadlines in a row (the last in %s()).'
+                    % (self.index, self._numConsecutiveTimeouts, method))
+
+        logging.warning('Agent %d took more than %s seconds in %s(), moving on without it.'
+                % (self.index, timeout, method))
+        return _LATE
+
+    def _send(self, method, args, needsAnswer):
+        """
+        Send a call to the worker (without waiting for an answer).
+        Returns the id of the request.
+        """
+
+        # Layouts are sent whole once, and then by key.
+        for arg in args:
+            if (not hasattr(arg, 'getInitialLayout')):
+                continue
+
+            layout = arg.getInitialLayout()
+            if (id(layout) not in self._layoutKeys):
+                key = len(self._layoutKeys)
+                self._connection.send_bytes(pickle.dumps((None, _ADD_LAYOUT, [key, layout], False)))
+                self._layoutKeys[id(layout)] = (key, layout)
+
+        requestId = self._nextRequestId
+        self._nextRequestId += 1
+
+        buffer = io.BytesIO()
+        _LayoutPickler(buffer, self._layoutKeys).dump((requestId, method, args, needsAnswer))
+        self._connection.send_bytes(buffer.getvalue())
+
+        return requestId
+
+    def _start(self):
+        (self._connection, workerConnection) = multiprocessing.Pipe()
+
+        name = 'IsolatedAgent-%d' % (self.index)
+        self._process = multiprocessing.Process(target = _runWorker,
+                args = (self._agent, workerConnection), name = name, daemon = True)
+        self._process.start()
+
+        workerConnection.close()
+
+def isolateAgents(agents, rules, onTimeout = TIMEOUT_DEFAULT_ACTION):
+    """
+    Wrap each agent in an `IsolatedAgent`, with the deadlines from the game's rules.
+    Agents can miss as many deadlines in a row as the rules give warnings.
+    """
+
+    isolatedAgents = []
+    for agent in agents:
+        if (not agent or isinstance(agent, IsolatedAgent)):
+            isolatedAgents.append(agent)
+            continue
+
+        isolatedAgents.append(IsolatedAgent(agent,
+                moveTimeout = rules.getMoveTimeout(agent.index),
+                startupTimeout = rules.getMaxStartupTime(agent.index),
+                onTimeout = onTimeout,
+                maxTimeouts = rules.getMaxTimeWarnings(agent.index)))
+
+    return isolatedAgents
+
+def closeAgents(agents):
+    """
+    Stop everything the agents run in the background:
+    the workers of isolated agents, and the pondering of any other agents.
+    This is safe to call while handling an error (problems stopping an agent are only logged).
+    """
+
+    for agent in agents:
+        if (not agent):
+            continue
+
+        try:
+            if (isinstance(agent, IsolatedAgent)):
+                agent.close()
+            else:
+                agent.stopPondering()
+        except Exception:
+            logging.warning('Agent %d could not be stopped.' % (agent.index), exc_info = True)
+
+# A marker for calls that missed their deadline.
+_LATE = object()
+
+# The method name for requests that give the worker a new layout.
+_ADD_LAYOUT = '__addLayout'
+
+# Tags for the objects that are not pickled.
+_PERSISTENT_LAYOUT = 'layout'
+_PERSISTENT_STATE = 'state'
+
+class _LayoutPickler(pickle.Pickler):
+    """
+    Pickle layouts the worker already has as just their key,
+    and game states with `pacai.core.statecodec`.
+    """
+
+    def __init__(self, file, layoutKeys):
+        super().__init__(file, protocol = pickle.HIGHEST_PROTOCOL)
+        self._layoutKeys = layoutKeys
+
+    def persistent_id(self, obj):
+        if (statecodec.canEncode(obj)):
+            return (_PERSISTENT_STATE, statecodec.encodeState(obj))
+
+        if (not isinstance(obj, Layout)):
+            return None
+
+        entry = self._layoutKeys.get(id(obj))
+        if (entry is None):
+            return None
+
+        return (_PERSISTENT_LAYOUT, entry[0])
+
+class _LayoutUnpickler(pickle.Unpickler):
+    def __init__(self, file, layouts):
+        super().__init__(file)
+        self._layouts = layouts
+
+    def persistent_load(self, persistentId):
+        (tag, value) = persistentId
+
+        if (tag == _PERSISTENT_STATE):
+            return statecodec.decodeState(value)
+
+        return self._layouts[value]
+
+def _runWorker(agent, connection):
+    """
+    The main loop of a worker process: answer calls on the agent until told to stop.
+    """
+
+    layouts = {}
+
+    while (True):
+        try:
+            data = connection.recv_bytes()
+        except (EOFError, OSError):
+            return
+
+        (requestId, method, args, needsAnswer) = _LayoutUnpickler(io.BytesIO(data),
+                layouts).load()
+
+        if (method is None):
+            agent.stopPondering()
+            return
+
+        if (method == _ADD_LAYOUT):
+            layouts[args[0]] = args[1]
+            statecodec.registerLayout(args[1])
+            continue
+
+        try:
+            response = (requestId, True, getattr(agent, method)(*args))
+        except Exception as ex:
+            response = (requestId, False, ex)
+
+        if (not needsAnswer):
+            if (not response[1]):
+                logging.warning('Agent %d crashed in %s().' % (agent.index, method),
+                        exc_info = response[2])
+
+            continue
+
+        try:
+            data = pickle.dumps(response)
+        except Exception:
+            # The exception itself could not be pickled.
+            data = pickle.dumps((requestId, False, RuntimeError(repr(response[2]))))
+
+        connection.send_bytes(data)
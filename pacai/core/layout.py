@@ -1,8 +1,11 @@
 import os
 import random
+import weakref
 
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
 from pacai.core.distance import manhattan
-from pacai.core.grid import Grid
+from pacai.core.grid import BitGrid
 
 # By default, the layout directory is adjacent to this file.
 DEFAULT_LAYOUT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'layouts')
@@ -17,8 +20,8 @@ class Layout(object):
     def __init__(self, layoutText, maxGhosts = None):
         self.width = len(layoutText[0])
         self.height = len(layoutText)
-        self.walls = Grid(self.width, self.height, initialValue = False)
-        self.food = Grid(self.width, self.height, initialValue = False)
+        self.walls = BitGrid(self.width, self.height, initialValue = False)
+        self.food = BitGrid(self.width, self.height, initialValue = False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
@@ -26,12 +29,58 @@ class Layout(object):
 
         self.processLayoutText(layoutText, maxGhosts)
 
+        # Move tables for every open cell, see `Layout.getLegalActions`.
+        self._legalActions = {}
+        self._ghostLegalActions = {}
+        self._legalNeighbors = {}
+        self._buildMoveTables()
+
+    def getGhostLegalActions(self, position, direction):
+        """
+        Get the legal actions for a ghost at the position facing the direction.
+        Ghosts cannot stop, and cannot turn around unless they reach a dead end.
+        The caller owns the returned list.
+        """
+
+        actions = self._ghostLegalActions.get((position, direction))
+        if (actions is None):
+            actions = Actions.getPossibleActions(position, direction, self.walls)
+            return Layout._computeGhostActions(actions, direction)
+
+        return list(actions)
+
+    def getLegalActions(self, position, direction):
+        """
+        The same as `pacai.core.actions.Actions.getPossibleActions` on this layout's walls,
+        but a table lookup for agents at a grid point.
+        The caller owns the returned list.
+        """
+
+        actions = self._legalActions.get(position)
+        if (actions is None):
+            # In between grid points (or off the board).
+            return Actions.getPossibleActions(position, direction, self.walls)
+
+        return list(actions)
+
+    def getLegalNeighbors(self, position):
+        """
+        The same as `pacai.core.actions.Actions.getLegalNeighbors` on this layout's walls.
+        The caller owns the returned list.
+        """
+
+        neighbors = self._legalNeighbors.get(position)
+        if (neighbors is None):
+            return Actions.getLegalNeighbors(position, self.walls)
+
+        return list(neighbors)
+
     def getNumGhosts(self):
         return self.numGhosts
 
     def isWall(self, pos):
         x, col = pos
-        return self.walls[x][col]
+        return self.walls.get(x, col)
 
     def getHeight(self):
         return self.height
@@ -78,6 +127,41 @@ class Layout(object):
     def deepCopy(self):
         return Layout(self.layoutText[:])
 
+    def _buildMoveTables(self):
+        directions = [direction for (direction, vector) in Actions._directionsAsList]
+
+        for x in range(self.width):
+            for y in range(self.height):
+                if (self.walls.get(x, y)):
+                    continue
+
+                position = (x, y)
+
+                # Cells on the edge of an open board have moves that leave the board,
+                # leave those to `Actions` so they behave as they always have.
+                if (x == 0 or y == 0 or x == self.width - 1 or y == self.height - 1):
+                    continue
+
+                actions = Actions.getPossibleActions(position, Directions.STOP, self.walls)
+                self._legalActions[position] = tuple(actions)
+                self._legalNeighbors[position] = tuple(Actions.getLegalNeighbors(position,
+                        self.walls))
+
+                for direction in directions:
+                    ghostActions = Layout._computeGhostActions(list(actions), direction)
+                    self._ghostLegalActions[(position, direction)] = tuple(ghostActions)
+
+    @staticmethod
+    def _computeGhostActions(actions, direction):
+        if (Directions.STOP in actions):
+            actions.remove(Directions.STOP)
+
+        reverse = Actions.reverseDirection(direction)
+        if (reverse in actions and len(actions) > 1):
+            actions.remove(reverse)
+
+        return actions
+
     def processLayoutText(self, layoutText, maxGhosts):
         """
         Coordinates are flipped from the input format to the (x, y) convention here
@@ -104,9 +188,9 @@ class Layout(object):
 
     def processLayoutChar(self, x, y, layoutChar, maxGhosts):
         if (layoutChar == '%'):
-            self.walls[x][y] = True
+            self.walls.set(x, y, True)
         elif (layoutChar == '.'):
-            self.food[x][y] = True
+            self.food.set(x, y, True)
         elif (layoutChar == 'o'):
             self.capsules.append((x, y))
         elif (layoutChar == 'P'):
@@ -118,6 +202,110 @@ class Layout(object):
             self.agentPositions.append((int(layoutChar), (x, y)))
             self.numGhosts += 1
 
+class CaptureLayout(Layout):
+    """
+    A layout for capture.
+    On top of a normal layout, the static information about each team's side of the board
+    is worked out once here and shared by every state and game on the layout.
+
+    Red is on the left side (x < redWidth), blue on the right.
+    Agents are on the team of the side they start on.
+    """
+
+    def __init__(self, layoutText, maxGhosts = None):
+        super().__init__(layoutText, maxGhosts)
+
+        self.redWidth = int(self.width / 2)
+
+        # Which cells are on each side.
+        self.redMask = BitGrid(self.width, self.height, initialValue = False)
+        self.blueMask = BitGrid(self.width, self.height, initialValue = False)
+
+        for x in range(self.width):
+            mask = self.redMask
+            if (not self.isOnRedSide((x, 0))):
+                mask = self.blueMask
+
+            for y in range(self.height):
+                mask[x][y] = True
+
+        # The food each team starts out protecting.
+        self.redFood = BitGrid(self.width, self.height, initialValue = False)
+        self.blueFood = BitGrid(self.width, self.height, initialValue = False)
+
+        for (x, y) in self.food.asList():
+            if (self.isOnRedSide((x, y))):
+                self.redFood[x][y] = True
+            else:
+                self.blueFood[x][y] = True
+
+        self.redCapsules = []
+        self.blueCapsules = []
+
+        for capsule in self.capsules:
+            if (self.isOnRedSide(capsule)):
+                self.redCapsules.append(capsule)
+            else:
+                self.blueCapsules.append(capsule)
+
+        # The open cells along the middle of the board on each side.
+        self.redBorder = []
+        self.blueBorder = []
+
+        for y in range(self.height):
+            if (not self.walls.get(self.redWidth - 1, y)):
+                self.redBorder.append((self.redWidth - 1, y))
+
+            if (not self.walls.get(self.redWidth, y)):
+                self.blueBorder.append((self.redWidth, y))
+
+        # Team membership, in agent index order.
+        self.teams = [self.isOnRedSide(position) for (isPacman, position) in self.agentPositions]
+        self.redTeam = [index for (index, isRed) in enumerate(self.teams) if isRed]
+        self.blueTeam = [index for (index, isRed) in enumerate(self.teams) if not isRed]
+
+    def getBlueBorder(self):
+        """
+        Get the open cells on blue's side of the middle of the board.
+        The caller should not modify the list.
+        """
+
+        return self.blueBorder
+
+    def getRedBorder(self):
+        """
+        Get the open cells on red's side of the middle of the board.
+        The caller should not modify the list.
+        """
+
+        return self.redBorder
+
+    def isOnRedSide(self, position):
+        return position[0] < self.redWidth
+
+    # Override
+    def deepCopy(self):
+        return CaptureLayout(self.layoutText[:])
+
+# Capture layouts made for plain layouts, so each layout is only converted once.
+_captureLayouts = weakref.WeakKeyDictionary()
+
+def getCaptureLayout(layout):
+    """
+    Get a `CaptureLayout` for the layout.
+    Capture layouts are returned as-is, plain layouts are converted (once).
+    """
+
+    if (isinstance(layout, CaptureLayout)):
+        return layout
+
+    captureLayout = _captureLayouts.get(layout)
+    if (captureLayout is None):
+        captureLayout = CaptureLayout(layout.layoutText, maxGhosts = layout.getNumGhosts())
+        _captureLayouts[layout] = captureLayout
+
+    return captureLayout
+
 def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
     if (not name.endswith('.lay')):
         name += '.lay'
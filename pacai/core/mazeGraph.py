@@ -0,0 +1,321 @@
+"""
+A compressed graph of a maze, for fast point-to-point distance and path queries.
+
+Most of a maze is corridors: cells with exactly two open neighbors.
+A `MazeGraph` only keeps the other cells (junctions and dead ends) as nodes,
+and collapses each corridor between them into a single weighted edge.
+Queries then run a bidirectional A* over the (much smaller) graph,
+where a query position inside a corridor is joined to the two ends of its corridor.
+
+Graphs are built once per layout (see `getMazeGraph`).
+"""
+
+import heapq
+import itertools
+import weakref
+
+from pacai.core.actions import Actions
+
+# The offsets to the four neighbors of a cell.
+_NEIGHBOR_OFFSETS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+class MazeGraph(object):
+    """
+    The junctions of a maze, and the corridors that connect them.
+
+    Example:
+    ```
+    graph = getMazeGraph(gameState.getInitialLayout())
+    graph.getDistance((1, 1), (10, 10))
+    ```
+    """
+
+    def __init__(self, layout):
+        walls = layout.walls
+        cells = set(walls.asList(False))
+
+        self._cells = cells
+
+        # The cells of each corridor, from one end to the other (ends included).
+        self._corridors = []
+
+        # {cell: (corridor index, offset into the corridor)} for the cells inside corridors.
+        self._corridorCells = {}
+
+        # {junction: [(neighbor, length, corridor index, from offset, to offset), ...]}
+        self._edges = {}
+
+        self._numExpanded = 0
+
+        neighbors = {}
+        for (x, y) in cells:
+            neighbors[(x, y)] = [(x + dx, y + dy) for (dx, dy) in _NEIGHBOR_OFFSETS
+                    if (x + dx, y + dy) in cells]
+
+        junctions = [cell for cell in sorted(cells) if len(neighbors[cell]) != 2]
+        for junction in junctions:
+            self._edges[junction] = []
+
+        for junction in junctions:
+            self._walkCorridors(junction, neighbors)
+
+        # Loops without any junction on them get one (anywhere on the loop will do).
+        for cell in sorted(cells):
+            if (cell not in self._edges and cell not in self._corridorCells):
+                self._edges[cell] = []
+                self._walkCorridors(cell, neighbors)
+
+    def getDistance(self, position1, position2):
+        """
+        Get the length of the shortest path between two (open) positions,
+        or None if there is no path.
+        """
+
+        result = self._search(position1, position2)
+        if (result is None):
+            return None
+
+        return result[0]
+
+    def getExpandedCount(self):
+        """
+        Get the number of nodes expanded by the last query.
+        """
+
+        return self._numExpanded
+
+    def getNumJunctions(self):
+        return len(self._edges)
+
+    def getPath(self, position1, position2):
+        """
+        Get the actions along a shortest path between two (open) positions,
+        or None if there is no path.
+        """
+
+        result = self._search(position1, position2)
+        if (result is None):
+            return None
+
+        cells = result[1]
+
+        actions = []
+        for i in range(1, len(cells)):
+            vector = (cells[i][0] - cells[i - 1][0], cells[i][1] - cells[i - 1][1])
+            actions.append(Actions.vectorToDirection(vector))
+
+        return actions
+
+    def _getQueryEdges(self, start, goal):
+        """
+        Join the query positions that are inside corridors to the ends of their corridors.
+        Returns {node: [edge, ...]} with the extra edges.
+        """
+
+        queryEdges = {}
+
+        for position in [start, goal]:
+            if (position in self._edges or position in queryEdges):
+                continue
+
+            (corridorIndex, offset) = self._corridorCells[position]
+            corridor = self._corridors[corridorIndex]
+            end = len(corridor) - 1
+
+            queryEdges[position] = [
+                (corridor[0], offset, corridorIndex, offset, 0),
+                (corridor[end], end - offset, corridorIndex, offset, end),
+            ]
+
+            queryEdges.setdefault(corridor[0], []).append(
+                (position, offset, corridorIndex, 0, offset))
+            queryEdges.setdefault(corridor[end], []).append(
+                (position, end - offset, corridorIndex, end, offset))
+
+        # Two positions in the same corridor are also joined directly.
+        startCorridor = self._corridorCells.get(start)
+        goalCorridor = self._corridorCells.get(goal)
+        if (startCorridor is not None and goalCorridor is not None
+                and startCorridor[0] == goalCorridor[0]):
+            length = abs(startCorridor[1] - goalCorridor[1])
+            corridorIndex = startCorridor[0]
+
+            queryEdges[start].append((goal, length, corridorIndex, startCorridor[1],
+                    goalCorridor[1]))
+            queryEdges[goal].append((start, length, corridorIndex, goalCorridor[1],
+                    startCorridor[1]))
+
+        return queryEdges
+
+    def _search(self, start, goal):
+        """
+        Run a bidirectional A* from start to goal.
+        Returns (distance, [cell, ...]) or None if there is no path.
+
+        Both directions use the average of the forward and reverse manhattan heuristics
+        (which keeps them consistent with each other),
+        so the search can stop as soon as the two frontiers can not beat the best path found.
+        """
+
+        for position in [start, goal]:
+            if (position not in self._cells):
+                raise ValueError('Position is not an open cell: %s.' % (str(position)))
+
+        self._numExpanded = 0
+
+        if (start == goal):
+            return (0, [start])
+
+        queryEdges = self._getQueryEdges(start, goal)
+
+        def potential(node):
+            toGoal = abs(node[0] - goal[0]) + abs(node[1] - goal[1])
+            toStart = abs(node[0] - start[0]) + abs(node[1] - start[1])
+            return (toGoal - toStart) / 2.0
+
+        # Break ties by the order nodes were pushed.
+        counter = itertools.count()
+
+        # [forward, reverse]
+        signs = [1, -1]
+        distances = [{start: 0}, {goal: 0}]
+        parents = [{start: None}, {goal: None}]
+        closed = [set(), set()]
+        frontiers = [[(potential(start), next(counter), start)],
+                [(-potential(goal), next(counter), goal)]]
+
+        bestDistance = None
+        meeting = None
+
+        while (len(frontiers[0]) > 0 and len(frontiers[1]) > 0):
+            # Neither frontier can improve on the best path found.
+            if (bestDistance is not None
+                    and frontiers[0][0][0] + frontiers[1][0][0] >= bestDistance):
+                break
+
+            side = 0
+            if (frontiers[1][0][0] < frontiers[0][0][0]):
+                side = 1
+
+            node = heapq.heappop(frontiers[side])[2]
+            if (node in closed[side]):
+                continue
+
+            closed[side].add(node)
+            self._numExpanded += 1
+
+            nodeDistance = distances[side][node]
+            otherDistances = distances[1 - side]
+
+            for edge in itertools.chain(self._edges.get(node, ()), queryEdges.get(node, ())):
+                (neighbor, length) = edge[0:2]
+                if (neighbor in closed[side]):
+                    continue
+
+                distance = nodeDistance + length
+                if (neighbor in distances[side] and distances[side][neighbor] <= distance):
+                    continue
+
+                distances[side][neighbor] = distance
+                parents[side][neighbor] = (node, edge)
+
+                priority = distance + signs[side] * potential(neighbor)
+                heapq.heappush(frontiers[side], (priority, next(counter), neighbor))
+
+                if (neighbor in otherDistances):
+                    total = distance + otherDistances[neighbor]
+                    if (bestDistance is None or total < bestDistance):
+                        bestDistance = total
+                        meeting = neighbor
+
+        if (bestDistance is None):
+            return None
+
+        return (bestDistance, self._buildCells(parents, meeting))
+
+    def _buildCells(self, parents, meeting):
+        """
+        Put together the cells along the path that meets at the given node.
+        """
+
+        # The edges from the start to the meeting node.
+        forwardEdges = []
+        node = meeting
+        while (parents[0][node] is not None):
+            (node, edge) = parents[0][node]
+            forwardEdges.append((edge[2], edge[3], edge[4]))
+
+        forwardEdges.reverse()
+
+        # The edges from the meeting node to the goal (walked backwards by the reverse search).
+        node = meeting
+        while (parents[1][node] is not None):
+            (node, edge) = parents[1][node]
+            forwardEdges.append((edge[2], edge[4], edge[3]))
+
+        cells = []
+        for (corridorIndex, fromOffset, toOffset) in forwardEdges:
+            corridor = self._corridors[corridorIndex]
+
+            if (fromOffset <= toOffset):
+                edgeCells = corridor[fromOffset:(toOffset + 1)]
+            else:
+                edgeCells = corridor[toOffset:(fromOffset + 1)][::-1]
+
+            # Each edge starts where the last one ended.
+            if (len(cells) > 0):
+                edgeCells = edgeCells[1:]
+
+            cells += edgeCells
+
+        return cells
+
+    def _walkCorridors(self, junction, neighbors):
+        """
+        Follow every corridor out of a junction to the junction at its other end.
+        """
+
+        for first in neighbors[junction]:
+            # Corridors are walked from both ends, only keep the first walk.
+            if (first in self._corridorCells):
+                continue
+
+            if (first in self._edges and any(edge[0] == first and edge[1] == 1
+                    for edge in self._edges[junction])):
+                continue
+
+            corridor = [junction]
+            previous = junction
+            cell = first
+
+            while (cell not in self._edges):
+                corridor.append(cell)
+                (nextCell,) = [other for other in neighbors[cell] if other != previous]
+                (previous, cell) = (cell, nextCell)
+
+            corridor.append(cell)
+
+            corridorIndex = len(self._corridors)
+            self._corridors.append(corridor)
+
+            for offset in range(1, len(corridor) - 1):
+                self._corridorCells[corridor[offset]] = (corridorIndex, offset)
+
+            end = len(corridor) - 1
+            self._edges[junction].append((cell, end, corridorIndex, 0, end))
+            self._edges[cell].append((junction, end, corridorIndex, end, 0))
+
+# Graphs for each layout, so each layout is only compressed once.
+_mazeGraphs = weakref.WeakKeyDictionary()
+
+def getMazeGraph(layout):
+    """
+    Get the `MazeGraph` for a layout (built the first time it is asked for).
+    """
+
+    graph = _mazeGraphs.get(layout)
+    if (graph is None):
+        graph = MazeGraph(layout)
+        _mazeGraphs[layout] = graph
+
+    return graph
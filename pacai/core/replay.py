@@ -0,0 +1,178 @@
+"""
+A compact, streaming format for recorded games.
+
+A replay file holds:
+```
+    a magic string (and format version),
+    a length-prefixed JSON header (layout text, agent names, and any game-specific metadata),
+    one byte for every move made in the game.
+```
+Each move byte packs the agent index into the high five bits and the action into the low three.
+Moves are written as the game is played and read back one buffer at a time,
+so neither side ever has to hold a whole game in memory.
+
+Replays whose path ends in `COMPRESSED_EXTENSION` are gzip compressed.
+Readers detect compression on their own.
+"""
+
+import gzip
+import json
+import struct
+
+from pacai.core.directions import Directions
+from pacai.core.layout import Layout
+
+MAGIC = b'PACREPLAY\x01'
+GZIP_MAGIC = b'\x1f\x8b'
+COMPRESSED_EXTENSION = '.gz'
+
+HEADER_LENGTH = struct.Struct('<I')
+READ_BUFFER_SIZE = 4096
+
+ACTIONS = [
+    Directions.NORTH,
+    Directions.SOUTH,
+    Directions.EAST,
+    Directions.WEST,
+    Directions.STOP,
+]
+
+# Used when an agent returned something that is not an action (e.g. None).
+UNKNOWN_ACTION_CODE = 7
+
+ACTION_BITS = 3
+MAX_AGENTS = 2 ** (8 - ACTION_BITS)
+
+_ACTION_CODES = {action: code for (code, action) in enumerate(ACTIONS)}
+
+class ReplayWriter(object):
+    """
+    Writes a replay file one move at a time.
+    A writer can be attached to a `pacai.core.game.Game` (as its recorder)
+    to record the game as it is played.
+    """
+
+    def __init__(self, path, layout, agentNames, **metadata):
+        """
+        Args:
+            path: Where to write the replay.
+            layout: The `pacai.core.layout.Layout` the game is played on.
+            agentNames: The name of each agent (in index order).
+            metadata: Any other JSON-friendly information needed to replay the game.
+        """
+
+        if (len(agentNames) > MAX_AGENTS):
+            raise ValueError('Replays support at most %d agents.' % (MAX_AGENTS))
+
+        header = {
+            'layout': layout.layoutText,
+            'maxGhosts': layout.getNumGhosts(),
+            'agents': list(agentNames),
+            'metadata': metadata,
+        }
+
+        self._path = path
+        self._file = _open(path, 'wb', path.endswith(COMPRESSED_EXTENSION))
+
+        headerBytes = json.dumps(header).encode('utf-8')
+        self._file.write(MAGIC)
+        self._file.write(HEADER_LENGTH.pack(len(headerBytes)))
+        self._file.write(headerBytes)
+
+    def close(self):
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+
+    def getPath(self):
+        return self._path
+
+    def recordMove(self, agentIndex, action):
+        code = _ACTION_CODES.get(action, UNKNOWN_ACTION_CODE)
+        self._file.write(bytes(((agentIndex << ACTION_BITS) | code, )))
+
+    def recordMoves(self, moves):
+        for (agentIndex, action) in moves:
+            self.recordMove(agentIndex, action)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+class ReplayReader(object):
+    """
+    Reads a replay file.
+    The header is read right away,
+    while iterating over the reader streams the moves as (agentIndex, action) tuples.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._file = _open(path, 'rb', _isCompressed(path))
+
+        if (self._file.read(len(MAGIC)) != MAGIC):
+            self._file.close()
+            raise ValueError("'%s' is not a replay file." % (path))
+
+        (headerLength, ) = HEADER_LENGTH.unpack(self._file.read(HEADER_LENGTH.size))
+        self._header = json.loads(self._file.read(headerLength).decode('utf-8'))
+
+    def close(self):
+        self._file.close()
+
+    def getAgentNames(self):
+        return self._header['agents']
+
+    def getLayout(self):
+        """
+        Build the `pacai.core.layout.Layout` the game was played on.
+        """
+
+        return Layout(self._header['layout'], maxGhosts = self._header['maxGhosts'])
+
+    def getMetadata(self):
+        return self._header['metadata']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+    def __iter__(self):
+        actionMask = (1 << ACTION_BITS) - 1
+
+        while (True):
+            buffer = self._file.read(READ_BUFFER_SIZE)
+            if (len(buffer) == 0):
+                return
+
+            for value in buffer:
+                code = value & actionMask
+
+                action = None
+                if (code < len(ACTIONS)):
+                    action = ACTIONS[code]
+
+                yield (value >> ACTION_BITS, action)
+
+def isReplayFile(path):
+    """
+    Check if a file is in this replay format
+    (older replays are pickled dicts).
+    """
+
+    with _open(path, 'rb', _isCompressed(path)) as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+def _isCompressed(path):
+    with open(path, 'rb') as file:
+        return file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+def _open(path, mode, compressed):
+    if (compressed):
+        return gzip.open(path, mode)
+
+    return open(path, mode)
@@ -1,5 +1,6 @@
 from pacai.core.actions import Actions
 from pacai.core.directions import Directions
+from pacai.core.distanceCalculator import getDistanceTable
 from pacai.core.search.problem import SearchProblem
 
 class FoodSearchProblem(SearchProblem):
@@ -19,7 +20,44 @@ class FoodSearchProblem(SearchProblem):
         self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
         self.walls = startingGameState.getWalls()
         self.startingGameState = startingGameState
-        self.heuristicInfo = {}  # A dictionary for the heuristic to store information
+
+        # Maze distances between all the cells, and the food (from the start) they are between.
+        # Both are only built if a heuristic asks for them.
+        self._distances = None
+        self._foodDistances = None
+
+    def getFoodDistances(self):
+        """
+        Get the maze distance between every pair of food at the start of the search,
+        as a dict: {(food1, food2): distance}.
+        Food is only ever eaten, so this covers the food in every state of the search.
+        """
+
+        if (self._foodDistances is None):
+            foodList = self.start[1].asList()
+
+            self._foodDistances = {}
+            for food1 in foodList:
+                for food2 in foodList:
+                    self._foodDistances[(food1, food2)] = self.getMazeDistance(food1, food2)
+
+        return self._foodDistances
+
+    # Override
+    def getHeuristicKey(self, state):
+        # The food grid is keyed by the int behind it.
+        return (state[0], state[1].getBits())
+
+    def getMazeDistance(self, position1, position2):
+        """
+        Get the maze distance between two positions
+        (from the layout's `pacai.core.distanceCalculator.DistanceTable`).
+        """
+
+        if (self._distances is None):
+            self._distances = getDistanceTable(self.startingGameState.getInitialLayout())
+
+        return self._distances.getDistance(position1, position2)
 
     def startingState(self):
         return self.start
@@ -38,7 +76,7 @@ class FoodSearchProblem(SearchProblem):
             x, y = state[0]
             dx, dy = Actions.directionToVector(direction)
             nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
+            if not self.walls.get(nextx, nexty):
                 nextFood = state[1].copy()
                 nextFood[nextx][nexty] = False
                 successors.append((((nextx, nexty), nextFood), direction, 1))
@@ -57,7 +95,7 @@ class FoodSearchProblem(SearchProblem):
             # figure out the next state and see whether it's legal
             dx, dy = Actions.directionToVector(action)
             x, y = int(x + dx), int(y + dy)
-            if self.walls[x][y]:
+            if self.walls.get(x, y):
                 return 999999
             cost += 1
 
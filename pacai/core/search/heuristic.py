@@ -3,7 +3,16 @@ A heuristic function estimates the cost from the current state to the nearest
 goal in the provided `pacai.core.search.problem.SearchProblem`.
 """
 
+import functools
+
 from pacai.core import distance
+from pacai.util.lruCache import LRUCache
+
+# The most values `cached` keeps for each heuristic (per problem).
+DEFAULT_CACHE_SIZE = 100000
+
+# The most spanning tree weights `foodMST` keeps (per problem).
+MST_CACHE_SIZE = 20000
 
 def null(state, problem = None):
     """
@@ -38,3 +47,84 @@ def numFood(state, problem):
     """
 
     return state[1].count()
+
+def cached(heuristic, maxSize = DEFAULT_CACHE_SIZE):
+    """
+    Wrap a heuristic so that its values are remembered,
+    keyed by `pacai.core.search.problem.SearchProblem.getHeuristicKey`
+    (e.g. (position, food bits) for a `pacai.core.search.food.FoodSearchProblem`).
+    Each problem gets its own cache (in its heuristicInfo),
+    which holds the maxSize most recently used values.
+
+    Example: `search.astar(problem, heuristic.cached(heuristic.foodMST))`.
+    """
+
+    @functools.wraps(heuristic)
+    def cachedHeuristic(state, problem):
+        cache = problem.heuristicInfo.get((cached, heuristic))
+        if (cache is None):
+            cache = LRUCache(maxSize)
+            problem.heuristicInfo[(cached, heuristic)] = cache
+
+        key = problem.getHeuristicKey(state)
+
+        value = cache.get(key)
+        if (value is None):
+            value = heuristic(state, problem)
+            cache.put(key, value)
+
+        return value
+
+    return cachedHeuristic
+
+def foodMST(state, problem):
+    """
+    A heuristic for a `pacai.core.search.food.FoodSearchProblem`:
+    the maze distance to the closest food,
+    plus the weight of a minimum spanning tree over the food (by maze distance).
+    Every path that eats all the food has to reach some food and then connect the rest,
+    so this is admissible (and consistent).
+    """
+
+    (position, foodGrid) = state
+
+    foodList = foodGrid.asList()
+    if (len(foodList) == 0):
+        return 0
+
+    closest = min([problem.getMazeDistance(position, food) for food in foodList])
+
+    # The tree only depends on the food, which many states share.
+    cache = problem.heuristicInfo.get(foodMST)
+    if (cache is None):
+        cache = LRUCache(MST_CACHE_SIZE)
+        problem.heuristicInfo[foodMST] = cache
+
+    key = foodGrid.getBits()
+    treeWeight = cache.get(key)
+    if (treeWeight is None):
+        treeWeight = _spanningTreeWeight(foodList, problem.getFoodDistances())
+        cache.put(key, treeWeight)
+
+    return closest + treeWeight
+
+def _spanningTreeWeight(nodes, distances):
+    """
+    Prim's algorithm over a complete graph (with the distances between each pair of nodes).
+    """
+
+    # The cheapest edge from the tree to each node not in the tree.
+    costs = {node: distances[(nodes[0], node)] for node in nodes[1:]}
+
+    weight = 0
+    while (len(costs) > 0):
+        node = min(costs, key = costs.get)
+        weight += costs.pop(node)
+
+        for other in costs:
+            costs[other] = min(costs[other], distances[(node, other)])
+
+    return weight
+
+# `foodMST` with its values cached, so it can be picked by name (e.g. for a SearchAgent).
+cachedFoodMST = cached(foodMST)
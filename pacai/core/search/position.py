@@ -60,7 +60,7 @@ class PositionSearchProblem(SearchProblem):
             dx, dy = Actions.directionToVector(action)
             nextx, nexty = int(x + dx), int(y + dy)
 
-            if (not self.walls[nextx][nexty]):
+            if (not self.walls.get(nextx, nexty)):
                 nextState = (nextx, nexty)
                 cost = self.costFn(nextState)
 
@@ -90,7 +90,7 @@ class PositionSearchProblem(SearchProblem):
             # Check figure out the next state and see whether its' legal
             dx, dy = Actions.directionToVector(action)
             x, y = int(x + dx), int(y + dy)
-            if (self.walls[x][y]):
+            if (self.walls.get(x, y)):
                 return 999999
 
             cost += self.costFn((x, y))
@@ -32,6 +32,12 @@ class SearchProblem(abc.ABC):
         self._visitedLocations = set()
         self._visitHistory = []
 
+        # For heuristics to store information in (see `pacai.core.search.heuristic.cached`).
+        self.heuristicInfo = {}
+
+        # The most search nodes the search held in memory at once (if the search reports it).
+        self._maxStoredNodes = 0
+
     @abc.abstractmethod
     def actionsCost(self, actions):
         """
@@ -46,6 +52,17 @@ class SearchProblem(abc.ABC):
     def getExpandedCount(self):
         return self._numExpanded
 
+    def getHeuristicKey(self, state):
+        """
+        Get a small, hashable key for a state that heuristics can cache their values under.
+        Problems with large states should override this.
+        """
+
+        return state
+
+    def getMaxStoredNodes(self):
+        return self._maxStoredNodes
+
     def getVisitHistory(self):
         return self._visitHistory
 
@@ -60,6 +77,14 @@ class SearchProblem(abc.ABC):
 
         pass
 
+    def recordStoredNodes(self, numNodes):
+        """
+        Searches report how many nodes they are holding in memory through this,
+        and the most held at once is kept (see `SearchProblem.getMaxStoredNodes`).
+        """
+
+        self._maxStoredNodes = max(self._maxStoredNodes, numNodes)
+
     @abc.abstractmethod
     def startingState(self):
         """
@@ -1,5 +1,38 @@
+"""
+Generic graph search algorithms over a `pacai.core.search.problem.SearchProblem`.
+
+All the searches are graph searches:
+visited states go into hashed sets/dicts (so states must be hashable),
+and each state remembers its parent (and the action from it),
+so paths are only put together once a goal is found.
+Frontier entries that tie are taken in the order they were added (or last had their priority
+lowered).
+
+Every search returns the list of actions from the start to a goal,
+or None if no goal can be reached.
+Searches report the most nodes they held in memory to the problem
+(see `pacai.core.search.problem.SearchProblem.getMaxStoredNodes`).
+
+Searches that keep every state they reach can run out of memory on large state spaces
+(e.g. a `pacai.core.search.food.FoodSearchProblem` on a big layout).
+`iterativeDeepeningAStarSearch` and `simplifiedMemoryBoundedAStarSearch` trade time
+for a bound on the nodes they keep.
+"""
+
+import collections
+import heapq
+import itertools
+import math
+
 from pacai.core.directions import Directions
-from pacai.student import search
+from pacai.util.lruCache import LRUCache
+from pacai.util.priorityQueue import IndexedPriorityQueue
+
+# The most states `iterativeDeepeningAStarSearch` remembers the cost to (in each iteration).
+DEFAULT_TRANSPOSITION_TABLE_SIZE = 100000
+
+# The most nodes `simplifiedMemoryBoundedAStarSearch` keeps in memory.
+DEFAULT_MAX_NODES = 100000
 
 def tinyMazeSearch(problem):
     """
@@ -13,16 +46,503 @@ def tinyMazeSearch(problem):
 
     return [s, s, w, s, w, w, s, w]
 
-# Abbreviations
+def aStarSearch(problem, heuristic):
+    """
+    Search the node that has the lowest combined cost and heuristic first.
+    The path is optimal as long as the heuristic is consistent.
+    """
+
+    return _bestFirstSearch(problem, lambda cost, state: cost + heuristic(state, problem))
+
+def breadthFirstSearch(problem):
+    """
+    Search the shallowest nodes in the search tree first.
+    """
+
+    start = problem.startingState()
+    if (problem.isGoal(start)):
+        return []
+
+    # {state: (parent, action)}, also the set of states already reached.
+    parents = {start: None}
+    frontier = collections.deque([start])
+
+    while (len(frontier) > 0):
+        state = frontier.popleft()
+
+        for (successor, action, cost) in problem.successorStates(state):
+            if (successor in parents):
+                continue
+
+            parents[successor] = (state, action)
+            if (problem.isGoal(successor)):
+                problem.recordStoredNodes(len(parents))
+                return _buildPath(parents, successor)
+
+            frontier.append(successor)
+
+    problem.recordStoredNodes(len(parents))
+    return None
+
+def depthFirstSearch(problem):
+    """
+    Search the deepest nodes in the search tree first.
+    """
+
+    start = problem.startingState()
+
+    # {state: (parent, action)}, the states that have been expanded (or are the goal).
+    parents = {}
+    frontier = [(start, None)]
+    maxFrontier = 1
+
+    while (len(frontier) > 0):
+        (state, parent) = frontier.pop()
+        if (state in parents):
+            continue
+
+        parents[state] = parent
+        if (problem.isGoal(state)):
+            problem.recordStoredNodes(len(parents) + maxFrontier)
+            return _buildPath(parents, state)
+
+        for (successor, action, cost) in problem.successorStates(state):
+            if (successor not in parents):
+                frontier.append((successor, (state, action)))
+
+        maxFrontier = max(maxFrontier, len(frontier))
+
+    problem.recordStoredNodes(len(parents) + maxFrontier)
+    return None
+
+def greedySearch(problem, heuristic):
+    """
+    Search the node that looks closest to a goal (by the heuristic) first.
+    Fast, but the path is not optimal.
+    """
+
+    return _bestFirstSearch(problem, lambda cost, state: heuristic(state, problem))
+
+def iterativeDeepeningAStarSearch(problem, heuristic,
+        tableSize = DEFAULT_TRANSPOSITION_TABLE_SIZE):
+    """
+    Run depth-first searches that give up on nodes with a cost plus heuristic over a bound,
+    raising the bound to the lowest value that went over it until a goal is found.
+    Only the current path is kept, along with a transposition table
+    (the cheapest cost each state was reached for in this iteration, bounded by an LRU)
+    so states reached again for no less cost are not searched twice.
+    The path is optimal as long as the heuristic is admissible.
+    """
+
+    start = problem.startingState()
+    if (problem.isGoal(start)):
+        return []
+
+    bound = heuristic(start, problem)
+    table = LRUCache(tableSize)
+
+    while (True):
+        table.clear()
+
+        (actions, bound) = _boundedSearch(problem, heuristic, start, bound, table)
+        if (actions is not None):
+            return actions
+
+        if (bound == math.inf):
+            return None
+
+def simplifiedMemoryBoundedAStarSearch(problem, heuristic, maxNodes = DEFAULT_MAX_NODES):
+    """
+    A* that never holds more than maxNodes nodes (SMA*).
+    When memory is full, the leaf with the highest cost plus heuristic is forgotten,
+    and its parent remembers that value so the leaf can be regenerated if it becomes the best.
+    The path is optimal if the optimal path fits in memory (it has fewer than maxNodes steps)
+    and the heuristic is admissible.
+    Nodes are forgotten after each expansion,
+    so the children of one node can briefly take the search past maxNodes.
+
+    Like a graph search, only one node is kept for each state (see `SearchProblem.getHeuristicKey`):
+    a state that is reached again is dropped unless the new path to it is cheaper,
+    in which case the old node (and everything under it) is retired.
+    """
+
+    if (maxNodes < 2):
+        raise ValueError('SMA* needs room for at least two nodes, got %d.' % (maxNodes))
+
+    start = problem.startingState()
+    root = _MemoryBoundedNode(start, problem.getHeuristicKey(start), None, None, 0,
+            heuristic(start, problem))
+
+    frontier = _MemoryBoundedFrontier()
+    frontier.refresh(root)
+
+    # {key: node}, the node in memory for each state.
+    liveNodes = {root.key: root}
+
+    numNodes = 1
+    maxStoredNodes = 1
+
+    while (True):
+        node = frontier.popBest()
+        if (node is None or node.f == math.inf):
+            problem.recordStoredNodes(maxStoredNodes)
+            return None
+
+        if (problem.isGoal(node.state)):
+            problem.recordStoredNodes(maxStoredNodes)
+            return node.getPath()
+
+        numNodes += _expandMemoryBoundedNode(problem, heuristic, node, maxNodes, frontier,
+                liveNodes)
+        maxStoredNodes = max(maxStoredNodes, numNodes)
+
+        node.backup(frontier)
+
+        # Make room by forgetting the worst leaves.
+        while (numNodes > maxNodes):
+            forgotten = frontier.forgetWorst()
+            del liveNodes[forgotten.key]
+            numNodes -= 1
+
+def uniformCostSearch(problem):
+    """
+    Search the node of least total cost first.
+    """
+
+    return _bestFirstSearch(problem, lambda cost, state: cost)
+
+def _bestFirstSearch(problem, priorityFunction):
+    """
+    Search the node with the lowest priority first,
+    where priorityFunction(cost, state) gives the priority of a state reached for a cost.
+    Goals are checked when a node is expanded, so the cheapest path to the goal (by priority)
+    is the one returned.
+    """
+
+    start = problem.startingState()
+
+    # The cheapest cost to each state found so far, and how it was reached.
+    costs = {start: 0}
+    parents = {start: None}
+    closed = set()
+
+    # States found again by a cheaper path have their priority lowered (instead of being pushed
+    # again), so the frontier never holds more than one entry for a state.
+    frontier = IndexedPriorityQueue()
+    frontier.push(start, priorityFunction(0, start))
+
+    while (not frontier.isEmpty()):
+        state = frontier.pop()
+
+        if (problem.isGoal(state)):
+            problem.recordStoredNodes(len(costs))
+            return _buildPath(parents, state)
+
+        closed.add(state)
+        stateCost = costs[state]
+
+        for (successor, action, cost) in problem.successorStates(state):
+            if (successor in closed):
+                continue
+
+            successorCost = stateCost + cost
+            if (successor in costs and costs[successor] <= successorCost):
+                continue
+
+            costs[successor] = successorCost
+            parents[successor] = (state, action)
+
+            frontier.update(successor, priorityFunction(successorCost, successor))
+
+    problem.recordStoredNodes(len(costs))
+    return None
+
+def _boundedSearch(problem, heuristic, start, bound, table):
+    """
+    One iteration of `iterativeDeepeningAStarSearch`.
+    Returns (actions, None) if a goal was found,
+    and (None, the lowest cost plus heuristic over the bound) otherwise.
+    """
 
-breadthFirstSearch = search.breadthFirstSearch
-bfs = search.breadthFirstSearch
+    nextBound = math.inf
 
-depthFirstSearch = search.depthFirstSearch
-dfs = search.depthFirstSearch
+    startKey = problem.getHeuristicKey(start)
+    pathKeys = {startKey}
+    actions = []
 
-aStarSearch = search.aStarSearch
-astar = search.aStarSearch
+    # The path being searched: [(key, cost, successors to try), ...].
+    # (A stack instead of recursion, since paths can be longer than the recursion limit.)
+    path = [(startKey, 0, iter(problem.successorStates(start)))]
+    maxStoredNodes = 1
+
+    while (len(path) > 0):
+        (key, cost, successors) = path[-1]
+
+        step = next(successors, None)
+        if (step is None):
+            path.pop()
+            pathKeys.remove(key)
+            if (len(actions) > 0):
+                actions.pop()
+
+            continue
+
+        (successor, action, stepCost) = step
+
+        successorKey = problem.getHeuristicKey(successor)
+        if (successorKey in pathKeys):
+            continue
+
+        successorCost = cost + stepCost
+        estimate = successorCost + heuristic(successor, problem)
+        if (estimate > bound):
+            nextBound = min(nextBound, estimate)
+            continue
+
+        tableCost = table.get(successorKey)
+        if (tableCost is not None and tableCost <= successorCost):
+            continue
+
+        table.put(successorKey, successorCost)
+
+        if (problem.isGoal(successor)):
+            problem.recordStoredNodes(max(maxStoredNodes, len(path) + len(table)))
+            return (actions + [action], None)
+
+        actions.append(action)
+        pathKeys.add(successorKey)
+        path.append((successorKey, successorCost, iter(problem.successorStates(successor))))
+
+        maxStoredNodes = max(maxStoredNodes, len(path) + len(table))
+
+    problem.recordStoredNodes(maxStoredNodes)
+    return (None, nextBound)
+
+def _buildPath(parents, state):
+    """
+    Follow the parent pointers from the state back to the start.
+    """
+
+    actions = []
+
+    parent = parents[state]
+    while (parent is not None):
+        (state, action) = parent
+        actions.append(action)
+        parent = parents[state]
+
+    actions.reverse()
+    return actions
+
+def _expandMemoryBoundedNode(problem, heuristic, node, maxNodes, frontier, liveNodes):
+    """
+    Generate the children of a node for `simplifiedMemoryBoundedAStarSearch`
+    (just the forgotten ones, if the node still has children),
+    and add them to the frontier.
+    Children whose state is already in memory (liveNodes) with a path at least as cheap are dropped.
+    Returns the change in the number of nodes in memory.
+    """
+
+    numNew = 0
+
+    for (successor, action, cost) in problem.successorStates(node.state):
+        key = problem.getHeuristicKey(successor)
+        childCost = node.g + cost
+
+        # This also covers the node's own ancestors and (still remembered) children.
+        existing = liveNodes.get(key)
+        if (existing is not None):
+            if (existing.g <= childCost):
+                continue
+
+            numNew -= _retireMemoryBoundedNode(existing, frontier, liveNodes)
+
+        # Never let a child go below its parent (pathmax),
+        # so the values forgotten into the parent carry over to regenerated children.
+        estimate = max(node.f, childCost + heuristic(successor, problem))
+
+        # A path this deep can not be extended in memory, so only a goal will do.
+        if (node.depth + 2 >= maxNodes and not problem.isGoal(successor)):
+            estimate = math.inf
+
+        child = _MemoryBoundedNode(successor, key, node, action, childCost, estimate)
+        node.children.append(child)
+        liveNodes[key] = child
+        frontier.refresh(child)
+        numNew += 1
+
+    node.forgotten = math.inf
+    if (len(node.children) == 0):
+        node.f = math.inf
+
+    return numNew
+
+def _retireMemoryBoundedNode(node, frontier, liveNodes):
+    """
+    Remove a node that was reached by a cheaper path (and everything under it) from memory.
+    Unlike a forgotten node, its parent does not remember it,
+    since the cheaper path covers everything that could be reached through it.
+    Returns the number of nodes removed.
+    """
+
+    parent = node.parent
+    parent.children.remove(node)
+
+    numRetired = 0
+    stack = [node]
+    while (len(stack) > 0):
+        retired = stack.pop()
+        stack += retired.children
+
+        retired.isAlive = False
+        retired.version += 1
+        del liveNodes[retired.key]
+        numRetired += 1
+
+    # With no children left, the parent is a leaf again (with its children's estimate).
+    if (len(parent.children) == 0):
+        parent.f = parent.forgotten
+
+    parent.backup(frontier)
+
+    return numRetired
+
+class _MemoryBoundedNode(object):
+    """
+    A node in the tree that `simplifiedMemoryBoundedAStarSearch` keeps in memory.
+    """
+
+    __slots__ = ('state', 'key', 'parent', 'action', 'g', 'f', 'depth', 'children',
+            'forgotten', 'version', 'isAlive')
+
+    def __init__(self, state, key, parent, action, g, f):
+        self.state = state
+        self.key = key
+        self.parent = parent
+        self.action = action
+        self.g = g
+        self.f = f
+
+        self.depth = 0
+        if (parent is not None):
+            self.depth = parent.depth + 1
+
+        self.children = []
+
+        # The lowest estimate of any forgotten child.
+        self.forgotten = math.inf
+
+        # Bumped whenever the node changes, so stale frontier entries can be spotted.
+        self.version = 0
+        self.isAlive = True
+
+    def backup(self, frontier):
+        """
+        Update the estimates of this node and its ancestors from their children,
+        and put this node back into the frontier.
+        """
+
+        node = self
+        while (node is not None):
+            if (len(node.children) > 0):
+                estimate = min(min([child.f for child in node.children]), node.forgotten)
+                if (estimate == node.f and node is not self):
+                    break
+
+                node.f = estimate
+
+            node = node.parent
+
+        frontier.refresh(self)
+
+    def getPath(self):
+        actions = []
+
+        node = self
+        while (node.parent is not None):
+            actions.append(node.action)
+            node = node.parent
+
+        actions.reverse()
+        return actions
+
+class _MemoryBoundedFrontier(object):
+    """
+    The nodes `simplifiedMemoryBoundedAStarSearch` can work on:
+    the best node to expand (lowest estimate, deepest first),
+    and the worst leaf to forget (highest estimate, shallowest first).
+    Leaves can be expanded, and so can nodes with forgotten children (to regenerate them).
+    Entries are never removed from the heaps, they are skipped once their node changes.
+    """
+
+    def __init__(self):
+        self._best = []
+        self._worst = []
+        self._counter = itertools.count()
+
+    def forgetWorst(self):
+        """
+        Forget the worst leaf, and have its parent remember its estimate.
+        Returns the forgotten node.
+        """
+
+        node = self._pop(self._worst, True)
+
+        node.isAlive = False
+        node.version += 1
+
+        parent = node.parent
+        parent.children.remove(node)
+        parent.forgotten = min(parent.forgotten, node.f)
+
+        # With no children left, the parent is a leaf again (with its children's estimate).
+        if (len(parent.children) == 0):
+            parent.f = parent.forgotten
+
+        self.refresh(parent)
+
+        return node
+
+    def popBest(self):
+        return self._pop(self._best, False)
+
+    def refresh(self, node):
+        """
+        Put a node that changed back into the right heaps (under its new values).
+        """
+
+        node.version += 1
+
+        if (len(node.children) == 0):
+            count = next(self._counter)
+            heapq.heappush(self._best, (node.f, -node.depth, count, node.version, node))
+
+            # The root is never forgotten.
+            if (node.parent is not None):
+                heapq.heappush(self._worst, (-node.f, node.depth, count, node.version, node))
+        elif (node.forgotten < math.inf):
+            heapq.heappush(self._best,
+                    (node.forgotten, -node.depth, next(self._counter), node.version, node))
+
+    def _pop(self, heap, isWorst):
+        while (len(heap) > 0):
+            (value, depth, count, version, node) = heapq.heappop(heap)
+            if (node.isAlive and version == node.version):
+                # Popped nodes are out of the frontier until they are refreshed.
+                node.version += 1
+                return node
+
+        if (isWorst):
+            raise RuntimeError('No leaves left to forget.')
+
+        return None
+
+# Abbreviations
 
-uniformCostSearch = search.uniformCostSearch
-ucs = search.uniformCostSearch
+bfs = breadthFirstSearch
+dfs = depthFirstSearch
+astar = aStarSearch
+ucs = uniformCostSearch
+greedy = greedySearch
+idastar = iterativeDeepeningAStarSearch
+smastar = simplifiedMemoryBoundedAStarSearch
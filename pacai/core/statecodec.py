@@ -0,0 +1,293 @@
+"""
+A compact binary encoding for game states.
+
+Layouts never change during a game, so an encoded state only references its layout (by id)
+and holds just the parts of the state that change:
+```
+    a header (format version, state type, layout id, flags, last agent moved, and score),
+    the Zobrist hashes of the food and capsules,
+    the food, as the bits of its `pacai.core.grid.BitGrid`,
+    the capsules that are left, as one bit for each capsule in the layout,
+    each agent's position (in half cells), direction, pacman flag, and scared timer,
+    any extra ints the state type adds (e.g. the time left in capture).
+```
+Layout ids come from a digest of the layout, so they are the same in every process.
+A layout has to be registered (`registerLayout`) in the process that decodes states on it.
+Encoding a state registers its layout, so states can always be decoded in the same process.
+When equal layouts are registered, the latest one is used for decoding.
+The codec does not keep layouts alive on its own (besides a few recently decoded ones),
+so a layout stays registered only while something else (e.g. a game) still holds onto it.
+
+Only the dynamic parts of a state are encoded.
+Things that are only used by views (the last food/capsule eaten and highlighted locations)
+are not kept.
+"""
+
+import hashlib
+import struct
+import weakref
+
+from pacai.core.directions import Directions
+from pacai.core.grid import BitGrid
+from pacai.util import reflection
+from pacai.util.lruCache import LRUCache
+
+FORMAT_VERSION = 1
+
+LAYOUT_ID_BYTES = 8
+
+# How many fresh states (one per layout and state type) to keep around for decoding.
+TEMPLATE_CACHE_SIZE = 16
+
+# The game states that can be encoded (in code order),
+# along with the constructor arguments (after the layout) for a fresh state.
+# The dynamic parts of a fresh state are all replaced when decoding.
+# States are looked up by class name, so the classes work when run as `__main__` too.
+STATE_TYPES = [
+    ('pacai.bin.pacman.PacmanGameState', []),
+    ('pacai.bin.capture.CaptureGameState', [0]),
+]
+
+DIRECTIONS = [
+    Directions.NORTH,
+    Directions.SOUTH,
+    Directions.EAST,
+    Directions.WEST,
+    Directions.STOP,
+]
+
+FLAG_GAMEOVER = 1 << 0
+FLAG_WIN = 1 << 1
+FLAG_INT_SCORE = 1 << 2
+
+AGENT_FLAG_PACMAN = 1 << 3
+AGENT_DIRECTION_MASK = AGENT_FLAG_PACMAN - 1
+
+# Version, state type, layout id, flags, last agent moved, score, food hash, capsule hash.
+HEADER = struct.Struct('<BB%dsBbdQQ' % (LAYOUT_ID_BYTES))
+# Position (in half cells), direction and flags, scared timer.
+AGENT = struct.Struct('<hhBH')
+EXTRA = struct.Struct('<q')
+
+# Marks an unknown agent position.
+NO_POSITION = -(2 ** 15)
+
+_STATE_CODES = {name.split('.')[-1]: code for (code, (name, args)) in enumerate(STATE_TYPES)}
+_DIRECTION_CODES = {direction: code for (code, direction) in enumerate(DIRECTIONS)}
+
+# {layoutId: layout}
+_layouts = weakref.WeakValueDictionary()
+# {layout: layoutId}
+_layoutIds = weakref.WeakKeyDictionary()
+# {(layoutId, stateCode): state}, a fresh state to build decoded states from.
+# Templates hold onto their layout, so only the most recently used ones are kept.
+_templates = LRUCache(TEMPLATE_CACHE_SIZE)
+# [stateClass], filled in as states are decoded.
+_stateClasses = [None] * len(STATE_TYPES)
+
+def canEncode(state):
+    """
+    Check if the state is of a type this codec knows.
+    """
+
+    return (type(state).__name__ in _STATE_CODES)
+
+def decodeState(data):
+    """
+    Decode a state made by `encodeState`.
+    The state's layout must already be registered in this process (see `registerLayout`).
+    """
+
+    try:
+        return _decode(memoryview(data))
+    except (IndexError, struct.error):
+        raise ValueError('Encoded state is too short.')
+
+def encodeState(state):
+    """
+    Encode the dynamic parts of a state as bytes.
+    """
+
+    stateCode = _STATE_CODES.get(type(state).__name__)
+    if (stateCode is None):
+        raise ValueError("Unknown state type: '%s'." % (type(state).__name__))
+
+    layout = state.getInitialLayout()
+    layoutId = registerLayout(layout)
+
+    flags = 0
+    if (state._gameover):
+        flags |= FLAG_GAMEOVER
+
+    if (state._win):
+        flags |= FLAG_WIN
+
+    score = state._score
+    if (isinstance(score, int)):
+        flags |= FLAG_INT_SCORE
+
+    lastAgentMoved = state._lastAgentMoved
+    if (lastAgentMoved is None):
+        lastAgentMoved = -1
+
+    parts = [HEADER.pack(FORMAT_VERSION, stateCode, layoutId, flags, lastAgentMoved, score,
+            state._foodHash, state._capsuleHash)]
+
+    parts.append(_writeBits(state._food.getBits(), layout.getWidth() * layout.getHeight()))
+
+    capsuleBits = 0
+    for (i, capsule) in enumerate(layout.capsules):
+        if (capsule in state._capsules):
+            capsuleBits |= (1 << i)
+
+    parts.append(_writeBits(capsuleBits, len(layout.capsules)))
+
+    for agentState in state._agentStates:
+        agentFlags = _DIRECTION_CODES[agentState.getDirection()]
+        if (agentState.isPacman()):
+            agentFlags |= AGENT_FLAG_PACMAN
+
+        (x, y) = _toHalfCells(agentState.getPosition())
+        parts.append(AGENT.pack(x, y, agentFlags, agentState.getScaredTimer()))
+
+    extra = state._getCodecExtra()
+    parts.append(bytes([len(extra)]))
+    for value in extra:
+        parts.append(EXTRA.pack(value))
+
+    return b''.join(parts)
+
+def getLayoutId(layout):
+    """
+    Get the id states on this layout are encoded with.
+    The id is a digest of the layout, so equal layouts get the same id in any process.
+    """
+
+    layoutId = _layoutIds.get(layout)
+    if (layoutId is None):
+        text = repr(('\n'.join(layout.layoutText), len(layout.agentPositions))).encode('utf-8')
+        layoutId = hashlib.sha1(text).digest()[:LAYOUT_ID_BYTES]
+        _layoutIds[layout] = layoutId
+
+    return layoutId
+
+def registerLayout(layout):
+    """
+    Make the layout available for decoding states.
+    Returns the layout's id.
+    """
+
+    layoutId = getLayoutId(layout)
+    _layouts[layoutId] = layout
+
+    return layoutId
+
+def _decode(data):
+    (version, stateCode, layoutId, flags, lastAgentMoved, score, foodHash,
+        capsuleHash) = HEADER.unpack_from(data, 0)
+
+    if (version != FORMAT_VERSION):
+        raise ValueError("Unknown state format version: %d." % (version))
+
+    if (stateCode >= len(STATE_TYPES)):
+        raise ValueError("Unknown state type: %d." % (stateCode))
+
+    layout = _layouts.get(layoutId)
+    if (layout is None):
+        raise ValueError("Unknown layout (%s), it needs to be registered first."
+                % (layoutId.hex()))
+
+    state = _getTemplate(stateCode, layoutId, layout)._initSuccessor()
+    offset = HEADER.size
+
+    width = layout.getWidth()
+    height = layout.getHeight()
+    (foodBits, offset) = _readBits(data, offset, width * height)
+    state._food = BitGrid.fromBits(width, height, foodBits)
+    state._numFood = state._food.count()
+    state._foodHash = foodHash
+
+    (capsuleBits, offset) = _readBits(data, offset, len(layout.capsules))
+    state._capsules = [capsule for (i, capsule) in enumerate(layout.capsules)
+            if (capsuleBits >> i) & 1]
+    state._capsuleHash = capsuleHash
+
+    for index in range(state.getNumAgents()):
+        (x, y, agentFlags, scaredTimer) = AGENT.unpack_from(data, offset)
+        offset += AGENT.size
+
+        agentState = state._agentStates[index].copy()
+        agentState.restore(_fromHalfCells(x, y), DIRECTIONS[agentFlags & AGENT_DIRECTION_MASK],
+                bool(agentFlags & AGENT_FLAG_PACMAN), scaredTimer)
+        state._agentStates[index] = agentState
+
+    state._copiedAgents = (1 << state.getNumAgents()) - 1
+
+    if (flags & FLAG_INT_SCORE):
+        score = int(score)
+
+    state._score = score
+    state._gameover = bool(flags & FLAG_GAMEOVER)
+    state._win = bool(flags & FLAG_WIN)
+
+    state._lastAgentMoved = None
+    if (lastAgentMoved >= 0):
+        state._lastAgentMoved = lastAgentMoved
+
+    numExtra = data[offset]
+    offset += 1
+
+    extra = []
+    for i in range(numExtra):
+        extra.append(EXTRA.unpack_from(data, offset)[0])
+        offset += EXTRA.size
+
+    state._setCodecExtra(tuple(extra))
+
+    if (offset != len(data)):
+        raise ValueError('Encoded state has %d extra bytes.' % (len(data) - offset))
+
+    return state
+
+def _fromHalfCells(x, y):
+    if (x == NO_POSITION):
+        return None
+
+    return (_fromHalfCell(x), _fromHalfCell(y))
+
+def _fromHalfCell(value):
+    # Keep whole cells as ints, like the positions in the layout.
+    if (value % 2 == 0):
+        return value // 2
+
+    return value / 2
+
+def _getTemplate(stateCode, layoutId, layout):
+    template = _templates.get((layoutId, stateCode))
+    if (template is None or template.getInitialLayout() is not layout):
+        (name, args) = STATE_TYPES[stateCode]
+        if (_stateClasses[stateCode] is None):
+            _stateClasses[stateCode] = reflection.qualifiedImport(name)
+
+        template = _stateClasses[stateCode](layout, *args)
+        _templates.put((layoutId, stateCode), template)
+
+    return template
+
+def _readBits(data, offset, numBits):
+    numBytes = (numBits + 7) // 8
+    bits = int.from_bytes(data[offset:(offset + numBytes)], 'little')
+    return (bits, offset + numBytes)
+
+def _toHalfCells(position):
+    if (position is None):
+        return (NO_POSITION, NO_POSITION)
+
+    (x, y) = position
+    if (x * 2 != int(x * 2) or y * 2 != int(y * 2)):
+        raise ValueError('Agent positions must be in half cells, found: %s.' % (str(position)))
+
+    return (int(x * 2), int(y * 2))
+
+def _writeBits(bits, numBits):
+    return bits.to_bytes((numBits + 7) // 8, 'little')
@@ -25,15 +25,28 @@ class Frame(abc.ABC):
     Frames are the basic units of the views.
     """
 
-    def __init__(self, frame, state, turn):
+    def __init__(self, frame, state, turn, previous = None):
+        """
+        If the previous frame (of the same game) is passed,
+        the board is built from the previous board by only updating the cells that changed.
+        """
+
         self._frame = frame
         self._turn = turn
 
-        self._boardHeight = state.getInitialLayout().getHeight()
-        self._boardWidth = state.getInitialLayout().getWidth()
+        self._layout = state.getInitialLayout()
+        self._boardHeight = self._layout.getHeight()
+        self._boardWidth = self._layout.getWidth()
+
+        # Remember the items on the board, so the next frame can see what changed.
+        self._foodBits = state.getFood().getBits()
+        self._capsules = set(state.getCapsules())
 
         # All items on the board are at integral potision.
-        self._board = self._buildBoard(state)
+        if (previous is not None and previous._layout is self._layout):
+            self._board = self._updateBoard(previous, state)
+        else:
+            self._board = self._buildBoard(state)
 
         # Agents may not be at integral positions, so they are represented independently.
         self._agentTokens = self._getAgentTokens(state)
@@ -122,17 +135,44 @@ class Frame(abc.ABC):
 
             items = self._boardHeight * [token.EMPTY_TOKEN]
             for y in range(self._boardHeight):
-                if (state.hasWall(x, y)):
-                    items[y] = self._getWallToken(x, y, state)
-                elif (state.hasFood(x, y)):
-                    items[y] = self._getFoodToken(x, y, state)
-                elif (state.hasCapsule(x, y)):
-                    items[y] = self._getCapsuleToken(x, y, state)
+                items[y] = self._getItemToken(x, y, state)
 
             board[x] = items
 
         return board
 
+    def _updateBoard(self, previous, state):
+        """
+        Build the board from the previous frame's board.
+        Boards are shared between frames, so they are never modified in place:
+        only the columns with a changed cell are copied.
+        """
+
+        changedCells = list(previous._capsules ^ self._capsules)
+
+        # Walk the bits of the food that was eaten (or put back).
+        changedFood = previous._foodBits ^ self._foodBits
+        while (changedFood):
+            lowBit = changedFood & -changedFood
+            index = lowBit.bit_length() - 1
+            changedCells.append((index // self._boardHeight, index % self._boardHeight))
+            changedFood ^= lowBit
+
+        if (len(changedCells) == 0):
+            return previous._board
+
+        board = list(previous._board)
+        copiedColumns = set()
+
+        for (x, y) in changedCells:
+            if (x not in copiedColumns):
+                board[x] = list(board[x])
+                copiedColumns.add(x)
+
+            board[x][y] = self._getItemToken(x, y, state)
+
+        return board
+
     @abc.abstractmethod
     def _getAgentBaseToken(self, x, y, agentIndex, state):
         pass
@@ -175,6 +215,20 @@ class Frame(abc.ABC):
     def _getFoodToken(self, x, y, state):
         return self._getFoodBaseToken(x, y, state) + token.FOOD_OFFSET
 
+    def _getItemToken(self, x, y, state):
+        """
+        Get the token for the (non-agent) item at a location.
+        """
+
+        if (state.hasWall(x, y)):
+            return self._getWallToken(x, y, state)
+        elif (state.hasFood(x, y)):
+            return self._getFoodToken(x, y, state)
+        elif (state.hasCapsule(x, y)):
+            return self._getCapsuleToken(x, y, state)
+
+        return token.EMPTY_TOKEN
+
     @abc.abstractmethod
     def _getTextColor(self):
         pass
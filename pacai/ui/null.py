@@ -9,12 +9,9 @@ class AbstractNullView(AbstractView):
         super().__init__(**kwargs)
 
     # Override
-    def _createFrame(self, state):
-        # Only create frames if we are creating a gif and this is not a skip frame.
-        if (self._saveFrames and (self._frameCount % self._skipFrames == 0)):
-            return super()._createFrame(state)
-
-        return None
+    def _needsFrame(self, state, forceDraw):
+        # Frames are only created for gifs.
+        return False
 
     # Override
     def _drawFrame(self, state, frame, forceDraw = False):
@@ -10,9 +10,13 @@ class AbstractTextView(AbstractView):
         super().__init__(**kwargs)
 
     # Override
-    def _drawFrame(self, state, frame, forceDraw = False):
+    def _needsFrame(self, state, forceDraw):
         # Only draw after agents moves.
-        if (not forceDraw and state.getLastAgentMoved() != 0):
+        return forceDraw or state.getLastAgentMoved() == 0
+
+    # Override
+    def _drawFrame(self, state, frame, forceDraw = False):
+        if (not self._needsFrame(state, forceDraw)):
             return
 
         print()
@@ -34,14 +34,20 @@ class AbstractView(abc.ABC):
         self._skipFrames = max(1, int(skipFrames))
         self._keyFrames = []
 
+        # The last frame this view created.
+        # New frames are built from it (see `pacai.ui.frame.Frame`).
+        self._lastFrame = None
+
         # The number of frames this view has produced.
         self._frameCount = 0
         # The number of turns this view has produced.
         # (Tracked by the number of times agent 0 has been animated.)
         self._turnCount = 0
 
-        self._sprites = spritesheet.loadSpriteSheet(spritesPath)
-        self._font = ImageFont.truetype(FONT_PATH, spritesheet.SQUARE_SIZE - 14)
+        # Sprites and the font are only loaded when something is drawn
+        # (see `AbstractView._getSprites` and `AbstractView._getFont`).
+        self._sprites = None
+        self._font = None
 
     def finish(self):
         """
@@ -52,7 +58,10 @@ class AbstractView(abc.ABC):
         if (self._saveFrames and len(self._keyFrames) > 0):
             gifTimePerFrameMS = int(1.0 / self._gifFPS * 1000.0)
 
-            images = [frame.toImage(self._sprites, self._font) for frame in self._keyFrames]
+            sprites = self._getSprites()
+            font = self._getFont()
+
+            images = [frame.toImage(sprites, font) for frame in self._keyFrames]
             images[0].save(self._gifPath, save_all = True, append_images = images,
                     duration = gifTimePerFrameMS, loop = 0, optimize = False)
 
@@ -68,7 +77,7 @@ class AbstractView(abc.ABC):
         Perform an initial drawing of the view.
         """
 
-        pass
+        self._lastFrame = None
 
     def update(self, state, forceDraw = False):
         """
@@ -78,9 +87,16 @@ class AbstractView(abc.ABC):
         if (state.isOver()):
             forceDraw = True
 
-        frame = self._createFrame(state)
-        if (frame is not None and self._saveFrames
-                and (state.isOver() or (self._frameCount % self._skipFrames == 0))):
+        isKeyFrame = (self._saveFrames
+                and (state.isOver() or (self._frameCount % self._skipFrames == 0)))
+
+        # Only pay for a frame if something is going to look at it.
+        frame = None
+        if (isKeyFrame or self._needsFrame(state, forceDraw)):
+            frame = self._createFrame(state)
+            self._lastFrame = frame
+
+        if (isKeyFrame):
             self._keyFrames.append(frame)
 
         self._drawFrame(state, frame, forceDraw = forceDraw)
@@ -89,15 +105,45 @@ class AbstractView(abc.ABC):
         if (state.getLastAgentMoved() == 0):
             self._turnCount += 1
 
+    def _getFont(self):
+        """
+        Get the font to draw text with, loading it on first use.
+        """
+
+        if (self._font is None):
+            self._font = ImageFont.truetype(FONT_PATH, spritesheet.SQUARE_SIZE - 14)
+
+        return self._font
+
+    def _getSprites(self):
+        """
+        Get the sprite sheet, loading it on first use.
+        Views that never draw an image (like the null and text views) never load it.
+        """
+
+        if (self._sprites is None):
+            self._sprites = spritesheet.loadSpriteSheet(self._spritesPath)
+
+        return self._sprites
+
     @abc.abstractmethod
     def _createFrame(self, state):
         """
         Create the frame using the given state.
-        Children can decide on the correct concrete representation of a frame.
+        Children can decide on the correct concrete representation of a frame,
+        and should build it from `self._lastFrame` when they can.
         """
 
         pass
 
+    def _needsFrame(self, state, forceDraw):
+        """
+        Check if `_drawFrame` will use a frame for this state.
+        If not (and no gif is being made), no frame is created and `_drawFrame` gets None.
+        """
+
+        return True
+
     @abc.abstractmethod
     def _drawFrame(self, state, frame, forceDraw = False):
         """
@@ -0,0 +1,68 @@
+"""
+A bounded cache that evicts the least recently used entries.
+"""
+
+import collections
+
+class LRUCache(object):
+    """
+    A dict-like cache that holds at most maxSize entries.
+    When the cache is full, adding an entry evicts the entry that was used the longest time ago.
+    """
+
+    def __init__(self, maxSize):
+        if (maxSize < 1):
+            raise ValueError('Cache size must be positive, got %d.' % (maxSize))
+
+        self._maxSize = maxSize
+        self._entries = collections.OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, key, default = None):
+        """
+        Get the value for a key (and mark it as just used),
+        or the default if the key is not in the cache.
+        """
+
+        value = self._entries.get(key, _MISSING)
+        if (value is _MISSING):
+            self._misses += 1
+            return default
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def getHits(self):
+        return self._hits
+
+    def getMaxSize(self):
+        return self._maxSize
+
+    def getMisses(self):
+        return self._misses
+
+    def put(self, key, value):
+        """
+        Add (or replace) an entry, evicting the least recently used entry if the cache is full.
+        """
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        if (len(self._entries) > self._maxSize):
+            self._entries.popitem(last = False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+# Marks a key that is not in the cache (so None can be cached).
+_MISSING = object()
@@ -56,3 +56,144 @@ class PriorityQueueWithFunction(PriorityQueue):
 
     def __len__(self):
         return len(self.heap)
+
+class IndexedPriorityQueue(object):
+    """
+    A priority queue that keeps track of where each item is,
+    so the priority of an item that is already in the queue can be changed.
+    Each item can only be in the queue once, so the queue never holds stale entries
+    (and never grows past the number of distinct items).
+    Items have to be hashable, but do not need to be comparable:
+    items with the same priority come out in the order they were pushed (or last changed).
+    """
+
+    def __init__(self):
+        # [(priority, count, item), ...]
+        # Counts are unique, so entries are ordered without ever comparing items.
+        self.heap = []
+
+        # {item: index in the heap}
+        self._indexes = {}
+        self._count = 0
+
+    def contains(self, item):
+        return item in self._indexes
+
+    def decreaseKey(self, item, priority):
+        """
+        Lower the priority of an item already in the queue.
+        """
+
+        index = self._indexes.get(item)
+        if (index is None):
+            raise KeyError('Item is not in the queue: %s.' % (str(item)))
+
+        if (priority > self.heap[index][0]):
+            raise ValueError('New priority (%s) is higher than the current priority (%s).'
+                    % (str(priority), str(self.heap[index][0])))
+
+        self.heap[index] = (priority, self._nextCount(), item)
+        self._siftUp(index)
+
+    def getPriority(self, item):
+        return self.heap[self._indexes[item]][0]
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def pop(self):
+        """
+        Remove and return the item with the lowest priority.
+        """
+
+        (priority, count, item) = self.heap[0]
+        del self._indexes[item]
+
+        last = self.heap.pop()
+        if (len(self.heap) > 0):
+            self.heap[0] = last
+            self._indexes[last[2]] = 0
+            self._siftDown(0)
+
+        return item
+
+    def push(self, item, priority):
+        """
+        Add an item that is not already in the queue.
+        """
+
+        if (item in self._indexes):
+            raise ValueError('Item is already in the queue: %s.' % (str(item)))
+
+        self.heap.append((priority, self._nextCount(), item))
+        self._indexes[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def update(self, item, priority):
+        """
+        Push the item if it is not in the queue.
+        If it is in the queue with a higher priority, lower its priority.
+        Otherwise, do nothing.
+        Returns True if the queue changed.
+        """
+
+        index = self._indexes.get(item)
+        if (index is None):
+            self.push(item, priority)
+            return True
+
+        if (self.heap[index][0] <= priority):
+            return False
+
+        self.decreaseKey(item, priority)
+        return True
+
+    def _nextCount(self):
+        self._count += 1
+        return self._count
+
+    def _siftDown(self, index):
+        heap = self.heap
+        entry = heap[index]
+        size = len(heap)
+
+        while (True):
+            child = 2 * index + 1
+            if (child >= size):
+                break
+
+            # Pick the smaller child.
+            if (child + 1 < size and heap[child + 1] < heap[child]):
+                child += 1
+
+            if (heap[child] >= entry):
+                break
+
+            heap[index] = heap[child]
+            self._indexes[heap[index][2]] = index
+            index = child
+
+        heap[index] = entry
+        self._indexes[entry[2]] = index
+
+    def _siftUp(self, index):
+        heap = self.heap
+        entry = heap[index]
+
+        while (index > 0):
+            parent = (index - 1) // 2
+            if (heap[parent] <= entry):
+                break
+
+            heap[index] = heap[parent]
+            self._indexes[heap[index][2]] = index
+            index = parent
+
+        heap[index] = entry
+        self._indexes[entry[2]] = index
+
+    def __contains__(self, item):
+        return item in self._indexes
+
+    def __len__(self):
+        return len(self.heap)
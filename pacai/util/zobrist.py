@@ -0,0 +1,44 @@
+"""
+Keys for Zobrist hashing.
+
+A Zobrist hash represents a set of features (e.g. "there is food at (3, 4)")
+as the XOR of a random key for each feature.
+Adding or removing a feature is then just one XOR,
+so hashes can be maintained incrementally instead of being recomputed.
+"""
+
+import hashlib
+
+KEY_BYTES = 8
+
+_keys = {}
+
+def getKey(*feature):
+    """
+    Get the key for a feature, e.g. `getKey('food', 3, 4)`.
+
+    Keys are derived from a digest of the feature (instead of a random number generator),
+    so they are the same in every process and do not disturb any seeded randomness.
+    """
+
+    key = _keys.get(feature)
+    if (key is None):
+        text = repr(_normalize(feature)).encode('utf-8')
+        key = int.from_bytes(hashlib.sha1(text).digest()[:KEY_BYTES], 'little')
+        _keys[feature] = key
+
+    return key
+
+def _normalize(feature):
+    """
+    Equal numbers of different types (e.g. 3 and 3.0) are the same dict key,
+    so they need to produce the same digest.
+    """
+
+    if (isinstance(feature, (bool, int, float))):
+        return float(feature)
+
+    if (isinstance(feature, tuple)):
+        return tuple(_normalize(part) for part in feature)
+
+    return feature
@@ -1,8 +1,16 @@
+import json
+import os
+import tempfile
 import unittest
 
+from pacai.agents.ghost.random import RandomGhost
+from pacai.agents.greedy import GreedyAgent
 from pacai.bin import capture
 from pacai.bin import gridworld
 from pacai.bin import pacman
+from pacai.core.layout import getLayout
+from pacai.ui.capture.null import CaptureNullView
+from pacai.ui.pacman.null import PacmanNullView
 
 """
 This is a test class to assess the executables of this project.
@@ -21,6 +29,59 @@ class BinTest(unittest.TestCase):
             # Expected exception.
             pass
 
+    def test_pacman_workers(self):
+        # Run games of pacman across worker processes.
+        games = pacman.main(['-p', 'GreedyAgent', '--null-graphics', '--seed', '1234',
+                '-n', '3', '--workers', '2'])
+        self.assertEqual(len(games), 3)
+
+    def test_pacman_instrument(self):
+        # Time and profile every phase of a game of pacman.
+        with tempfile.TemporaryDirectory() as reportDir:
+            path = os.path.join(reportDir, 'timing.json')
+            games = pacman.main(['-p', 'GreedyAgent', '--null-graphics', '--seed', '1234',
+                    '--instrument', path, '--profile-agents'])
+
+            with open(path, 'r') as file:
+                report = json.load(file)
+
+        moves = len(games[0].moveHistory)
+        self.assertEqual(report['game']['moves'], moves)
+        self.assertEqual(report['agents'][0]['name'], 'GreedyAgent')
+        self.assertEqual(sum([agent['phases']['getAction']['count']
+                for agent in report['agents']]), moves)
+        self.assertEqual(report['agents'][0]['phases']['registerInitialState']['count'], 1)
+        self.assertTrue(len(report['agents'][0]['profile']) > 0)
+
+    def test_pacman_simulate(self):
+        layout = getLayout('mediumClassic')
+
+        def getAgents():
+            return [GreedyAgent(0)] + [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
+
+        result = pacman.simulate(layout, getAgents(), seed = 1234)
+        self.assertTrue(result.state.isOver())
+        self.assertTrue(len(result.moveHistory) > 0)
+
+        # The same game with a display.
+        agents = getAgents()
+        game = pacman.ClassicGameRules().newGame(layout, agents[0], agents[1:], PacmanNullView())
+        pacman.random.seed(1234)
+        game.run()
+
+        self.assertEqual(game.moveHistory, result.moveHistory)
+        self.assertEqual(game.state.getScore(), result.state.getScore())
+
+        # Headless games are played by the same loop.
+        agents = getAgents()
+        headlessGame = pacman.ClassicGameRules().newGame(layout, agents[0], agents[1:], None)
+        self.assertTrue(headlessGame.isHeadless())
+        pacman.random.seed(1234)
+        headlessGame.run()
+
+        self.assertEqual(game.moveHistory, headlessGame.moveHistory)
+        self.assertEqual(game.numMoves, headlessGame.numMoves)
+
     def test_pacman_help(self):
         # Show all pacman arguments.
         try:
@@ -33,6 +94,57 @@ class BinTest(unittest.TestCase):
         # Run game of capture with default agents.
         capture.main(['--null-graphics'])
 
+    def test_capture_workers(self):
+        # Run games of capture across worker processes.
+        games = capture.main(['--null-graphics', '--seed', '1234', '-n', '2', '--workers', '2'])
+        self.assertEqual(len(games), 2)
+
+        # Agents are timed the same way as in games played serially
+        # (every move takes at least a microsecond).
+        for game in games:
+            numMoves = len(game.moveHistory) / len(game.totalAgentTimes)
+            for agentTime in game.totalAgentTimes:
+                self.assertGreater(agentTime * 1000000, numMoves)
+
+    def test_capture_instrument(self):
+        # Each game played by a worker writes its own report.
+        with tempfile.TemporaryDirectory() as reportDir:
+            path = os.path.join(reportDir, 'timing.json')
+            capture.main(['--null-graphics', '--seed', '1234', '-n', '2', '--workers', '2',
+                    '--instrument', path])
+
+            self.assertTrue(os.path.isfile(os.path.join(reportDir, 'timing.0.json')))
+            self.assertTrue(os.path.isfile(os.path.join(reportDir, 'timing.1.json')))
+
+    def test_capture_simulate(self):
+        layout = getLayout('defaultCapture')
+
+        def getAgents():
+            redAgents = capture.loadAgents(True, 'pacai.core.baselineTeam', True, {})
+            blueAgents = capture.loadAgents(False, 'pacai.core.baselineTeam', True, {})
+            return [redAgents[0], blueAgents[0], redAgents[1], blueAgents[1]]
+
+        result = capture.simulate(layout, getAgents(), seed = 1234, length = 300)
+        self.assertTrue(result.state.isOver())
+
+        # The same game with a display.
+        agents = getAgents()
+        capture.random.seed(1234)
+        game = capture.CaptureRules().newGame(layout, agents, CaptureNullView(), 300, False)
+        game.run()
+
+        self.assertEqual(game.moveHistory, result.moveHistory)
+        self.assertEqual(game.state.getScore(), result.state.getScore())
+
+    def test_capture_isolated(self):
+        # Run games of capture with every agent in its own process (inside worker processes).
+        games = capture.main(['--null-graphics', '--seed', '1234', '-n', '2', '--workers', '2',
+                '--isolate-agents', 'forfeit', '--catch-exceptions'])
+        self.assertEqual(len(games), 2)
+
+        for game in games:
+            self.assertFalse(game.agentTimeout)
+
     def test_capture_help(self):
         # Show all capture arguments.
         try:
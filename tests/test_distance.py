@@ -0,0 +1,206 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import distanceCalculator
+from pacai.core import mazeGraph
+from pacai.core.actions import Actions
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+from pacai.core.search import search
+from pacai.core.search.position import PositionSearchProblem
+
+"""
+Test the maze distance machinery.
+"""
+class DistanceTest(unittest.TestCase):
+    def test_distance_table(self):
+        layout = Layout([
+            '%%%%%%',
+            '%  % %',
+            '% %% %',
+            '%    %',
+            '%%%%%%',
+        ])
+
+        table = distanceCalculator.computeDistances(layout)
+
+        self.assertEqual(table.getDistance((1, 1), (1, 1)), 0)
+        self.assertEqual(table.getDistance((1, 1), (4, 1)), 3)
+        self.assertEqual(table.getDistance((4, 3), (2, 3)), 8)
+        self.assertEqual(table.getDistance((2, 3), (4, 3)), 8)
+        self.assertEqual(table[((1, 3), (4, 3))], 7)
+
+        self.assertIn(((1, 1), (2, 3)), table)
+        self.assertNotIn(((0, 0), (2, 3)), table)
+
+        with self.assertRaises(KeyError):
+            table.getDistance((0, 0), (1, 1))
+
+    def test_unreachable(self):
+        layout = Layout([
+            '%%%%%',
+            '% % %',
+            '%%%%%',
+        ])
+
+        table = distanceCalculator.computeDistances(layout)
+        self.assertEqual(table.getDistance((1, 1), (3, 1)), sys.maxsize)
+
+    def test_distancer(self):
+        layout = getLayout('tinyCapture')
+        distancer = distanceCalculator.Distancer(layout)
+
+        # Before the distances are computed, the distancer falls back to manhattan distance.
+        self.assertFalse(distancer.isReadyForMazeDistance())
+        self.assertEqual(distancer.getDistance((1, 1), (1, 3)), 2)
+
+        distancer.getMazeDistances()
+        self.assertTrue(distancer.isReadyForMazeDistance())
+
+        self.assertEqual(distancer.getDistance((1, 1), (1, 3)), 2)
+        self.assertEqual(distancer.getDistance((1, 1), (2, 3)), 3)
+        self.assertEqual(distancer.getDistance((1.0, 1.0), (2.0, 3.0)), 3)
+        self.assertEqual(distancer.getDistance((1, 1.5), (2, 3)), 2.5)
+
+    def test_table_cache(self):
+        layout = getLayout('tinyCapture')
+        expected = distanceCalculator.computeDistances(layout)
+
+        with tempfile.TemporaryDirectory() as cacheDir:
+            path = os.path.join(cacheDir, 'test' + distanceCalculator.CACHE_FILE_EXTENSION)
+            expected.save(path)
+
+            loaded = distanceCalculator.DistanceTable.load(path)
+            self.assertEqual(expected.getCells(), loaded.getCells())
+
+            for pos1 in expected.getCells():
+                for pos2 in expected.getCells():
+                    self.assertEqual(expected[(pos1, pos2)], loaded[(pos1, pos2)])
+
+            distanceCalculator.DistanceTable.load(path, layout.walls.asList(False))
+
+            # Tables for another layout, or that are the wrong size, are not trusted.
+            with self.assertRaises(ValueError):
+                distanceCalculator.DistanceTable.load(path,
+                        getLayout('tinyMaze').walls.asList(False))
+
+            with open(path, 'rb') as file:
+                data = file.read()
+
+            badPath = os.path.join(cacheDir, 'bad' + distanceCalculator.CACHE_FILE_EXTENSION)
+            for badData in [data[:-4], data + b'\x00', b'']:
+                with open(badPath, 'wb') as file:
+                    file.write(badData)
+
+                with self.assertRaises(ValueError):
+                    distanceCalculator.DistanceTable.load(badPath)
+
+            # Layouts with the same walls share a table, in memory and on disk.
+            oldCacheDir = os.environ.get(distanceCalculator.CACHE_DIR_ENV_VAR)
+            cacheDir = os.path.join(cacheDir, 'distances')
+            os.environ[distanceCalculator.CACHE_DIR_ENV_VAR] = cacheDir
+
+            # Use a layout that no other test will have loaded.
+            layoutText = [
+                '%%%%%%%',
+                '%  %  %',
+                '%  %% %',
+                '%     %',
+                '%%%%%%%',
+            ]
+
+            try:
+                table = distanceCalculator.getDistanceTable(Layout(layoutText))
+                self.assertIs(table, distanceCalculator.getDistanceTable(Layout(layoutText)))
+                self.assertEqual(table.getDistance((1, 1), (5, 3)), 6)
+
+                key = distanceCalculator.getLayoutKey(Layout(layoutText))
+                path = os.path.join(cacheDir, key + distanceCalculator.CACHE_FILE_EXTENSION)
+                self.assertTrue(os.path.isfile(path))
+                self.assertEqual(distanceCalculator.CACHE_DIR_MODE,
+                        os.stat(cacheDir).st_mode & 0o777)
+
+                # Without a cache directory, nothing is written to disk.
+                del os.environ[distanceCalculator.CACHE_DIR_ENV_VAR]
+                layout = Layout(layoutText[:-1] + ['%%%%%%%', '%%%%%%%'])
+                distanceCalculator.getDistanceTable(layout)
+
+                self.assertEqual([os.path.basename(path)], os.listdir(cacheDir))
+            finally:
+                if (oldCacheDir is None):
+                    os.environ.pop(distanceCalculator.CACHE_DIR_ENV_VAR, None)
+                else:
+                    os.environ[distanceCalculator.CACHE_DIR_ENV_VAR] = oldCacheDir
+
+    def test_maze_graph(self):
+        for name in ['mediumClassic', 'bigMaze', 'openMaze', 'jumboCapture']:
+            layout = getLayout(name)
+            graph = mazeGraph.getMazeGraph(layout)
+            self.assertIs(graph, mazeGraph.getMazeGraph(layout))
+
+            table = distanceCalculator.computeDistances(layout)
+            cells = table.getCells()
+
+            rng = random.Random(0)
+            for i in range(100):
+                start = rng.choice(cells)
+                goal = rng.choice(cells)
+
+                self.assertEqual(table.getDistance(start, goal), graph.getDistance(start, goal))
+
+                # Walk the path to check it.
+                position = start
+                path = graph.getPath(start, goal)
+                for action in path:
+                    (dx, dy) = Actions.directionToVector(action)
+                    position = (int(position[0] + dx), int(position[1] + dy))
+                    self.assertFalse(layout.walls[position[0]][position[1]])
+
+                self.assertEqual(goal, position)
+                self.assertEqual(table.getDistance(start, goal), len(path))
+
+    def test_maze_graph_loops(self):
+        # A loop with no junctions, and two cells in the same corridor.
+        layout = Layout([
+            '%%%%%%',
+            '%    %',
+            '% %% %',
+            '%    %',
+            '%%%%%%',
+            '%  % %',
+            '%%%%%%',
+        ])
+        graph = mazeGraph.MazeGraph(layout)
+
+        # The loop gets one junction, the bottom row has three.
+        self.assertEqual(4, graph.getNumJunctions())
+
+        self.assertEqual(2, graph.getDistance((1, 5), (1, 3)))
+        self.assertEqual(3, graph.getDistance((2, 5), (4, 4)))
+        self.assertEqual(0, graph.getDistance((2, 3), (2, 3)))
+        self.assertEqual([], graph.getPath((2, 3), (2, 3)))
+        self.assertEqual(1, graph.getDistance((1, 1), (2, 1)))
+        self.assertIsNone(graph.getDistance((1, 5), (1, 1)))
+        self.assertIsNone(graph.getPath((1, 1), (4, 1)))
+
+        with self.assertRaises(ValueError):
+            graph.getDistance((2, 4), (1, 1))
+
+    def test_maze_graph_expansions(self):
+        layout = getLayout('bigMaze')
+        graph = mazeGraph.getMazeGraph(layout)
+        state = PacmanGameState(layout)
+
+        start = state.getAgentPosition(0)
+        problem = PositionSearchProblem(state, goal = (1, 1))
+        path = search.bfs(problem)
+
+        self.assertEqual(len(path), graph.getDistance(start, (1, 1)))
+        self.assertLess(graph.getExpandedCount() * 3, problem.getExpandedCount())
+
+if __name__ == '__main__':
+    unittest.main()
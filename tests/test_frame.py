@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.ui.capture.frame import CaptureFrame
+from pacai.ui.pacman.frame import PacmanFrame
+
+"""
+Test that frames built from the previous frame match frames built from scratch.
+"""
+class FrameTest(unittest.TestCase):
+    def _checkFrames(self, frameClass, state, numMoves, seed):
+        rng = random.Random(seed)
+
+        previous = frameClass(0, state, 0)
+        snapshots = [(previous, [list(column) for column in previous._board])]
+
+        agentIndex = 0
+        for i in range(numMoves):
+            if (state.isOver()):
+                break
+
+            action = rng.choice(state.getLegalActions(agentIndex))
+            state = state.generateSuccessor(agentIndex, action)
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+            frame = frameClass(i + 1, state, 0, previous)
+            fresh = frameClass(i + 1, state, 0)
+            self.assertEqual(frame._board, fresh._board)
+
+            snapshots.append((frame, [list(column) for column in frame._board]))
+            previous = frame
+
+        # Building a frame must never change an older frame.
+        for (frame, board) in snapshots:
+            self.assertEqual(frame._board, board)
+
+    def test_pacman(self):
+        state = PacmanGameState(getLayout('mediumClassic'))
+        for seed in range(3):
+            self._checkFrames(PacmanFrame, state, 300, seed)
+
+    def test_capture(self):
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        for seed in range(2):
+            self._checkFrames(CaptureFrame, state, 400, seed)
+
+if __name__ == '__main__':
+    unittest.main()
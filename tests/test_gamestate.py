@@ -0,0 +1,232 @@
+import random
+import unittest
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.agentstate import AgentState
+from pacai.core.gamestate import AbstractGameState
+from pacai.core.layout import getLayout
+from pacai.util import zobrist
+
+"""
+Test the bookkeeping that game states maintain as they change.
+"""
+class GameStateTest(unittest.TestCase):
+    def _randomPlayout(self, state, numMoves, seed):
+        rng = random.Random(seed)
+        states = [state]
+
+        agentIndex = 0
+        for i in range(numMoves):
+            if (state.isOver()):
+                break
+
+            action = rng.choice(state.getLegalActions(agentIndex))
+            state = state.generateSuccessor(agentIndex, action)
+            states.append(state)
+
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+        return states
+
+    def _checkHash(self, state):
+        foodHash = 0
+        for (x, y) in state.getFood().asList():
+            foodHash ^= zobrist.getKey('food', x, y)
+
+        capsuleHash = 0
+        for (x, y) in state.getCapsules():
+            capsuleHash ^= zobrist.getKey('capsule', x, y)
+
+        self.assertEqual(foodHash, state._foodHash)
+        self.assertEqual(capsuleHash, state._capsuleHash)
+
+        self.assertEqual(state.getFood().count(), state.getNumFood())
+        if (isinstance(state, CaptureGameState)):
+            self.assertEqual(state.getRedFood().count(), state.getNumRedFood())
+            self.assertEqual(state.getBlueFood().count(), state.getNumBlueFood())
+
+        for agentState in state.getAgentStates():
+            fresh = AgentState(agentState.getPosition(), agentState.getDirection(),
+                    agentState.isPacman())
+            fresh.setScaredTimer(agentState.getScaredTimer())
+
+            self.assertEqual(fresh, agentState)
+            self.assertEqual(hash(fresh), hash(agentState))
+
+    def test_pacman_hash(self):
+        initialState = PacmanGameState(getLayout('mediumClassic'))
+
+        for seed in range(5):
+            for state in self._randomPlayout(initialState, 200, seed):
+                self._checkHash(state)
+
+    def test_capture_hash(self):
+        initialState = CaptureGameState(getLayout('defaultCapture'), 1200)
+
+        for seed in range(3):
+            for state in self._randomPlayout(initialState, 300, seed):
+                self._checkHash(state)
+
+    def test_equal_states_hash(self):
+        state = PacmanGameState(getLayout('testClassic'))
+
+        first = state.generateSuccessor(0, 'North')
+        second = state.generateSuccessor(0, 'North')
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(hash(state), hash(first))
+
+    def _checkApplyUndo(self, initialState, numMoves, seed):
+        rng = random.Random(seed)
+
+        # Walk one state forward in place, alongside the successors.
+        state = initialState.generateSuccessor(0, initialState.getLegalActions(0)[0])
+        successors = [state.generateSuccessor(1, state.getLegalActions(1)[0])]
+        state = state.generateSuccessor(1, state.getLegalActions(1)[0])
+
+        records = []
+        agentIndex = 0
+        for i in range(numMoves):
+            if (state.isOver()):
+                break
+
+            action = rng.choice(state.getLegalActions(agentIndex))
+            expected = successors[-1].generateSuccessor(agentIndex, action)
+
+            records.append(state.applyAction(agentIndex, action))
+            successors.append(expected)
+
+            self._checkSame(expected, state)
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+        # Unwind back to the start.
+        while (len(records) > 0):
+            state.undoAction(records.pop())
+            successors.pop()
+            self._checkSame(successors[-1], state)
+
+    def _checkSame(self, expected, state):
+        self.assertEqual(expected, state)
+        self.assertEqual(hash(expected), hash(state))
+        self.assertEqual(expected.getScore(), state.getScore())
+        self.assertEqual(expected.isOver(), state.isOver())
+        self.assertEqual(expected.getNumFood(), state.getNumFood())
+        self.assertEqual(expected.getCapsules(), state.getCapsules())
+        self.assertEqual(expected.getLastAgentMoved(), state.getLastAgentMoved())
+        self._checkHash(state)
+
+        if (isinstance(state, CaptureGameState)):
+            self.assertEqual(expected.getTimeleft(), state.getTimeleft())
+            self.assertEqual(expected.getRedFood(), state.getRedFood())
+            self.assertEqual(expected.getBlueFood(), state.getBlueFood())
+            self.assertEqual(expected.getRedCapsules(), state.getRedCapsules())
+            self.assertEqual(expected.getBlueCapsules(), state.getBlueCapsules())
+
+    def test_pacman_apply_undo(self):
+        initialState = PacmanGameState(getLayout('mediumClassic'))
+
+        for seed in range(5):
+            self._checkApplyUndo(initialState, 200, seed)
+
+    def test_capture_apply_undo(self):
+        initialState = CaptureGameState(getLayout('defaultCapture'), 1200)
+
+        for seed in range(3):
+            self._checkApplyUndo(initialState, 300, seed)
+
+    def test_generate_successors(self):
+        for state in self._randomPlayout(CaptureGameState(getLayout('defaultCapture'), 1200),
+                100, 0):
+            for agentIndex in range(state.getNumAgents()):
+                successors = state.generateSuccessors(agentIndex)
+                self.assertEqual([action for (action, successor) in successors],
+                        state.getLegalActions(agentIndex))
+
+                for (action, successor) in successors:
+                    expected = state.generateSuccessor(agentIndex, action)
+                    self.assertEqual(expected, successor)
+                    self.assertEqual(hash(expected), hash(successor))
+                    self.assertEqual(expected.getScore(), successor.getScore())
+
+    def _getAgentFields(self, state):
+        return [(agentState.getPosition(), agentState.getDirection(), agentState.isPacman(),
+                agentState.getScaredTimer(), hash(agentState))
+                for agentState in state.getAgentStates()]
+
+    def test_shared_agent_states(self):
+        initialStates = [
+            PacmanGameState(getLayout('mediumClassic')),
+            CaptureGameState(getLayout('defaultCapture'), 1200),
+        ]
+
+        for initialState in initialStates:
+            for seed in range(3):
+                states = self._randomPlayout(initialState, 300, seed)
+                fields = [self._getAgentFields(state) for state in states]
+
+                # Most agents do not change on a move, so their states are shared.
+                numShared = 0
+                for i in range(1, len(states)):
+                    for agentIndex in range(states[i].getNumAgents()):
+                        if (states[i - 1].getAgentState(agentIndex)
+                                is states[i].getAgentState(agentIndex)):
+                            numShared += 1
+
+                self.assertTrue(numShared >= len(states) - 1)
+
+                # Replaying (which changes agents in place) must not touch any earlier states.
+                self._randomPlayout(initialState, 300, seed)
+                self.assertEqual(fields, [self._getAgentFields(state) for state in states])
+
+    def test_apply_after_successor(self):
+        rng = random.Random(0)
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+
+        agentIndex = 0
+        for i in range(300):
+            if (state.isOver()):
+                break
+
+            actions = state.getLegalActions(agentIndex)
+            child = state.generateSuccessor(agentIndex, actions[0])
+            expected = self._getAgentFields(child)
+
+            # Applying and undoing on the parent must leave the (sharing) child alone.
+            state.undoAction(state.applyAction(agentIndex, rng.choice(actions)))
+            state.applyAction(agentIndex, rng.choice(actions))
+
+            self.assertEqual(expected, self._getAgentFields(child))
+            self._checkHash(child)
+
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+    def test_apply_illegal(self):
+        state = PacmanGameState(getLayout('mediumClassic'))
+        original = state.generateSuccessor(0, 'Stop')
+
+        illegal = set(['North', 'South', 'East', 'West']) - set(state.getLegalActions(0))
+        self.assertTrue(len(illegal) > 0)
+
+        # A failed action leaves the state as it was.
+        with self.assertRaises(ValueError):
+            state.applyAction(0, illegal.pop())
+
+        self.assertEqual(original, state.generateSuccessor(0, 'Stop'))
+
+    def test_missing_successor_action(self):
+        class PartialState(AbstractGameState):
+            def generateSuccessor(self, agentIndex, action):
+                return self
+
+            def getLegalActions(self, agentIndex = 0):
+                return []
+
+        # States that can not apply actions can not be made at all.
+        with self.assertRaises(TypeError):
+            PartialState(getLayout('mediumClassic'))
+
+if __name__ == '__main__':
+    unittest.main()
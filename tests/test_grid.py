@@ -0,0 +1,100 @@
+import unittest
+
+from pacai.core.grid import BitGrid
+from pacai.core.grid import Grid
+
+"""
+Test that the bitset grid behaves the same as the list grid.
+"""
+class GridTest(unittest.TestCase):
+    def _buildGrids(self, width, height, cells):
+        grid = Grid(width, height)
+        bitGrid = BitGrid(width, height)
+
+        for (x, y) in cells:
+            grid[x][y] = True
+            bitGrid[x][y] = True
+
+        return grid, bitGrid
+
+    def test_access(self):
+        cells = [(0, 0), (1, 2), (3, 1), (4, 3)]
+        grid, bitGrid = self._buildGrids(5, 4, cells)
+
+        for x in range(5):
+            for y in range(4):
+                self.assertEqual(grid[x][y], bitGrid[x][y])
+
+        self.assertEqual(grid[4][-1], bitGrid[4][-1])
+        self.assertEqual(list(grid[1]), list(bitGrid[1]))
+
+        bitGrid[1][2] = False
+        self.assertFalse(bitGrid[1][2])
+
+        with self.assertRaises(IndexError):
+            bitGrid[5][0]
+
+        with self.assertRaises(IndexError):
+            bitGrid[0][4]
+
+    def test_get_and_set(self):
+        cells = [(0, 0), (1, 2), (3, 1), (4, 3)]
+        grid, bitGrid = self._buildGrids(5, 4, cells)
+
+        for x in range(5):
+            for y in range(4):
+                self.assertEqual(grid[x][y], grid.get(x, y))
+                self.assertEqual(grid[x][y], bitGrid.get(x, y))
+
+        self.assertEqual(grid.get(4, -1), bitGrid.get(4, -1))
+
+        grid.set(2, 2, True)
+        bitGrid.set(2, 2, True)
+        bitGrid.set(0, 0, False)
+        self.assertTrue(bitGrid[2][2])
+        self.assertFalse(bitGrid[0][0])
+
+        # The cached hash is cleared.
+        self.assertEqual(hash(bitGrid), hash(BitGrid.fromBits(5, 4, bitGrid.getBits())))
+
+        with self.assertRaises(IndexError):
+            bitGrid.get(5, 0)
+
+        with self.assertRaises(IndexError):
+            bitGrid.set(0, 4, True)
+
+    def test_list_and_count(self):
+        cells = [(0, 1), (2, 0), (2, 2), (3, 1)]
+        grid, bitGrid = self._buildGrids(4, 3, cells)
+
+        self.assertEqual(grid.asList(), bitGrid.asList())
+        self.assertEqual(grid.asList(False), bitGrid.asList(False))
+
+        self.assertEqual(grid.count(), bitGrid.count())
+        self.assertEqual(grid.count(False), bitGrid.count(False))
+
+        self.assertEqual(BitGrid(3, 2, initialValue = True).count(), 6)
+        self.assertEqual(str(grid), str(bitGrid))
+
+    def test_copy_and_hash(self):
+        grid, bitGrid = self._buildGrids(6, 5, [(1, 1), (2, 3), (5, 4)])
+
+        copy = bitGrid.copy()
+        self.assertEqual(bitGrid, copy)
+        self.assertEqual(hash(bitGrid), hash(copy))
+        self.assertEqual(bitGrid, grid)
+        self.assertEqual(grid, bitGrid)
+        self.assertNotEqual(grid, copy.__class__(6, 5))
+        self.assertNotEqual(grid, 'grid')
+        self.assertNotEqual(bitGrid, 'grid')
+
+        copy[2][3] = False
+        self.assertTrue(bitGrid[2][3])
+        self.assertNotEqual(bitGrid, copy)
+
+        copy[2][3] = True
+        self.assertEqual(hash(bitGrid), hash(copy))
+        self.assertEqual({bitGrid: 1}[copy], 1)
+
+if __name__ == '__main__':
+    unittest.main()
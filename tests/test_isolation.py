@@ -0,0 +1,142 @@
+import time
+import unittest
+
+from pacai.agents.ghost.random import RandomGhost
+from pacai.agents.leftturn import LeftTurnAgent
+from pacai.agents.timeout import TimeoutAgent
+from pacai.bin import pacman
+from pacai.bin.pacman import ClassicGameRules
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import isolation
+from pacai.core.isolation import IsolatedAgent
+from pacai.core.layout import getLayout
+
+"""
+Test agents that are run in their own worker processes.
+"""
+class IsolationTest(unittest.TestCase):
+    def _playGame(self, layout, pacmanAgent, rules, catchExceptions = False):
+        ghosts = [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
+
+        pacman.random.seed(0)
+        game = rules.newGame(layout, pacmanAgent, ghosts, None, catchExceptions)
+
+        try:
+            game.run()
+        finally:
+            isolation.closeAgents(game.agents)
+
+        return game
+
+    def test_same_game(self):
+        layout = getLayout('mediumClassic')
+        rules = ClassicGameRules()
+
+        expected = self._playGame(layout, LeftTurnAgent(0), rules)
+        game = self._playGame(layout, IsolatedAgent(LeftTurnAgent(0), moveTimeout = 30), rules)
+
+        self.assertEqual(expected.moveHistory, game.moveHistory)
+        self.assertEqual(expected.state.getScore(), game.state.getScore())
+
+    def test_default_action(self):
+        state = PacmanGameState(getLayout('mediumClassic'))
+        agent = IsolatedAgent(TimeoutAgent(0, timeout = 10), moveTimeout = 0.1)
+
+        try:
+            agent.registerInitialState(state)
+
+            # The agent is still asleep, but the game does not wait for it.
+            startTime = time.time()
+            for i in range(3):
+                self.assertIn(agent.getAction(state), state.getLegalActions(0))
+
+            self.assertTrue(time.time() - startTime < 5)
+            self.assertEqual(3, agent.getNumTimeouts())
+        finally:
+            agent.close()
+
+    def test_stuck_agent(self):
+        state = PacmanGameState(getLayout('mediumClassic'))
+        agent = IsolatedAgent(TimeoutAgent(0, timeout = 1000), moveTimeout = 0.1, maxTimeouts = 2)
+
+        try:
+            agent.registerInitialState(state)
+
+            # A couple of late moves are let go, but an agent that stays stuck forfeits.
+            startTime = time.time()
+            for i in range(2):
+                self.assertIn(agent.getAction(state), state.getLegalActions(0))
+
+            with self.assertRaises(isolation.AgentTimeoutError):
+                agent.getAction(state)
+
+            self.assertTrue(time.time() - startTime < 5)
+            self.assertEqual(3, agent.getNumTimeouts())
+        finally:
+            agent.close()
+
+        # In a game, a stuck agent only costs as many timeouts as the rules give warnings.
+        class WarningRules(ClassicGameRules):
+            def getMaxStartupTime(self, agentIndex):
+                return 10
+
+            def getMaxTimeWarnings(self, agentIndex):
+                return 2
+
+        layout = getLayout('mediumClassic')
+        rules = WarningRules(timeout = 0.1)
+
+        agent = isolation.isolateAgents([TimeoutAgent(0, timeout = 1000)], rules)[0]
+
+        # (Games that enforce timeouts already stop at the first late move.)
+        startTime = time.time()
+        with self.assertRaises(isolation.AgentTimeoutError):
+            self._playGame(layout, agent, rules)
+
+        self.assertTrue(time.time() - startTime < 5)
+        self.assertEqual(rules.getMaxTimeWarnings(0) + 1, agent.getNumTimeouts())
+
+    def test_forfeit(self):
+        layout = getLayout('mediumClassic')
+        rules = ClassicGameRules(timeout = 1)
+
+        agent = isolation.isolateAgents([TimeoutAgent(0, timeout = 10)], rules,
+                isolation.TIMEOUT_FORFEIT)[0]
+        game = self._playGame(layout, agent, rules, catchExceptions = True)
+
+        self.assertTrue(game.agentTimeout)
+        self.assertTrue(game.agentCrashed)
+        self.assertEqual(1, agent.getNumTimeouts())
+
+    def test_agent_exception(self):
+        class CrashingAgent(LeftTurnAgent):
+            def getAction(self, state):
+                raise ValueError('Crash.')
+
+        state = PacmanGameState(getLayout('mediumClassic'))
+        agent = IsolatedAgent(CrashingAgent(0))
+
+        try:
+            agent.registerInitialState(state)
+            with self.assertRaises(ValueError):
+                agent.getAction(state)
+        finally:
+            agent.close()
+
+    def test_close_agents(self):
+        class StuckAgent(LeftTurnAgent):
+            def stopPondering(self):
+                raise ValueError('Can not stop.')
+
+        state = PacmanGameState(getLayout('mediumClassic'))
+        isolatedAgent = IsolatedAgent(LeftTurnAgent(0))
+        isolatedAgent.registerInitialState(state)
+
+        # Everything is stopped, even if some agents are missing or fail to stop.
+        isolation.closeAgents([None, StuckAgent(1), isolatedAgent])
+
+        with self.assertRaises(RuntimeError):
+            isolatedAgent.getAction(state)
+
+if __name__ == '__main__':
+    unittest.main()
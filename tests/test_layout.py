@@ -0,0 +1,68 @@
+import unittest
+
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+
+DIRECTIONS = [
+    Directions.NORTH,
+    Directions.SOUTH,
+    Directions.EAST,
+    Directions.WEST,
+    Directions.STOP,
+]
+
+"""
+Test the information precomputed by layouts.
+"""
+class LayoutTest(unittest.TestCase):
+    def _ghostActions(self, position, direction, walls):
+        actions = Actions.getPossibleActions(position, direction, walls)
+        reverse = Actions.reverseDirection(direction)
+
+        if (Directions.STOP in actions):
+            actions.remove(Directions.STOP)
+
+        if (reverse in actions and len(actions) > 1):
+            actions.remove(reverse)
+
+        return actions
+
+    def test_move_tables(self):
+        for name in ['mediumClassic', 'defaultCapture', 'tinyMaze']:
+            layout = getLayout(name)
+            walls = layout.walls
+
+            for x in range(1, layout.getWidth() - 1):
+                for y in range(1, layout.getHeight() - 1):
+                    if (walls[x][y]):
+                        continue
+
+                    positions = [(x, y), (float(x), float(y)), (x + 0.5, y), (x, y - 0.5)]
+                    for position in positions:
+                        self.assertEqual(Actions.getLegalNeighbors(position, walls),
+                                layout.getLegalNeighbors(position))
+
+                        for direction in DIRECTIONS:
+                            self.assertEqual(
+                                    Actions.getPossibleActions(position, direction, walls),
+                                    layout.getLegalActions(position, direction))
+                            self.assertEqual(self._ghostActions(position, direction, walls),
+                                    layout.getGhostLegalActions(position, direction))
+
+    def test_tables_are_copied(self):
+        layout = Layout([
+            '%%%%%',
+            '%P  %',
+            '%%%%%',
+        ])
+
+        actions = layout.getLegalActions((1, 1), Directions.STOP)
+        actions.remove(Directions.STOP)
+
+        self.assertEqual(layout.getLegalActions((1, 1), Directions.STOP),
+                [Directions.EAST, Directions.STOP])
+
+if __name__ == '__main__':
+    unittest.main()
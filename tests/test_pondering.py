@@ -0,0 +1,102 @@
+import threading
+import time
+import unittest
+
+from pacai.agents.ghost.random import RandomGhost
+from pacai.agents.pondering import PonderingAgent
+from pacai.bin import pacman
+from pacai.core.layout import getLayout
+
+class CountingAgent(PonderingAgent):
+    """
+    Goes the first legal way, and counts the states it ponders on.
+    """
+
+    def __init__(self, index = 0, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self.observedStates = []
+        self.ponderedStates = []
+        self.actionsWhilePondering = 0
+
+    def getAction(self, state):
+        if (self.isPondering()):
+            self.actionsWhilePondering += 1
+
+        return state.getLegalActions(self.index)[0]
+
+    def observeState(self, state):
+        self.observedStates.append(state)
+        super().observeState(state)
+
+    def ponder(self, state, shouldStop):
+        self.ponderedStates.append(state)
+
+        while (not shouldStop()):
+            time.sleep(0.0001)
+
+"""
+Test that pondering agents think between (and only between) their turns.
+"""
+class PonderingTest(unittest.TestCase):
+    def test_ponder(self):
+        layout = getLayout('mediumClassic')
+        agent = CountingAgent(0)
+        ghosts = [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
+
+        result = pacman.simulate(layout, [agent] + ghosts, seed = 0)
+
+        self.assertTrue(len(agent.ponderedStates) > 0)
+        self.assertEqual(0, agent.actionsWhilePondering)
+        self.assertFalse(agent.isPondering())
+
+        # Pacman ponders after every move except the last ghost's (when it is pacman's turn).
+        numAgents = result.state.getNumAgents()
+        for state in agent.ponderedStates:
+            self.assertNotEqual(numAgents - 1, state.getLastAgentMoved())
+
+        # Pondering gets its own copy of each state.
+        observedIds = set([id(state) for state in agent.observedStates])
+        for state in agent.ponderedStates:
+            self.assertNotIn(id(state), observedIds)
+            self.assertIn(state, agent.observedStates)
+
+        # Nothing is left running in the background.
+        for thread in threading.enumerate():
+            self.assertFalse(thread.name.startswith('Ponder'))
+
+    def test_ponder_crash(self):
+        class CrashingAgent(CountingAgent):
+            def ponder(self, state, shouldStop):
+                raise ValueError('Crash while pondering.')
+
+        layout = getLayout('mediumClassic')
+        agent = CrashingAgent(0)
+        ghosts = [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
+
+        # Crashing in the background does not stop the game.
+        result = pacman.simulate(layout, [agent] + ghosts, seed = 0)
+        self.assertTrue(result.state.isOver())
+
+    def test_ponder_stuck(self):
+        release = threading.Event()
+
+        class StuckAgent(CountingAgent):
+            def ponder(self, state, shouldStop):
+                release.wait()
+
+        layout = getLayout('mediumClassic')
+        agent = StuckAgent(0, stopTimeout = 0.05)
+        ghosts = [RandomGhost(i + 1) for i in range(layout.getNumGhosts())]
+
+        # Pondering that never stops forfeits the game instead of hanging it.
+        try:
+            result = pacman.simulate(layout, [agent] + ghosts, seed = 0, catchExceptions = True)
+        finally:
+            release.set()
+
+        self.assertTrue(result.agentCrashed)
+        self.assertTrue(result.agentTimeout)
+
+if __name__ == '__main__':
+    unittest.main()
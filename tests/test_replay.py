@@ -1,9 +1,17 @@
+import io
+import json
 import os
+import pickle
 import tempfile
 import unittest
 
+from pacai.bin import analyze
 from pacai.bin import capture
 from pacai.bin import pacman
+from pacai.core.layout import getLayout
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import ReplayWriter
+from pacai.core.replay import isReplayFile
 
 PACMAN_FILENAME = 'pacai_unittest_pacman.replay'
 CAPTURE_FILENAME = 'pacai_unittest_capture.replay'
@@ -35,5 +43,83 @@ class ReplayTest(unittest.TestCase):
 
         os.remove(replayPath)
 
+    def test_compressed(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME + '.gz')
+
+        capture.main(['--null-graphics', '--fps=1000', '--record', replayPath])
+
+        self.assertTrue(isReplayFile(replayPath))
+
+        capture.main(['--null-graphics', '--replay', replayPath])
+
+        os.remove(replayPath)
+
+    def test_round_trip(self):
+        replayPath = os.path.join(tempfile.gettempdir(), PACMAN_FILENAME)
+        layout = getLayout('testClassic')
+
+        moves = [(0, 'North'), (1, 'West'), (0, 'Stop'), (1, None), (0, 'East'), (1, 'South')]
+        with ReplayWriter(replayPath, layout, ['GreedyAgent', 'RandomGhost'], seed = 7) as writer:
+            writer.recordMoves(moves)
+
+        with ReplayReader(replayPath) as reader:
+            self.assertEqual(reader.getAgentNames(), ['GreedyAgent', 'RandomGhost'])
+            self.assertEqual(reader.getMetadata(), {'seed': 7})
+            self.assertEqual(reader.getLayout().layoutText, layout.layoutText)
+            self.assertEqual(list(reader), moves)
+
+        os.remove(replayPath)
+
+    def test_analyze(self):
+        with tempfile.TemporaryDirectory() as replayDir:
+            pacmanPath = os.path.join(replayDir, PACMAN_FILENAME)
+            capturePath = os.path.join(replayDir, CAPTURE_FILENAME + '.gz')
+            legacyPath = os.path.join(replayDir, 'legacy.replay')
+
+            pacmanGames = pacman.main(['--null-graphics', '-p', 'GreedyAgent', '--seed', '4',
+                    '--record', pacmanPath])
+            captureGames = capture.main(['--null-graphics', '--seed', '4',
+                    '--record', capturePath])
+
+            # Older replays are pickled dicts.
+            with open(legacyPath, 'wb') as file:
+                pickle.dump({
+                    'layout': getLayout('mediumClassic'),
+                    'actions': pacmanGames[0].moveHistory,
+                }, file)
+
+            results = list(analyze.analyzeReplays(analyze.findReplays([replayDir]), 2))
+            self.assertEqual(len(results), 3)
+
+            (legacy, captureResult, pacmanResult) = results
+            for (result, game) in [(pacmanResult, pacmanGames[0]), (legacy, pacmanGames[0]),
+                    (captureResult, captureGames[0])]:
+                self.assertNotIn('error', result)
+                self.assertEqual(result['moves'], len(game.moveHistory))
+                self.assertEqual(result['score'], game.state.getScore())
+                self.assertEqual(sum(result['movesPerAgent']), result['moves'])
+                self.assertEqual(result['scoreTrajectory'][-1][1], result['score'])
+
+            self.assertEqual(pacmanResult['game'], 'pacman')
+            if (pacmanGames[0].state.isWin()):
+                self.assertEqual(pacmanResult['winner'], 'pacman')
+                self.assertEqual(pacmanResult['deaths'][0], 0)
+            else:
+                self.assertEqual(pacmanResult['winner'], 'ghosts')
+                self.assertEqual(pacmanResult['deaths'][0], 1)
+
+            self.assertEqual(sum(pacmanResult['foodEaten'][1:]), 0)
+            self.assertEqual(pacmanResult['foodEaten'][0],
+                    getLayout('mediumClassic').food.count() - pacmanGames[0].state.getNumFood())
+            self.assertEqual(captureResult['game'], 'capture')
+
+            # Results stream out as CSV or JSON.
+            output = io.StringIO()
+            analyze.writeResults(results, output, analyze.FORMAT_JSON)
+            self.assertEqual(json.loads(output.getvalue())[2]['score'], pacmanResult['score'])
+
+            output = io.StringIO()
+            self.assertEqual(analyze.writeResults(results, output, analyze.FORMAT_CSV), 3)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,257 @@
+import unittest
+
+from pacai.agents.search.base import SearchAgent
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import distanceCalculator
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+from pacai.core.search import heuristic
+from pacai.core.search import search
+from pacai.core.search.food import FoodSearchProblem
+from pacai.core.search.position import PositionSearchProblem
+from pacai.core.search.problem import SearchProblem
+
+class GraphSearchProblem(SearchProblem):
+    """
+    A search over a small graph: {state: [(successor, action, cost), ...]}.
+    """
+
+    def __init__(self, edges, start, goal):
+        super().__init__()
+
+        self._edges = edges
+        self._start = start
+        self._goal = goal
+
+    def actionsCost(self, actions):
+        costs = {action: cost for successors in self._edges.values()
+                for (successor, action, cost) in successors}
+        return sum([costs[action] for action in actions])
+
+    def isGoal(self, state):
+        return (state == self._goal)
+
+    def startingState(self):
+        return self._start
+
+    def successorStates(self, state):
+        self._numExpanded += 1
+        return self._edges[state]
+
+"""
+Test the generic graph searches.
+"""
+class SearchTest(unittest.TestCase):
+    def _checkPath(self, problem, actions):
+        self.assertIsNotNone(actions)
+        self.assertLess(problem.actionsCost(actions), 999999)
+
+    def test_shortest_paths(self):
+        layout = getLayout('mediumMaze')
+        state = PacmanGameState(layout)
+        distances = distanceCalculator.computeDistances(layout)
+
+        start = state.getAgentPosition(0)
+        goal = (1, 1)
+        shortest = distances.getDistance(start, goal)
+
+        for function in [search.bfs, search.ucs,
+                lambda problem: search.astar(problem, heuristic.manhattan)]:
+            problem = PositionSearchProblem(state, goal = goal)
+            actions = function(problem)
+
+            self._checkPath(problem, actions)
+            self.assertEqual(shortest, len(actions))
+
+        for function in [search.dfs, lambda problem: search.greedy(problem, heuristic.manhattan)]:
+            problem = PositionSearchProblem(state, goal = goal)
+            actions = function(problem)
+
+            self._checkPath(problem, actions)
+            self.assertGreaterEqual(len(actions), shortest)
+
+    def test_weighted_costs(self):
+        state = PacmanGameState(getLayout('mediumDottedMaze'))
+
+        # Going east is expensive, so the cheapest path is not the shortest.
+        costFn = lambda position: 0.5 ** position[0]
+        costs = []
+
+        for function in [search.ucs, lambda problem: search.astar(problem, heuristic.null)]:
+            problem = PositionSearchProblem(state, costFn = costFn, goal = (1, 1))
+            actions = function(problem)
+
+            self._checkPath(problem, actions)
+            costs.append(problem.actionsCost(actions))
+
+        self.assertEqual(costs[0], costs[1])
+
+        problem = PositionSearchProblem(state, costFn = costFn, goal = (1, 1))
+        self.assertGreaterEqual(problem.actionsCost(search.bfs(problem)), costs[0])
+
+    def test_food_search(self):
+        state = PacmanGameState(getLayout('tinySearch'))
+
+        lengths = []
+        for function in [search.bfs, search.ucs]:
+            problem = FoodSearchProblem(state)
+            actions = function(problem)
+
+            self._checkPath(problem, actions)
+            lengths.append(len(actions))
+
+        self.assertEqual(lengths[0], lengths[1])
+
+    def test_start_is_goal(self):
+        state = PacmanGameState(getLayout('tinyMaze'))
+        start = state.getAgentPosition(0)
+
+        for function in [search.bfs, search.dfs, search.ucs]:
+            problem = PositionSearchProblem(state, goal = start)
+            self.assertEqual([], function(problem))
+
+    def test_no_path(self):
+        layout = Layout([
+            '%%%%%%',
+            '%P %.%',
+            '%%%%%%',
+        ])
+        state = PacmanGameState(layout)
+
+        for function in [search.bfs, search.dfs, search.ucs,
+                lambda problem: search.astar(problem, heuristic.manhattan)]:
+            problem = PositionSearchProblem(state, goal = (4, 1))
+            self.assertIsNone(function(problem))
+
+    def test_food_heuristic(self):
+        for name in ['tinySearch', 'trickySearch']:
+            state = PacmanGameState(getLayout(name))
+
+            problem = FoodSearchProblem(state)
+            optimal = len(search.ucs(problem))
+            numExpanded = problem.getExpandedCount()
+
+            problem = FoodSearchProblem(state)
+            foodHeuristic = heuristic.cached(heuristic.foodMST)
+            actions = search.astar(problem, foodHeuristic)
+
+            self._checkPath(problem, actions)
+            self.assertEqual(optimal, len(actions))
+            self.assertLess(problem.getExpandedCount() * 10, numExpanded)
+
+            # Admissible at the start.
+            start = problem.startingState()
+            self.assertLessEqual(foodHeuristic(start, problem), optimal)
+            self.assertEqual(heuristic.foodMST(start, problem), foodHeuristic(start, problem))
+
+    def test_food_distances(self):
+        state = PacmanGameState(getLayout('tinySearch'))
+        problem = FoodSearchProblem(state)
+        foodList = state.getFood().asList()
+
+        distances = problem.getFoodDistances()
+        self.assertEqual(len(foodList) ** 2, len(distances))
+
+        for food1 in foodList:
+            for food2 in foodList:
+                expected = len(search.bfs(PositionSearchProblem(state, start = food1,
+                        goal = food2)))
+                self.assertEqual(expected, distances[(food1, food2)])
+
+    def test_memory_bounded(self):
+        cases = [
+            (lambda state: FoodSearchProblem(state), 'trickySearch', heuristic.cachedFoodMST),
+            (lambda state: PositionSearchProblem(state), 'bigMaze', heuristic.manhattan),
+        ]
+
+        for (problemClass, layoutName, function) in cases:
+            state = PacmanGameState(getLayout(layoutName))
+
+            problem = problemClass(state)
+            optimal = problem.actionsCost(search.astar(problem, function))
+            maxStoredNodes = problem.getMaxStoredNodes()
+
+            searches = [
+                lambda problem: search.idastar(problem, function),
+                lambda problem: search.idastar(problem, function, tableSize = 1),
+                lambda problem: search.smastar(problem, function),
+                lambda problem: search.smastar(problem, function, maxNodes = 250),
+            ]
+
+            for boundedSearch in searches:
+                problem = problemClass(state)
+                actions = boundedSearch(problem)
+
+                self._checkPath(problem, actions)
+                self.assertEqual(optimal, problem.actionsCost(actions))
+                self.assertGreater(problem.getExpandedCount(), 0)
+                self.assertGreater(problem.getMaxStoredNodes(), 0)
+
+            # Capped below what A* needs.
+            self.assertLess(250, maxStoredNodes)
+            self.assertLessEqual(problem.getMaxStoredNodes(), 250 + 3)
+
+    def test_memory_bounded_duplicates(self):
+        # Open layouts have many paths to each state, which a tree search would all expand.
+        state = PacmanGameState(getLayout('openMaze'))
+
+        problem = PositionSearchProblem(state)
+        optimal = problem.actionsCost(search.astar(problem, heuristic.manhattan))
+        numExpanded = problem.getExpandedCount()
+
+        problem = PositionSearchProblem(state)
+        actions = search.smastar(problem, heuristic.manhattan)
+
+        self._checkPath(problem, actions)
+        self.assertEqual(optimal, problem.actionsCost(actions))
+        self.assertLessEqual(problem.getExpandedCount(), numExpanded * 2)
+
+        # A cheaper path found later replaces the node (and what was under it) in memory.
+        # S -> B is generated first, then S -> A -> B is cheaper.
+        edges = {
+            'S': [('B', 'S-B', 5), ('A', 'S-A', 1)],
+            'A': [('B', 'A-B', 1)],
+            'B': [('C', 'B-C', 1)],
+            'C': [('G', 'C-G', 1)],
+            'G': [],
+        }
+
+        for maxNodes in [search.DEFAULT_MAX_NODES, 5]:
+            problem = GraphSearchProblem(edges, 'S', 'G')
+            self.assertEqual(['S-A', 'A-B', 'B-C', 'C-G'],
+                    search.smastar(problem, heuristic.null, maxNodes = maxNodes))
+
+    def test_memory_bounded_limits(self):
+        state = PacmanGameState(getLayout('mediumMaze'))
+
+        # The path does not fit.
+        problem = PositionSearchProblem(state)
+        self.assertIsNone(search.smastar(problem, heuristic.manhattan, maxNodes = 20))
+
+        with self.assertRaises(ValueError):
+            search.smastar(problem, heuristic.manhattan, maxNodes = 1)
+
+        layout = Layout([
+            '%%%%%%',
+            '%P %.%',
+            '%%%%%%',
+        ])
+        state = PacmanGameState(layout)
+
+        for function in [search.idastar, search.smastar]:
+            problem = PositionSearchProblem(state, goal = (4, 1))
+            self.assertIsNone(function(problem, heuristic.manhattan))
+
+    def test_search_agent(self):
+        state = PacmanGameState(getLayout('trickySearch'))
+
+        for name in ['idastar', 'smastar']:
+            agent = SearchAgent(0, fn = 'pacai.core.search.search.' + name,
+                    prob = 'pacai.core.search.food.FoodSearchProblem',
+                    heuristic = 'pacai.core.search.heuristic.cachedFoodMST')
+            agent.registerInitialState(state)
+
+            self.assertEqual(60, len(agent._actions))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import gc
+import pickle
+import random
+import unittest
+import weakref
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import statecodec
+from pacai.core.layout import Layout
+from pacai.core.layout import getLayout
+
+"""
+Test that states survive a trip through the state codec.
+"""
+class StateCodecTest(unittest.TestCase):
+    def _checkRoundTrips(self, state, numMoves, seed):
+        rng = random.Random(seed)
+
+        agentIndex = 0
+        for i in range(numMoves):
+            data = statecodec.encodeState(state)
+            decoded = statecodec.decodeState(data)
+
+            self.assertEqual(state, decoded)
+            self.assertEqual(hash(state), hash(decoded))
+            self.assertEqual(state._foodHash, decoded._foodHash)
+            self.assertEqual(state._capsuleHash, decoded._capsuleHash)
+
+            self.assertEqual(state.getNumFood(), decoded.getNumFood())
+            self.assertEqual(state.getCapsules(), decoded.getCapsules())
+            self.assertEqual(state.getLastAgentMoved(), decoded.getLastAgentMoved())
+            self.assertEqual(state.isWin(), decoded.isWin())
+            self.assertEqual(state.isLose(), decoded.isLose())
+
+            for index in range(state.getNumAgents()):
+                self.assertEqual(state.getAgentState(index).getScaredTimer(),
+                        decoded.getAgentState(index).getScaredTimer())
+
+            if (isinstance(state, CaptureGameState)):
+                self.assertEqual(state.getTimeleft(), decoded.getTimeleft())
+                self.assertEqual(state.getRedFood(), decoded.getRedFood())
+                self.assertEqual(state.getBlueFood(), decoded.getBlueFood())
+                self.assertEqual(state.getNumRedFood(), decoded.getNumRedFood())
+                self.assertEqual(state.getNumBlueFood(), decoded.getNumBlueFood())
+                self.assertEqual(state.getRedCapsules(), decoded.getRedCapsules())
+                self.assertEqual(state.getBlueCapsules(), decoded.getBlueCapsules())
+
+            # Much smaller than pickling the whole state.
+            self.assertLess(len(data) * 10, len(pickle.dumps(state)))
+
+            if (state.isOver()):
+                break
+
+            # Decoded states keep playing the same way.
+            action = rng.choice(state.getLegalActions(agentIndex))
+            state = state.generateSuccessor(agentIndex, action)
+            self.assertEqual(state, decoded.generateSuccessor(agentIndex, action))
+
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+    def test_pacman(self):
+        state = PacmanGameState(getLayout('mediumClassic'))
+        for seed in range(3):
+            self._checkRoundTrips(state, 300, seed)
+
+    def test_capture(self):
+        state = CaptureGameState(getLayout('defaultCapture'), 1200)
+        for seed in range(2):
+            self._checkRoundTrips(state, 400, seed)
+
+    def test_game_over(self):
+        state = PacmanGameState(getLayout('smallClassic'))
+        state.setScore(-2.5)
+        state.endGame(True)
+
+        decoded = statecodec.decodeState(statecodec.encodeState(state))
+        self.assertTrue(decoded.isWin())
+        self.assertEqual(-2.5, decoded.getScore())
+
+    def test_layout_id(self):
+        text = [
+            '%%%%%',
+            '%P.G%',
+            '%%%%%',
+        ]
+
+        self.assertEqual(statecodec.getLayoutId(Layout(text)),
+                statecodec.getLayoutId(Layout(list(text))))
+        self.assertNotEqual(statecodec.getLayoutId(Layout(text)),
+                statecodec.getLayoutId(Layout(['%%%%%', '%PG.%', '%%%%%'])))
+
+    def test_layouts_released(self):
+        layout = Layout([
+            '%%%%%%',
+            '%P. G%',
+            '%%%%%%',
+        ])
+
+        data = statecodec.encodeState(PacmanGameState(layout))
+        layoutRef = weakref.ref(layout)
+
+        # The codec does not keep the layout alive.
+        del layout
+        gc.collect()
+        self.assertIsNone(layoutRef())
+
+        with self.assertRaises(ValueError):
+            statecodec.decodeState(data)
+
+    def test_bad_data(self):
+        data = statecodec.encodeState(PacmanGameState(getLayout('tinyMaze')))
+
+        with self.assertRaises(ValueError):
+            statecodec.decodeState(data[:-3])
+
+        with self.assertRaises(ValueError):
+            statecodec.decodeState(data + b'\x00')
+
+        with self.assertRaises(ValueError):
+            statecodec.decodeState(bytes([statecodec.FORMAT_VERSION + 1]) + data[1:])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
+import random
 import unittest
 
+from pacai.util import lruCache
 from pacai.util import priorityQueue
 from pacai.util import queue
 from pacai.util import stack
@@ -52,5 +54,90 @@ class UtilContainersTest(unittest.TestCase):
         for val, pri in reversed(val_list):
             self.assertEqual(val, testPriorityQueue.pop())
 
+    def test_indexed_priority_queue(self):
+        testPriorityQueue = priorityQueue.IndexedPriorityQueue()
+        self.assertTrue(testPriorityQueue.isEmpty())
+
+        # Items only need to be hashable, not comparable (even when their priorities tie).
+        keys = [object() for i in range(10)]
+        newKey = object()
+
+        for key in keys:
+            testPriorityQueue.push(key, 5)
+        self.assertEqual(len(keys), len(testPriorityQueue))
+        self.assertTrue(testPriorityQueue.contains(keys[3]))
+        self.assertFalse(testPriorityQueue.contains(object()))
+
+        with self.assertRaises(ValueError):
+            testPriorityQueue.push(keys[0], 1)
+
+        # Lowering a priority moves the item up, without adding an entry.
+        testPriorityQueue.decreaseKey(keys[7], 1)
+        self.assertEqual(len(keys), len(testPriorityQueue))
+        self.assertEqual(1, testPriorityQueue.getPriority(keys[7]))
+
+        with self.assertRaises(ValueError):
+            testPriorityQueue.decreaseKey(keys[7], 2)
+
+        # Updates only ever lower priorities.
+        self.assertFalse(testPriorityQueue.update(keys[2], 9))
+        self.assertTrue(testPriorityQueue.update(keys[4], 1))
+        self.assertTrue(testPriorityQueue.update(newKey, 3))
+
+        # Ties come out in the order they were pushed (or last lowered).
+        expected = [keys[7], keys[4], newKey] + [keys[i] for i in [0, 1, 2, 3, 5, 6, 8, 9]]
+        self.assertEqual(expected, [testPriorityQueue.pop() for i in range(len(expected))])
+        self.assertTrue(testPriorityQueue.isEmpty())
+
+    def test_indexed_priority_queue_order(self):
+        rng = random.Random(0)
+        testPriorityQueue = priorityQueue.IndexedPriorityQueue()
+        priorities = {}
+
+        for i in range(500):
+            item = rng.randrange(100)
+            priority = rng.randrange(1000)
+
+            testPriorityQueue.update(item, priority)
+            priorities[item] = min(priority, priorities.get(item, priority))
+
+        self.assertEqual(len(priorities), len(testPriorityQueue))
+
+        popped = []
+        while (not testPriorityQueue.isEmpty()):
+            popped.append(priorities[testPriorityQueue.pop()])
+
+        self.assertEqual(sorted(priorities.values()), popped)
+
+    def test_lru_cache(self):
+        cache = lruCache.LRUCache(3)
+
+        for key in ['a', 'b', 'c']:
+            cache.put(key, key.upper())
+        self.assertEqual(3, len(cache))
+
+        # Using 'a' makes 'b' the oldest.
+        self.assertEqual('A', cache.get('a'))
+        cache.put('d', 'D')
+
+        self.assertEqual(3, len(cache))
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual('missing', cache.get('b', 'missing'))
+
+        for key in ['a', 'c', 'd']:
+            self.assertEqual(key.upper(), cache.get(key))
+
+        # Values can be None.
+        cache.put('e', None)
+        self.assertIn('e', cache)
+        self.assertIsNone(cache.get('e', 'missing'))
+
+        self.assertEqual(5, cache.getHits())
+        self.assertEqual(2, cache.getMisses())
+
+        with self.assertRaises(ValueError):
+            lruCache.LRUCache(0)
+
 if __name__ == '__main__':
     unittest.main()